@@ -0,0 +1,350 @@
+"""
+Institution-wide face search: an IVF (inverted file) index in pure NumPy
+over every student's FaceProfile centroid.
+
+Vectors are clustered with a few rounds of spherical k-means; a query only
+scores the members of the ``n_probe`` closest clusters. Below
+``min_train`` vectors the index stays untrained and searches exactly.
+Enrollment changes are applied incrementally (upsert/remove); the clusters
+are retrained by a background rebuild once the index has doubled since the
+last training.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.ai.embeddings import EMBEDDING_DIM, pack_embeddings
+from backend.config import AI_ANN_MIN_TRAIN, AI_ANN_NPROBE, AI_ANN_REFRESH_SECONDS
+from backend.database import SessionLocal
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IVFIndex:
+    def __init__(self, n_probe: int = AI_ANN_NPROBE, min_train: int = AI_ANN_MIN_TRAIN, seed: int = 0) -> None:
+        self.n_probe = n_probe
+        self.min_train = min_train
+        self._rng = np.random.default_rng(seed)
+        self._vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int64)
+        self._lists: List[Set[int]] = []
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def needs_training(self) -> bool:
+        """True once the index has doubled (or reached ``min_train``) since it was trained."""
+        return self._size >= max(self.min_train, 2 * self._trained_size)
+
+    # ---------- building ----------
+
+    def _reserve(self, n: int) -> None:
+        if n <= self._vectors.shape[0]:
+            return
+        capacity = max(n, 2 * self._vectors.shape[0], 1024)
+        grown = np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+        grown[: self._size] = self._vectors[: self._size]
+        self._vectors = grown
+        assign = np.full(capacity, -1, dtype=np.int64)
+        assign[: self._size] = self._assign[: self._size]
+        self._assign = assign
+
+    def train(self, iterations: int = 10) -> None:
+        """Spherical k-means with about sqrt(n) clusters over the current vectors."""
+        n = self._size
+        if n < self.min_train:
+            self._centroids, self._lists, self._trained_size = None, [], 0
+            return
+        data = self._vectors[:n]
+        k = max(1, int(np.sqrt(n)))
+        centroids = data[self._rng.choice(n, k, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            empty = np.bincount(assign, minlength=k) == 0
+            # re-seed empty clusters from random points
+            sums[empty] = data[self._rng.choice(n, int(empty.sum()))]
+            centroids = _normalize(sums)
+        self._centroids = centroids
+        self._assign[:n] = np.argmax(data @ centroids.T, axis=1)
+        self._lists = [set() for _ in range(k)]
+        for row, c in enumerate(self._assign[:n]):
+            self._lists[c].add(row)
+        self._trained_size = n
+
+    def build(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = _normalize(vectors)
+        self._vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._assign = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._reserve(len(ids))
+        self._vectors[: len(ids)] = vectors
+        self._size = len(ids)
+        self._ids = list(ids)
+        self._rows = {reg_no: i for i, reg_no in enumerate(self._ids)}
+        self.train()
+
+    # ---------- incremental updates ----------
+
+    def upsert(self, reg_no: str, vector: np.ndarray) -> None:
+        vec = _normalize(vector)[0]
+        row = self._rows.get(reg_no)
+        if row is None:
+            self._reserve(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._ids.append(reg_no)
+            self._rows[reg_no] = row
+        elif self.trained:
+            self._lists[self._assign[row]].discard(row)
+        self._vectors[row] = vec
+        if self.trained:
+            c = int(np.argmax(self._centroids @ vec))
+            self._assign[row] = c
+            self._lists[c].add(row)
+
+    def remove(self, reg_no: str) -> None:
+        row = self._rows.pop(reg_no, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if self.trained:
+            self._lists[self._assign[row]].discard(row)
+        if row != last:
+            # move the last row into the hole
+            moved = self._ids[last]
+            self._vectors[row] = self._vectors[last]
+            self._ids[row] = moved
+            self._rows[moved] = row
+            if self.trained:
+                self._lists[self._assign[last]].discard(last)
+                self._assign[row] = self._assign[last]
+                self._lists[self._assign[row]].add(row)
+        self._ids.pop()
+        self._size -= 1
+
+    # ---------- search ----------
+
+    def search(self, queries: np.ndarray, k: int = 5) -> List[List[Tuple[str, float]]]:
+        """Top-``k`` (reg_no, cosine similarity) per query row, best first."""
+        queries = _normalize(queries)
+        if self._size == 0:
+            return [[] for _ in range(queries.shape[0])]
+        data = self._vectors[: self._size]
+        results = []
+        if not self.trained:
+            sims = queries @ data.T
+            for row in sims:
+                top = np.argsort(-row)[:k]
+                results.append([(self._ids[i], float(row[i])) for i in top])
+            return results
+
+        probes = np.argsort(-(queries @ self._centroids.T), axis=1)[:, : self.n_probe]
+        for q, lists in zip(queries, probes):
+            candidates = np.fromiter(
+                (row for c in lists for row in self._lists[c]), dtype=np.int64
+            )
+            if candidates.size == 0:
+                results.append([])
+                continue
+            sims = data[candidates] @ q
+            top = np.argsort(-sims)[:k]
+            results.append([(self._ids[candidates[i]], float(sims[i])) for i in top])
+        return results
+
+    def stats(self) -> Dict[str, object]:
+        sizes = [len(members) for members in self._lists]
+        return {
+            "vectors": self._size,
+            "trained": self.trained,
+            "lists": len(self._lists),
+            "n_probe": self.n_probe,
+            "largest_list": max(sizes) if sizes else 0,
+            "bytes": int(self._vectors.nbytes),
+        }
+
+
+def _read_profiles(db: Session) -> Tuple[List[str], Dict[str, Optional[str]], np.ndarray]:
+    """Every enrolled student's reg_no, class_id and centroid."""
+    rows = (
+        db.query(
+            models.Student.reg_no,
+            models.Student.class_id,
+            models.FaceProfile.embedding_blob,
+            models.FaceProfile.embedding_dtype,
+            models.FaceProfile.embedding_vector,
+        )
+        .join(models.FaceProfile, models.FaceProfile.reg_no == models.Student.reg_no)
+        .all()
+    )
+    binary = [(r, c, b, d) for r, c, b, d, _ in rows if b]
+    legacy = [(r, c, v) for r, c, b, _, v in rows if not b and v]
+    ids = [r for r, _, _, _ in binary] + [r for r, _, _ in legacy]
+    parts = [pack_embeddings([b for _, _, b, _ in binary], [d for _, _, _, d in binary])]
+    if legacy:
+        parts.append(np.asarray([v for _, _, v in legacy], dtype=np.float32))
+    class_of = {r: c for r, c, _, _ in binary}
+    class_of.update({r: c for r, c, _ in legacy})
+    return ids, class_of, np.vstack(parts)
+
+
+# an enrollment change: ("upsert", reg_no, class_id, vector), ("remove", reg_no, None, None)
+# or ("class", reg_no, class_id, None)
+_Change = Tuple[str, str, Optional[str], Optional[np.ndarray]]
+
+
+class FaceSearchIndex:
+    """
+    Process-wide IVF index of every enrolled student plus their class_id.
+
+    The index is built from the database on a background thread and swapped
+    in whole, so a request never waits for the load or the k-means: until
+    the first build finishes, lookups find no candidates. It is rebuilt
+    after ``AI_ANN_REFRESH_SECONDS`` (so enrollments through other workers
+    show up) and when incremental enrollments have doubled it since the
+    last training. Changes made while a rebuild runs are replayed onto the
+    new index before the swap.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: float = AI_ANN_REFRESH_SECONDS,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.refresh_seconds = refresh_seconds
+        self._session_factory = session_factory
+        self._index: Optional[IVFIndex] = None
+        self._class_of: Dict[str, Optional[str]] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.RLock()
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._pending: List[_Change] = []
+
+    def refresh(self, force: bool = False) -> "FaceSearchIndex":
+        """Start a background rebuild when the index is missing or stale. Never blocks."""
+        with self._lock:
+            if self._rebuild_thread is not None:
+                return self
+            if not force and self._index is not None and time.monotonic() - self._loaded_at <= self.refresh_seconds:
+                return self
+            self._pending = []
+            self._rebuild_thread = threading.Thread(target=self._rebuild, name="face-index-rebuild", daemon=True)
+            self._rebuild_thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> "FaceSearchIndex":
+        """Block until a running rebuild is done (scripts and tests only)."""
+        thread = self._rebuild_thread
+        if thread is not None:
+            thread.join(timeout)
+        return self
+
+    def _rebuild(self) -> None:
+        try:
+            db = self._session_factory()
+            try:
+                ids, class_of, vectors = _read_profiles(db)
+            finally:
+                db.close()
+            index = IVFIndex()
+            index.build(ids, vectors)
+            with self._lock:
+                for change in self._pending:
+                    self._apply(index, class_of, change)
+                self._index, self._class_of, self._loaded_at = index, class_of, time.monotonic()
+        except Exception as exc:
+            # keep serving the old index; the next refresh() tries again
+            print(f"⚠️ Face index rebuild failed: {exc}")
+        finally:
+            with self._lock:
+                self._pending = []
+                self._rebuild_thread = None
+
+    @staticmethod
+    def _apply(index: IVFIndex, class_of: Dict[str, Optional[str]], change: _Change) -> None:
+        op, reg_no, class_id, vector = change
+        if op == "upsert":
+            index.upsert(reg_no, vector)
+            class_of[reg_no] = class_id
+        elif op == "remove":
+            index.remove(reg_no)
+            class_of.pop(reg_no, None)
+        elif reg_no in class_of:
+            class_of[reg_no] = class_id
+
+    def _change(self, change: _Change) -> None:
+        with self._lock:
+            if self._rebuild_thread is not None:
+                self._pending.append(change)
+            if self._index is None:
+                return
+            self._apply(self._index, self._class_of, change)
+            retrain = self._index.needs_training
+        if retrain:
+            self.refresh(force=True)
+
+    def upsert(self, reg_no: str, class_id: Optional[str], vector: np.ndarray) -> None:
+        """Apply an enrollment change; before the first build it is only kept for the replay."""
+        self._change(("upsert", reg_no, class_id, np.asarray(vector, dtype=np.float32)))
+
+    def set_class(self, reg_no: str, class_id: Optional[str]) -> None:
+        self._change(("class", reg_no, class_id, None))
+
+    def remove(self, reg_no: str) -> None:
+        self._change(("remove", reg_no, None, None))
+
+    def lookup(
+        self,
+        embeddings: np.ndarray,
+        k: int = 5,
+        min_similarity: float = 0.0,
+        exclude: Optional[Set[str]] = None,
+    ) -> List[List[Dict[str, object]]]:
+        """Candidates per face: reg_no, class_id and similarity, best first."""
+        exclude = exclude or set()
+        with self._lock:
+            if self._index is None:
+                return [[] for _ in range(len(embeddings))]
+            hits = self._index.search(embeddings, k + len(exclude) if exclude else k)
+            return [
+                [
+                    {"reg_no": r, "class_id": self._class_of.get(r), "similarity": round(sim, 4)}
+                    for r, sim in row
+                    if r not in exclude and sim >= min_similarity
+                ][:k]
+                for row in hits
+            ]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            rebuilding = self._rebuild_thread is not None
+            if self._index is None:
+                return {"loaded": False, "rebuilding": rebuilding}
+            stats = self._index.stats()
+            stats["loaded"] = True
+            stats["rebuilding"] = rebuilding
+            stats["age_seconds"] = round(time.monotonic() - self._loaded_at, 1)
+            return stats
+
+
+face_index = FaceSearchIndex()
@@ -0,0 +1,339 @@
+"""
+Offline throughput and accuracy benchmark for FaceAttendanceEngine.
+
+A corpus is a directory with enrollment photos and classroom photos whose
+identities are known:
+
+    corpus/gallery/<reg_no>.jpg     one face per student
+    corpus/photos/*.jpg             classroom photos
+    corpus/labels.json              {"photo.jpg": ["REG001", ...], ...}
+
+Build one from enrollment photos alone (faces are pasted onto a classroom
+sized canvas with a fixed seed), then run the engine over it:
+
+    python -m backend.ai.benchmark generate --gallery enroll_photos/ --out corpus/
+    python -m backend.ai.benchmark run --corpus corpus/ --output results.json
+
+Runs on CPU only and needs no network once the buffalo_l models are in
+~/.insightface. The JSON output records the commit, corpus fingerprint and
+settings so results can be compared across commits.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from backend.ai.engine import FaceAttendanceEngine, _current_rss_mb, _peak_rss_mb
+from backend.ai.matcher import SIMILARITY_THRESHOLD, GalleryMatcher
+from backend.config import AI_TILING
+
+
+RESULTS_SCHEMA = 2
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+DEFAULT_THRESHOLDS = [0.25, 0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6]
+
+
+def _images_in(folder: Path) -> List[Path]:
+    return sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+# ---------- Corpus ----------
+
+
+def generate_corpus(
+    gallery_dir: Path,
+    out_dir: Path,
+    photos: int,
+    faces_per_photo: int,
+    size: Tuple[int, int],
+    seed: int,
+) -> None:
+    """
+    Paste enrollment photos onto noisy canvases at random scales to make
+    classroom-like photos with known identities. Faces shrink towards the
+    top of the canvas like back rows do.
+    """
+    rng = np.random.default_rng(seed)
+    sources = {p.stem: cv2.imread(str(p)) for p in _images_in(gallery_dir)}
+    sources = {k: v for k, v in sources.items() if v is not None}
+    if not sources:
+        raise SystemExit(f"No readable images in {gallery_dir}")
+
+    (out_dir / "gallery").mkdir(parents=True, exist_ok=True)
+    (out_dir / "photos").mkdir(parents=True, exist_ok=True)
+    for reg_no, img in sources.items():
+        cv2.imwrite(str(out_dir / "gallery" / f"{reg_no}.jpg"), img)
+
+    w, h = size
+    reg_nos = sorted(sources)
+    per_photo = min(faces_per_photo, len(reg_nos))
+    rows = max(1, int(np.ceil(np.sqrt(per_photo / 2))))
+    cols = int(np.ceil(per_photo / rows))
+    labels: Dict[str, List[str]] = {}
+    for n in range(photos):
+        canvas = rng.integers(60, 140, size=(h, w, 3), dtype=np.uint8)
+        chosen = [reg_nos[i] for i in rng.choice(len(reg_nos), per_photo, replace=False)]
+        for k, reg_no in enumerate(chosen):
+            r, c = divmod(k, cols)
+            cell_w, cell_h = w // cols, h // rows
+            face_h = int(cell_h * (0.45 + 0.4 * (r + 1) / rows))
+            src = sources[reg_no]
+            face_w = max(1, int(src.shape[1] * face_h / src.shape[0]))
+            if face_w > cell_w:
+                face_w, face_h = cell_w, max(1, int(src.shape[0] * cell_w / src.shape[1]))
+            face = cv2.resize(src, (face_w, face_h), interpolation=cv2.INTER_AREA)
+            x = c * cell_w + int(rng.integers(0, cell_w - face_w + 1))
+            y = r * cell_h + int(rng.integers(0, cell_h - face_h + 1))
+            canvas[y:y + face_h, x:x + face_w] = face
+        name = f"photo_{n:03d}.jpg"
+        cv2.imwrite(str(out_dir / "photos" / name), canvas)
+        labels[name] = sorted(chosen)
+
+    with open(out_dir / "labels.json", "w") as fh:
+        json.dump(labels, fh, indent=2, sort_keys=True)
+    print(f"Wrote {photos} photos for {len(reg_nos)} students to {out_dir}")
+
+
+def _corpus_fingerprint(corpus: Path) -> str:
+    """Hash of every corpus file's name and bytes, to tell corpora apart."""
+    digest = hashlib.sha1()
+    for path in sorted(corpus.rglob("*")):
+        if path.is_file():
+            digest.update(str(path.relative_to(corpus)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def load_corpus(corpus: Path) -> Tuple[Dict[str, Path], List[Tuple[Path, List[str]]]]:
+    with open(corpus / "labels.json") as fh:
+        labels = json.load(fh)
+    gallery = {p.stem: p for p in _images_in(corpus / "gallery")}
+    photos = [(corpus / "photos" / name, sorted(ids)) for name, ids in sorted(labels.items())]
+    return gallery, photos
+
+
+def build_gallery(engine: FaceAttendanceEngine, gallery: Dict[str, Path]) -> Tuple[GalleryMatcher, List[str]]:
+    """Enroll every gallery photo the way enroll_face does; returns the failures too."""
+    database: Dict[str, np.ndarray] = {}
+    failed: List[str] = []
+    for reg_no, path in sorted(gallery.items()):
+        img = cv2.imread(str(path))
+        try:
+            database[reg_no] = engine.extract_enrollment_embedding(img)
+        except (ValueError, AttributeError):
+            failed.append(reg_no)
+    return GalleryMatcher.from_dict(database), failed
+
+
+# ---------- Runs ----------
+
+
+def _latency_summary(latencies: Sequence[float], wall: float) -> Dict[str, float]:
+    arr = np.asarray(latencies, dtype=np.float64) * 1000.0
+    return {
+        "photos": len(latencies),
+        "wall_seconds": round(wall, 3),
+        "photos_per_sec": round(len(latencies) / wall, 3) if wall else None,
+        "p50_ms": round(float(np.percentile(arr, 50)), 1),
+        "p95_ms": round(float(np.percentile(arr, 95)), 1),
+        "max_ms": round(float(arr.max()), 1),
+    }
+
+
+def run_mode(
+    engine: FaceAttendanceEngine,
+    gallery: GalleryMatcher,
+    images: List[np.ndarray],
+    mode: str,
+    workers: int,
+) -> Dict[str, object]:
+    """Time mark_attendance over the corpus: sequential, batched or parallel (batched on a pool)."""
+    batched = mode != "sequential"
+
+    def one(img: np.ndarray) -> float:
+        started = time.perf_counter()
+        engine.mark_attendance(img.copy(), gallery, batched=batched)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if mode == "parallel":
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            latencies = list(pool.map(one, images))
+    else:
+        latencies = [one(img) for img in images]
+    result = _latency_summary(latencies, time.perf_counter() - started)
+    if mode == "parallel":
+        result["workers"] = workers
+    return result
+
+
+def threshold_sweep(
+    engine: FaceAttendanceEngine,
+    gallery: GalleryMatcher,
+    images: List[np.ndarray],
+    truths: List[List[str]],
+    thresholds: Sequence[float],
+) -> List[Dict[str, float]]:
+    """
+    Precision/recall of the present list at each similarity threshold.
+    Faces are detected and embedded once; only the matching is repeated.
+    """
+    embedded = []
+    for img in images:
+        faces = engine.detect_and_embed(img.copy())
+        if faces:
+            embedded.append(np.stack([f.normed_embedding for f in faces]))
+        else:
+            embedded.append(np.zeros((0, gallery.dim), dtype=np.float32))
+
+    rows = []
+    for threshold in thresholds:
+        tp = fp = fn = 0
+        for faces, truth in zip(embedded, truths):
+            predicted = {name for name, _ in gallery.match(faces, threshold) if name != "Unknown"}
+            expected = set(truth)
+            tp += len(predicted & expected)
+            fp += len(predicted - expected)
+            fn += len(expected - predicted)
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 1.0
+        rows.append({
+            "threshold": threshold,
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+            "tp": tp,
+            "fp": fp,
+            "fn": fn,
+        })
+    return rows
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _versions() -> Dict[str, str]:
+    versions = {"python": platform.python_version(), "numpy": np.__version__, "opencv": cv2.__version__}
+    try:
+        import onnxruntime
+
+        versions["onnxruntime"] = onnxruntime.__version__
+    except ImportError:
+        pass
+    return versions
+
+
+def run_benchmark(
+    corpus: Path,
+    modes: Sequence[str],
+    workers: int,
+    thresholds: Sequence[float],
+) -> Dict[str, object]:
+    gallery_paths, photos = load_corpus(corpus)
+    rss_start = _current_rss_mb()
+    started = time.perf_counter()
+    engine = FaceAttendanceEngine()
+    load_seconds = time.perf_counter() - started
+    gallery, failed = build_gallery(engine, gallery_paths)
+
+    images, truths = [], []
+    for path, truth in photos:
+        img = cv2.imread(str(path))
+        if img is not None:
+            images.append(img)
+            truths.append(truth)
+    if not images:
+        raise SystemExit(f"No readable photos in {corpus / 'photos'}")
+
+    # One untimed pass so model warm-up does not land in the first mode
+    engine.mark_attendance(images[0].copy(), gallery)
+
+    return {
+        "schema": RESULTS_SCHEMA,
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "corpus": {
+            "path": str(corpus),
+            "fingerprint": _corpus_fingerprint(corpus),
+            "photos": len(images),
+            "students": len(gallery),
+            "enrollment_failures": failed,
+        },
+        "settings": {
+            "similarity_threshold": SIMILARITY_THRESHOLD,
+            "tiling": AI_TILING,
+            "det_size": list(engine.det_size),
+            "runtime": engine.settings.as_dict(),
+            "cpu_count": os.cpu_count(),
+        },
+        "versions": _versions(),
+        "engine": {
+            "load_seconds": round(load_seconds, 3),
+            "rss_before_load_mb": rss_start,
+            "rss_after_load_mb": _current_rss_mb(),
+        },
+        "modes": {mode: run_mode(engine, gallery, images, mode, workers) for mode in modes},
+        "accuracy": threshold_sweep(engine, gallery, images, truths, thresholds),
+        # VmHWM is process-wide, so this covers the load and every mode above
+        "peak_rss_mb_cumulative": _peak_rss_mb(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_gen = sub.add_parser("generate", help="compose a labelled corpus from enrollment photos")
+    p_gen.add_argument("--gallery", type=Path, required=True, help="folder of <reg_no>.jpg photos")
+    p_gen.add_argument("--out", type=Path, required=True)
+    p_gen.add_argument("--photos", type=int, default=20)
+    p_gen.add_argument("--faces-per-photo", type=int, default=30)
+    p_gen.add_argument("--width", type=int, default=4032)
+    p_gen.add_argument("--height", type=int, default=3024)
+    p_gen.add_argument("--seed", type=int, default=0)
+
+    p_run = sub.add_parser("run", help="benchmark the engine on a corpus")
+    p_run.add_argument("--corpus", type=Path, required=True)
+    p_run.add_argument(
+        "--modes", nargs="+", choices=["sequential", "batched", "parallel"],
+        default=["sequential", "batched", "parallel"],
+    )
+    p_run.add_argument("--workers", type=int, default=2, help="threads for the parallel mode")
+    p_run.add_argument("--thresholds", type=float, nargs="+", default=DEFAULT_THRESHOLDS)
+    p_run.add_argument("--output", type=Path, help="write the JSON results here as well")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate_corpus(
+            args.gallery, args.out, args.photos, args.faces_per_photo,
+            (args.width, args.height), args.seed,
+        )
+        return
+
+    # Must be set before the engine picks its execution providers
+    os.environ["AI_DEVICE"] = "cpu"
+    results = run_benchmark(args.corpus, args.modes, args.workers, args.thresholds)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from backend.config import EMBEDDING_STORAGE_DTYPE
+
+
+EMBEDDING_DIM = 512
+
+# Stored little-endian so the bytes read the same on every host
+_STORAGE_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+
+
+def _storage_dtype(name: Optional[str]) -> np.dtype:
+    try:
+        return _STORAGE_DTYPES[name or "float32"]
+    except KeyError:
+        raise ValueError(f"Unsupported embedding dtype {name!r}; use float32 or float16")
+
+
+def encode_embedding(vector, dtype: str = EMBEDDING_STORAGE_DTYPE) -> bytes:
+    """Raw bytes for the ``FaceProfile.embedding_blob`` column (2 KB as float32)."""
+    return np.asarray(vector, dtype=np.float32).ravel().astype(_storage_dtype(dtype)).tobytes()
+
+
+def decode_embedding(blob: bytes, dtype: Optional[str] = "float32") -> np.ndarray:
+    """Zero-copy read-only view for float32 blobs; float16 is widened to float32."""
+    vec = np.frombuffer(blob, dtype=_storage_dtype(dtype))
+    if vec.dtype != np.float32:
+        vec = vec.astype(np.float32)
+    return vec
+
+
+def profile_embedding(profile) -> Optional[np.ndarray]:
+    """Embedding of a FaceProfile row, preferring the binary column over legacy JSONB."""
+    if profile.embedding_blob:
+        return decode_embedding(profile.embedding_blob, profile.embedding_dtype)
+    if profile.embedding_vector:
+        return np.asarray(profile.embedding_vector, dtype=np.float32)
+    return None
+
+
+def has_embedding(profile) -> bool:
+    return profile is not None and bool(profile.embedding_blob or profile.embedding_vector)
+
+
+def centroid(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalized mean of (n, 512) normalized embeddings."""
+    mean = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return mean / norm if norm > 0 else mean
+
+
+def pack_embeddings(blobs: Sequence[bytes], dtypes: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    Stack stored embeddings into one (n, 512) float32 matrix. When every blob
+    shares a dtype they are joined once and viewed with a single frombuffer.
+    """
+    if not blobs:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    kinds = {d or "float32" for d in dtypes}
+    if len(kinds) == 1:
+        matrix = np.frombuffer(b"".join(blobs), dtype=_storage_dtype(kinds.pop()))
+        return matrix.reshape(len(blobs), -1).astype(np.float32, copy=False)
+    rows: List[np.ndarray] = [decode_embedding(b, d) for b, d in zip(blobs, dtypes)]
+    return np.stack(rows)
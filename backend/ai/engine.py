@@ -1,13 +1,39 @@
 import os
-from typing import Dict, List, Tuple
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
-import cv2
 import numpy as np
 from insightface.app import FaceAnalysis
+from insightface.app.common import Face
+from insightface.utils import face_align
 from scipy.spatial.distance import cosine
 
+from backend.ai.matcher import SIMILARITY_THRESHOLD, GalleryMatcher
+from backend.ai.nms import nms_groups
+from backend.ai.profiling import stage
+from backend.ai.proof import detections_from, draw_detections
+from backend.ai.quality import ENROLLMENT_THRESHOLDS, REASON_MESSAGES, assess_face
+from backend.ai.runtime import RuntimeSettings, apply_settings, runtime_settings, self_benchmark
+from backend.ai.tiling import TilePlan, density_plan, fixed_plan, grid_plan, priority_order
+from backend.ai.video import IdentityTracker, Track
+from backend.config import AI_EARLY_EXIT, AI_EARLY_EXIT_CONFIRM, AI_SELF_BENCHMARK, AI_TILING, QUALITY_GATE
 
-SIMILARITY_THRESHOLD = 0.4  # how strict the match is
+
+RECOGNITION_BATCH_SIZE = 64  # max aligned crops per recognition call
+
+
+def _box_ious(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """IoU of one x1,y1,x2,y2 box against an (N, 4) array."""
+    xx1 = np.maximum(box[0], boxes[:, 0])
+    yy1 = np.maximum(box[1], boxes[:, 1])
+    xx2 = np.minimum(box[2], boxes[:, 2])
+    yy2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    union = (box[2] - box[0]) * (box[3] - box[1]) + areas - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
 
 
 def _get_providers() -> List[str]:
@@ -34,82 +60,277 @@ class FaceAttendanceEngine:
     from the standalone attendance_system.py.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, settings: Optional[RuntimeSettings] = None) -> None:
         providers = _get_providers()
-        self.app = FaceAnalysis(name="buffalo_l", providers=providers)
+        self.settings = settings or runtime_settings()
+        # Only the models the pipeline uses (not landmarks or gender/age)
+        self.app = FaceAnalysis(name="buffalo_l", providers=providers, allowed_modules=list(self.settings.modules))
         # ctx_id = 0 will use GPU 0 when CUDAExecutionProvider is active,
         # or fall back to CPU execution otherwise.
-        self.app.prepare(ctx_id=0, det_size=(640, 640))
+        self.det_size = self.settings.det_size
+        apply_settings(self.app, providers, self.settings, ctx_id=0)
 
-    @staticmethod
-    def _get_smart_tiles(full_img: np.ndarray) -> List[Tuple[np.ndarray, int, int]]:
+    def plan_tiles(self, full_img: np.ndarray, strategy: str = AI_TILING) -> TilePlan:
         """
-        Dynamically slices image into overlapping tiles to ensure no face is split.
-        Uses a 2x3 grid (2 rows, 3 cols) with significant overlap.
+        Choose the detector tiles for an image (see backend/ai/tiling.py).
+
+        ``density`` first runs the detector once on the whole image, which
+        SCRFD letterboxes down to ``det_size``, and only tiles around what
+        that coarse pass found.
         """
         h, w = full_img.shape[:2]
-        tiles: List[Tuple[np.ndarray, int, int]] = []
-
-        # Define overlapping intervals
-        # Vertical: 2 rows with overlap
-        # Row 1: 0% to 60%
-        # Row 2: 40% to 100%
-        y_intervals = [
-            (0, int(h * 0.60)),
-            (int(h * 0.40), h)
+        if strategy == "fixed":
+            return fixed_plan(h, w)
+        if strategy == "density":
+            coarse, _ = self.app.det_model.detect(full_img, max_num=0, metric="default")
+            return density_plan(h, w, coarse, self.det_size)
+        return grid_plan(h, w, self.det_size)
+
+    @staticmethod
+    def _get_smart_tiles(full_img: np.ndarray, plan: TilePlan) -> List[Tuple[np.ndarray, int, int]]:
+        """Slice the image into the planned (tile, x_offset, y_offset) views."""
+        return [
+            (full_img[y0:y1, x0:x1], x0, y0)
+            for x0, y0, x1, y1 in plan.tiles
         ]
 
-        # Horizontal: 3 cols with overlap
-        # Col 1: 0% to 45%
-        # Col 2: 30% to 75%  <-- Centered roughly
-        # Col 3: 55% to 100%
-        x_intervals = [
-            (0, int(w * 0.45)),
-            (int(w * 0.30), int(w * 0.75)),
-            (int(w * 0.55), w)
+    def _detect_tiles(self, tiles: List[Tuple[np.ndarray, int, int]]) -> List[Face]:
+        """
+        Run only the detector on every tile and return faces in full-image
+        coordinates, without embeddings.
+
+        ``app.get`` would also run the landmark and gender/age models on every
+        face of every tile; none of those outputs are used for attendance.
+        """
+        det_model = self.app.det_model
+        detections: List[Face] = []
+        for tile_img, off_x, off_y in tiles:
+            bboxes, kpss = det_model.detect(tile_img, max_num=0, metric="default")
+            for i in range(bboxes.shape[0]):
+                bbox = bboxes[i, 0:4].copy()
+                bbox[[0, 2]] += off_x
+                bbox[[1, 3]] += off_y
+                kps = None
+                if kpss is not None:
+                    kps = kpss[i].copy()
+                    kps[:, 0] += off_x
+                    kps[:, 1] += off_y
+                detections.append(Face(bbox=bbox, kps=kps, det_score=bboxes[i, 4]))
+        return detections
+
+    def _embed_faces(self, full_img: np.ndarray, faces: List[Face]) -> None:
+        """Align every face from the full image and embed them in batched calls."""
+        if not faces:
+            return
+        rec_model = self.app.models["recognition"]
+        crops = [
+            face_align.norm_crop(full_img, landmark=face.kps, image_size=rec_model.input_size[0])
+            for face in faces
         ]
+        for start in range(0, len(crops), RECOGNITION_BATCH_SIZE):
+            feats = rec_model.get_feat(crops[start:start + RECOGNITION_BATCH_SIZE])
+            for face, feat in zip(faces[start:start + RECOGNITION_BATCH_SIZE], feats):
+                face.embedding = feat.flatten()
+
+    @staticmethod
+    def _gate_faces(
+        full_img: np.ndarray, faces: List[Face], report: Optional[Dict[str, object]] = None
+    ) -> List[Face]:
+        """
+        Drop faces failing the quality gate (score, size, pose, blur) before
+        they are embedded or matched. Counts per reason accumulate in
+        ``report["quality_gate"]``.
+        """
+        if not QUALITY_GATE or not faces:
+            return faces
+        with stage(report, "quality"):
+            reasons = [assess_face(full_img, face) for face in faces]
+        if report is not None:
+            gate = report.setdefault("quality_gate", {"passed": 0, "rejected": {}})
+            gate["passed"] += sum(1 for r in reasons if r is None)
+            for reason in reasons:
+                if reason is not None:
+                    gate["rejected"][reason] = gate["rejected"].get(reason, 0) + 1
+        return [face for face, reason in zip(faces, reasons) if reason is None]
+
+    def detect_and_embed(
+        self,
+        full_img: np.ndarray,
+        batched: bool = True,
+        tiling: str = AI_TILING,
+        report: Optional[Dict[str, object]] = None,
+    ) -> List[Face]:
+        """
+        Tile the image, detect faces, de-duplicate overlaps and return the
+        unique faces with embeddings.
+
+        The batched path detects per tile, suppresses duplicates first and
+        then embeds all surviving faces at once from the full image. The
+        sequential path is the original per-tile ``app.get`` loop, kept for
+        parity checks; it merges duplicates to the best tile's embedding.
+
+        ``tiling`` picks the planner strategy; the chosen plan is written to
+        ``report["tiling"]`` when a report dict is given.
+        """
+        with stage(report, "tiling"):
+            plan = self.plan_tiles(full_img, tiling)
+            tiles = self._get_smart_tiles(full_img, plan)
+        if report is not None:
+            report["tiling"] = plan.as_dict()
+        if batched:
+            with stage(report, "detection"):
+                detections = self._detect_tiles(tiles)
+            with stage(report, "nms"):
+                unique_faces = self._simple_nms(detections)
+            unique_faces = self._gate_faces(full_img, unique_faces, report)
+            with stage(report, "recognition"):
+                self._embed_faces(full_img, unique_faces)
+            return unique_faces
 
-        for y_start, y_end in y_intervals:
-            for x_start, x_end in x_intervals:
-                tile = full_img[y_start:y_end, x_start:x_end]
-                tiles.append((tile, x_start, y_start))
+        all_detections = []
+        for tile_img, off_x, off_y in tiles:
+            # app.get detects and embeds in one call
+            with stage(report, "detection"):
+                faces = self.app.get(tile_img)
+            for face in faces:
+                face.bbox[0] += off_x
+                face.bbox[1] += off_y
+                face.bbox[2] += off_x
+                face.bbox[3] += off_y
+                face.kps[:, 0] += off_x
+                face.kps[:, 1] += off_y
+                all_detections.append(face)
+        with stage(report, "nms"):
+            unique_faces = self._simple_nms(all_detections, merge_duplicates=True)
+        return self._gate_faces(full_img, unique_faces, report)
+
+    def detect_and_embed_incremental(
+        self,
+        full_img: np.ndarray,
+        gallery: GalleryMatcher,
+        tiling: str = AI_TILING,
+        report: Optional[Dict[str, object]] = None,
+        iou_thresh: float = 0.4,
+    ) -> List[Face]:
+        """
+        Early-exit variant of the batched ``detect_and_embed``.
+
+        Tiles are visited in priority order. A new detection overlapping a
+        face already confirmed (matched at ``AI_EARLY_EXIT_CONFIRM`` or
+        better) is a duplicate and is never embedded. Each tile's new faces
+        are matched against the students still unconfirmed, and the
+        remaining tiles are skipped once nobody is left. The caller still
+        runs one final one-to-one match over the returned faces.
+        """
+        h, w = full_img.shape[:2]
+        with stage(report, "tiling"):
+            plan = self.plan_tiles(full_img, tiling)
+            tiles = self._get_smart_tiles(full_img, plan)
+            order = priority_order(plan, h, w)
+
+        index = {reg_no: i for i, reg_no in enumerate(gallery.reg_nos)}
+        unconfirmed = np.ones(len(gallery), dtype=bool)
+        kept: List[Face] = []
+        confirmed: List[bool] = []
+        tiles_done = faces_skipped = 0
 
-        return tiles
+        for t in order:
+            if len(gallery) and not unconfirmed.any():
+                break
+            tiles_done += 1
+            new_faces: List[Face] = []
+            with stage(report, "detection"):
+                detections = self._detect_tiles([tiles[t]])
+            # gate first, so a kept face is only replaced by one that passes
+            candidates = self._gate_faces(full_img, self._simple_nms(detections, iou_thresh), report)
+            for face in candidates:
+                if kept:
+                    boxes = np.stack([k.bbox[:4] for k in kept])
+                    ious = _box_ious(face.bbox[:4], boxes)
+                    j = int(np.argmax(ious))
+                    if ious[j] >= iou_thresh:
+                        if confirmed[j] or kept[j].det_score >= face.det_score:
+                            faces_skipped += 1
+                            continue
+                        # better view of an unconfirmed face: replace it
+                        kept.pop(j)
+                        confirmed.pop(j)
+                new_faces.append(face)
+            if not new_faces:
+                continue
+
+            with stage(report, "recognition"):
+                self._embed_faces(full_img, new_faces)
+            with stage(report, "matching"):
+                matches = gallery.match(
+                    np.stack([f.normed_embedding for f in new_faces]), available=unconfirmed
+                )
+            for face, (name, sim) in zip(new_faces, matches):
+                sure = name != "Unknown" and sim >= AI_EARLY_EXIT_CONFIRM
+                if sure:
+                    unconfirmed[index[name]] = False
+                kept.append(face)
+                confirmed.append(sure)
+
+        if report is not None:
+            report["tiling"] = plan.as_dict()
+            report["early_exit"] = {
+                "tiles_processed": tiles_done,
+                "tiles_skipped": len(order) - tiles_done,
+                "faces_skipped": faces_skipped,
+                "roster_complete": bool(len(gallery)) and not unconfirmed.any(),
+            }
+        return kept
+
+    def extract_enrollment_embedding(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Return the normalized embedding of the single face in an enrollment
+        photo. Raises ValueError when there is no face, more than one, or
+        the face fails the (stricter) enrollment quality gate.
+        """
+        faces = self.app.get(frame)
+        if len(faces) == 0:
+            raise ValueError("No face detected in the image")
+        if len(faces) > 1:
+            raise ValueError(
+                f"Multiple faces ({len(faces)}) detected. Please upload an image with only one face."
+            )
+        if QUALITY_GATE:
+            reason = assess_face(frame, faces[0], ENROLLMENT_THRESHOLDS)
+            if reason is not None:
+                raise ValueError(f"{REASON_MESSAGES[reason]} ({reason}). Please upload a clearer photo.")
+        return faces[0].normed_embedding
 
     @staticmethod
-    def _simple_nms(faces, iou_thresh: float = 0.4):
-        """Removes duplicates from overlapping tiles."""
+    def _simple_nms(faces, iou_thresh: float = 0.4, merge_duplicates: bool = False):
+        """
+        Removes duplicates from overlapping tiles.
+
+        With ``merge_duplicates`` each kept face takes the embedding of the
+        highest-quality detection in its duplicate group (largest embedding
+        norm), so a face cut by one tile edge but whole in another is
+        recognised from the better crop.
+        """
         if not faces:
             return []
-        faces = sorted(faces, key=lambda x: x.det_score, reverse=True)
-        keep = []
-        while faces:
-            current = faces.pop(0)
-            keep.append(current)
-            remaining = []
-            for other in faces:
-                xA = max(current.bbox[0], other.bbox[0])
-                yA = max(current.bbox[1], other.bbox[1])
-                xB = min(current.bbox[2], other.bbox[2])
-                yB = min(current.bbox[3], other.bbox[3])
-                interArea = max(0, xB - xA) * max(0, yB - yA)
-                boxAArea = (current.bbox[2] - current.bbox[0]) * (
-                    current.bbox[3] - current.bbox[1]
-                )
-                boxBArea = (other.bbox[2] - other.bbox[0]) * (
-                    other.bbox[3] - other.bbox[1]
-                )
-                denom = float(boxAArea + boxBArea - interArea) or 1.0
-                iou = interArea / denom
-                if iou < iou_thresh:
-                    remaining.append(other)
-            faces = remaining
-        return keep
+        boxes = np.stack([np.asarray(f.bbox[:4], dtype=np.float32) for f in faces])
+        scores = np.array([f.det_score for f in faces], dtype=np.float32)
+        keep, owner = nms_groups(boxes, scores, iou_thresh)
+
+        if merge_duplicates and faces[0].embedding is not None:
+            norms = np.array([f.embedding_norm for f in faces], dtype=np.float32)
+            for k in keep:
+                members = np.flatnonzero(owner == k)
+                best = members[np.argmax(norms[members])]
+                if best != k:
+                    faces[k].embedding = faces[best].embedding
+        return [faces[k] for k in keep]
 
     @staticmethod
     def _find_match(
         face_embedding: np.ndarray, database: Dict[str, np.ndarray]
     ) -> Tuple[str, float]:
+        """Scalar reference matcher, kept for benchmarks; see GalleryMatcher."""
         best_name = "Unknown"
         highest_similarity = 0.0
         for name, db_embedding in database.items():
@@ -124,70 +345,242 @@ class FaceAttendanceEngine:
     def mark_attendance(
         self,
         full_img: np.ndarray,
-        embedding_db: Dict[str, np.ndarray],
+        embedding_db: Union[Dict[str, np.ndarray], GalleryMatcher],
+        batched: bool = True,
+        report: Optional[Dict[str, object]] = None,
+        early_exit: bool = AI_EARLY_EXIT,
+        draw: bool = True,
     ) -> Tuple[List[str], List[str], np.ndarray]:
         """
         Run detection + recognition on an image and return:
         - present_reg_nos
         - absent_reg_nos
         - annotated_image (for proof)
+
+        ``embedding_db`` may be a prebuilt GalleryMatcher or the plain
+        {reg_no: embedding} dict, which is packed on the fly.
+        ``batched=False`` falls back to the sequential per-tile pipeline.
+        ``early_exit`` uses ``detect_and_embed_incremental`` and stops once
+        the whole roster is matched.
+        Pass a ``report`` dict to collect tiling and detection diagnostics;
+        ``report["detections"]`` then holds every box, label and score so
+        that, with ``draw=False``, the proof can be rendered later, and
+        ``report["unmatched_embeddings"]`` the embeddings of faces that
+        matched nobody in the gallery (for an institution-wide lookup).
         """
         if full_img is None:
             raise ValueError("Input image is None")
 
-        tiles = self._get_smart_tiles(full_img)
-        all_detections = []
-        for tile_img, off_x, off_y in tiles:
-            faces = self.app.get(tile_img)
-            for face in faces:
-                face.bbox[0] += off_x
-                face.bbox[1] += off_y
-                face.bbox[2] += off_x
-                face.bbox[3] += off_y
-                face.kps[:, 0] += off_x
-                face.kps[:, 1] += off_y
-                all_detections.append(face)
+        if isinstance(embedding_db, GalleryMatcher):
+            gallery = embedding_db
+        else:
+            gallery = GalleryMatcher.from_dict(embedding_db)
 
-        unique_faces = self._simple_nms(all_detections)
-
-        present_list: List[str] = []
-        for face in unique_faces:
-            name, sim_score = self._find_match(face.normed_embedding, embedding_db)
-            box = face.bbox.astype(int)
-            color = (0, 0, 255)  # red default
-            label = f"Unknown"
-
-            if name != "Unknown":
-                present_list.append(name)
-                color = (0, 255, 0)
-                label = f"{name} ({int(sim_score * 100)}%)"
-
-            cv2.putText(
-                full_img,
-                label,
-                (box[0], box[1] - 10),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.8,
-                color,
-                2,
-            )
-            cv2.rectangle(
-                full_img, (box[0], box[1]), (box[2], box[3]), color, 2
-            )
+        if early_exit:
+            unique_faces = self.detect_and_embed_incremental(full_img, gallery, report=report)
+        else:
+            unique_faces = self.detect_and_embed(full_img, batched=batched, report=report)
+        if report is not None:
+            report["faces"] = len(unique_faces)
+        with stage(report, "matching"):
+            if unique_faces:
+                face_matrix = np.stack([f.normed_embedding for f in unique_faces])
+            else:
+                face_matrix = np.zeros((0, gallery.dim), dtype=np.float32)
+            matches = gallery.match(face_matrix)
+
+        detections = detections_from(unique_faces, matches)
+        if report is not None:
+            report["detections"] = detections
+            report["unmatched_embeddings"] = face_matrix[
+                [i for i, d in enumerate(detections) if d["label"] == "Unknown"]
+            ]
+        if draw:
+            with stage(report, "drawing"):
+                draw_detections(full_img, detections)
 
-        all_students = list(embedding_db.keys())
-        absent_list = [s for s in all_students if s not in present_list]
+        present_list = [d["label"] for d in detections if d["label"] != "Unknown"]
+        present_set = set(present_list)
+        absent_list = [s for s in gallery.reg_nos if s not in present_set]
         return present_list, absent_list, full_img
 
+    def mark_attendance_frames(
+        self,
+        frames: Iterable[np.ndarray],
+        embedding_db: Union[Dict[str, np.ndarray], GalleryMatcher],
+        report: Optional[Dict[str, object]] = None,
+        draw: bool = True,
+    ) -> Tuple[List[str], List[str], Optional[np.ndarray]]:
+        """
+        Multi-frame variant of ``mark_attendance`` for a video clip or burst.
+
+        Faces are tracked between frames by box overlap; a face on a track
+        already tied to a student is not embedded again. Stops as soon as
+        every student in the gallery has been seen. The proof image is the
+        frame with the most recognised faces (None if no frames), annotated
+        unless ``draw=False``; its detections go to ``report["detections"]``.
+        """
+        if isinstance(embedding_db, GalleryMatcher):
+            gallery = embedding_db
+        else:
+            gallery = GalleryMatcher.from_dict(embedding_db)
+
+        tracker = IdentityTracker()
+        present: Dict[str, None] = {}  # insertion-ordered set
+        best_frame: Optional[np.ndarray] = None
+        best_detections: List[Dict[str, object]] = []
+        best_count = -1
+        frames_seen = embedded = reused = 0
+        early_stop = False
+
+        for frame in frames:
+            frames_seen += 1
+            with stage(report, "tiling"):
+                plan = self.plan_tiles(frame)
+                tiles = self._get_smart_tiles(frame, plan)
+            with stage(report, "detection"):
+                detections = self._detect_tiles(tiles)
+            with stage(report, "nms"):
+                faces = self._simple_nms(detections)
+            faces = self._gate_faces(frame, faces, report)
+            previous = tracker.match([f.bbox for f in faces])
+
+            # Only faces not already tied to a student need recognition
+            pending = [i for i, t in enumerate(previous) if t is None or t.reg_no is None]
+            pending_faces = [faces[i] for i in pending]
+            with stage(report, "recognition"):
+                self._embed_faces(frame, pending_faces)
+            embedded += len(pending_faces)
+            reused += len(faces) - len(pending_faces)
+
+            matches: List[Tuple[str, float]] = [
+                (t.reg_no, t.similarity) if t is not None and t.reg_no else ("Unknown", 0.0)
+                for t in previous
+            ]
+            if pending_faces:
+                face_matrix = np.stack([f.normed_embedding for f in pending_faces])
+                with stage(report, "matching"):
+                    for i, match in zip(pending, gallery.match(face_matrix)):
+                        matches[i] = match
+
+            tracker.update([
+                Track(f.bbox[:4].astype(np.float32), None if name == "Unknown" else name, sim)
+                for f, (name, sim) in zip(faces, matches)
+            ])
+            detections = detections_from(faces, matches)
+            recognised = [d["label"] for d in detections if d["label"] != "Unknown"]
+            for reg_no in recognised:
+                present[reg_no] = None
+            if len(recognised) > best_count:
+                best_count, best_frame, best_detections = len(recognised), frame, detections
 
-# Singleton instance
+            if len(gallery) and len(present) == len(gallery):
+                early_stop = True
+                break
+
+        if best_frame is not None and draw:
+            with stage(report, "drawing"):
+                draw_detections(best_frame, best_detections)
+        if report is not None:
+            report.update(
+                frames=frames_seen,
+                faces_embedded=embedded,
+                faces_reused=reused,
+                early_stop=early_stop,
+                detections=best_detections,
+            )
+        present_list = list(present)
+        absent_list = [s for s in gallery.reg_nos if s not in present]
+        return present_list, absent_list, best_frame
+
+
+# Process-wide engine registry. Enrollment, /attendance/auto and the job
+# workers all share this one instance; ONNX Runtime sessions are safe to run
+# from several threads, so only construction needs the lock.
 _engine_instance = None
+_engine_lock = threading.Lock()
+_engine_stats: Dict[str, object] = {
+    "loaded": False,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "rss_before_load_mb": None,
+    "rss_after_load_mb": None,
+    "providers": None,
+    "runtime": None,
+    "runtime_benchmark": None,
+}
+
+
+def _proc_status_mb(field: str) -> Optional[float]:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _current_rss_mb() -> float:
+    """Resident set size of this process in MB (peak RSS where /proc is missing)."""
+    rss = _proc_status_mb("VmRSS:")
+    if rss is not None:
+        return rss
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def _peak_rss_mb() -> float:
+    """High-water resident set size of this process in MB."""
+    peak = _proc_status_mb("VmHWM:")
+    return peak if peak is not None else _current_rss_mb()
+
 
 def get_engine() -> FaceAttendanceEngine:
     global _engine_instance
     if _engine_instance is None:
-        print("🔵 Loading InsightFace AI models (Lazy Load)...")
-        _engine_instance = FaceAttendanceEngine()
-        print("✅ InsightFace models loaded successfully")
+        with _engine_lock:
+            if _engine_instance is None:
+                print("🔵 Loading InsightFace AI models (Lazy Load)...")
+                rss_before = _current_rss_mb()
+                started = time.perf_counter()
+                engine = FaceAttendanceEngine()
+                _engine_stats.update(
+                    loaded=True,
+                    load_seconds=round(time.perf_counter() - started, 3),
+                    rss_before_load_mb=rss_before,
+                    rss_after_load_mb=_current_rss_mb(),
+                    providers=_get_providers(),
+                    runtime=engine.settings.as_dict(),
+                )
+                _engine_instance = engine
+                print(f"✅ InsightFace models loaded successfully in {_engine_stats['load_seconds']}s")
     return _engine_instance
 
+
+def warm_up_engine(benchmark: bool = AI_SELF_BENCHMARK) -> FaceAttendanceEngine:
+    """
+    Load the models and run one dummy detection so the first request is not
+    slow. With ``benchmark``, also time the runtime settings on this host.
+    """
+    engine = get_engine()
+    started = time.perf_counter()
+    w, h = engine.det_size
+    engine.app.det_model.detect(np.zeros((h, w, 3), dtype=np.uint8), max_num=0, metric="default")
+    _engine_stats["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    if benchmark:
+        report = self_benchmark(engine.app, _get_providers(), engine.settings)
+        _engine_stats["runtime_benchmark"] = report
+        print(f"⏱️ Fastest ONNX settings on this host: {report['fastest']}")
+    return engine
+
+
+def get_engine_stats() -> Dict[str, object]:
+    """Load time and memory of the shared engine, plus the current process RSS."""
+    stats = dict(_engine_stats)
+    stats["rss_now_mb"] = _current_rss_mb()
+    return stats
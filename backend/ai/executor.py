@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from backend.config import AI_MAX_QUEUE, AI_MAX_WORKERS
+
+
+class InferencePoolSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class InferencePool:
+    """
+    Bounded thread pool for the image pipeline (decode, detection,
+    recognition). OpenCV and ONNX Runtime release the GIL, so threads keep
+    the event loop free while sharing the single loaded engine.
+
+    At most ``max_workers`` jobs run and ``max_queue`` more may wait; any
+    further submission is rejected immediately instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self._completed = 0
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, block: bool = False, **kwargs: Any) -> Future:
+        """
+        Queue ``fn``. Raises InferencePoolSaturated when full, unless
+        ``block`` is set, in which case the caller waits for a free slot
+        (used by background job workers, never by request handlers).
+        """
+        if not self._slots.acquire(blocking=block):
+            with self._lock:
+                self._rejected += 1
+            raise InferencePoolSaturated(
+                f"Inference pool is full ({self.max_workers} running, {self.max_queue} queued)"
+            )
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Submit from async code and await the result without blocking the loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = self._pending
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": min(pending, self.max_workers),
+                "queued": max(0, pending - self.max_workers),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+
+_pool_instance = None
+_pool_lock = threading.Lock()
+
+
+def get_inference_pool() -> InferencePool:
+    global _pool_instance
+    if _pool_instance is None:
+        with _pool_lock:
+            if _pool_instance is None:
+                _pool_instance = InferencePool(AI_MAX_WORKERS, AI_MAX_QUEUE)
+    return _pool_instance
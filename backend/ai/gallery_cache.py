@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.ai.embeddings import EMBEDDING_DIM, pack_embeddings
+from backend.ai.matcher import GalleryMatcher
+from backend.config import GALLERY_CACHE_MAX_MB, GALLERY_CACHE_TTL_SECONDS
+
+
+class ClassGalleryCache:
+    """
+    LRU cache of packed class galleries keyed by ``class_id``.
+
+    Each entry is a GalleryMatcher (n_students x 512 float32 matrix plus the
+    reg_no index). Entries are evicted least-recently-used once the total
+    matrix size exceeds ``max_bytes``. A per-class generation counter makes
+    sure a gallery loaded while an invalidation was in flight is not stored.
+
+    Invalidation only reaches this process, so entries also expire after
+    ``ttl_seconds`` to bound staleness when several workers run.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, GalleryMatcher]" = OrderedDict()
+        self._loaded_at: Dict[str, float] = {}
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, class_id: str) -> int:
+        with self._lock:
+            return self._generations.get(class_id, 0)
+
+    def get(self, class_id: str) -> Optional[GalleryMatcher]:
+        with self._lock:
+            gallery = self._entries.get(class_id)
+            if gallery is not None and time.monotonic() - self._loaded_at[class_id] > self.ttl_seconds:
+                self._bytes -= self._entries.pop(class_id).nbytes
+                gallery = None
+            if gallery is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(class_id)
+            self.hits += 1
+            return gallery
+
+    def put(self, class_id: str, gallery: GalleryMatcher, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(class_id, 0) != generation:
+                return  # roster changed while this gallery was loading
+            if gallery.nbytes > self.max_bytes:
+                return
+            old = self._entries.pop(class_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[class_id] = gallery
+            self._loaded_at[class_id] = time.monotonic()
+            self._bytes += gallery.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def invalidate(self, *class_ids: Optional[str]) -> None:
+        with self._lock:
+            for class_id in class_ids:
+                if class_id is None:
+                    continue
+                self._generations[class_id] = self._generations.get(class_id, 0) + 1
+                old = self._entries.pop(class_id, None)
+                if old is not None:
+                    self._bytes -= old.nbytes
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for class_id in self._entries:
+                self._generations[class_id] = self._generations.get(class_id, 0) + 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+gallery_cache = ClassGalleryCache(GALLERY_CACHE_MAX_MB * 1024 * 1024, GALLERY_CACHE_TTL_SECONDS)
+
+
+def load_class_gallery(db: Session, class_id: str) -> GalleryMatcher:
+    """
+    Build a class gallery: centroids from one Student x FaceProfile query
+    and every enrollment sample from one Student x FaceEmbedding query.
+    """
+    rows = (
+        db.query(
+            models.Student.reg_no,
+            models.FaceProfile.embedding_blob,
+            models.FaceProfile.embedding_dtype,
+            models.FaceProfile.embedding_vector,
+        )
+        .join(models.FaceProfile, models.FaceProfile.reg_no == models.Student.reg_no)
+        .filter(models.Student.class_id == class_id)
+        .order_by(models.Student.reg_no)
+        .all()
+    )
+    binary = [(reg_no, blob, dtype) for reg_no, blob, dtype, _ in rows if blob]
+    legacy = [(reg_no, vec) for reg_no, blob, _, vec in rows if not blob and vec]
+    if not binary and not legacy:
+        return GalleryMatcher([], np.zeros((0, EMBEDDING_DIM), dtype=np.float32))
+
+    reg_nos = [r for r, _, _ in binary] + [r for r, _ in legacy]
+    parts = [pack_embeddings([b for _, b, _ in binary], [d for _, _, d in binary])]
+    if legacy:
+        # rows not yet converted by migrate_embeddings.py
+        parts.append(np.asarray([vec for _, vec in legacy], dtype=np.float32))
+    centroids = np.vstack(parts)
+
+    # Every enrollment sample for the class, in one query
+    index = {reg_no: i for i, reg_no in enumerate(reg_nos)}
+    sample_rows = [
+        (index[reg_no], blob, dtype)
+        for reg_no, blob, dtype in (
+            db.query(
+                models.FaceEmbedding.reg_no,
+                models.FaceEmbedding.embedding_blob,
+                models.FaceEmbedding.embedding_dtype,
+            )
+            .join(models.Student, models.Student.reg_no == models.FaceEmbedding.reg_no)
+            .filter(models.Student.class_id == class_id)
+            .all()
+        )
+        if reg_no in index
+    ]
+    owners = [i for i, _, _ in sample_rows]
+    samples = pack_embeddings([b for _, b, _ in sample_rows], [d for _, _, d in sample_rows])
+    # Students enrolled before multi-sample galleries use their centroid as the only sample
+    missing = sorted(set(range(len(reg_nos))) - set(owners))
+    if missing:
+        samples = np.vstack([samples, centroids[missing]])
+        owners.extend(missing)
+    return GalleryMatcher(reg_nos, centroids, samples=samples, sample_owner=np.asarray(owners))
+
+
+def get_class_gallery(db: Session, class_id: str) -> GalleryMatcher:
+    gallery = gallery_cache.get(class_id)
+    if gallery is not None:
+        return gallery
+    generation = gallery_cache.generation(class_id)
+    gallery = load_class_gallery(db, class_id)
+    gallery_cache.put(class_id, gallery, generation)
+    return gallery
@@ -0,0 +1,132 @@
+"""
+Ingest stage for classroom uploads: spooled upload -> one encoded buffer ->
+a frame no larger than detection needs.
+
+The encoded bytes are copied once, in chunks, from the upload's spooled
+file into a NumPy buffer (kept as the proof source). JPEG and PNG headers
+are read first so a much larger photo can be decoded straight at 1/2, 1/4
+or 1/8 size with ``cv2.IMREAD_REDUCED_*``; whatever still exceeds the pixel
+budget is resized down before any tiling.
+"""
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from backend.config import INGEST_MAX_PIXELS, INGEST_MAX_SIDE
+
+
+CHUNK_SIZE = 1 << 20
+
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+@dataclass
+class IngestedImage:
+    encoded: np.ndarray  # 1-D uint8 copy of the upload
+    frame: np.ndarray  # BGR frame handed to the engine
+    source_size: Optional[Tuple[int, int]]  # (width, height) from the header, if parsed
+    reduction: int  # IMREAD_REDUCED_* factor used (1 = full decode)
+    resized: bool  # resized after decode to meet the pixel budget
+    peak_bytes: int  # largest total of buffers held at once while ingesting
+
+    def describe(self) -> Dict[str, object]:
+        h, w = self.frame.shape[:2]
+        return {
+            "width": w,
+            "height": h,
+            "source_width": self.source_size[0] if self.source_size else None,
+            "source_height": self.source_size[1] if self.source_size else None,
+            "reduction": self.reduction,
+            "resized": self.resized,
+        }
+
+
+def read_spooled(fileobj: BinaryIO) -> np.ndarray:
+    """Copy a (spooled) upload file into one uint8 buffer, chunk by chunk."""
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    buf = np.empty(size, dtype=np.uint8)
+    pos = 0
+    while pos < size:
+        chunk = fileobj.read(min(CHUNK_SIZE, size - pos))
+        if not chunk:
+            break
+        buf[pos:pos + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+        pos += len(chunk)
+    return buf[:pos]
+
+
+def image_size(buf) -> Optional[Tuple[int, int]]:
+    """(width, height) from a JPEG SOF or PNG IHDR header without decoding, else None."""
+    data = memoryview(buf).cast("B")
+    if len(data) >= 24 and bytes(data[:8]) == b"\x89PNG\r\n\x1a\n":
+        w, h = struct.unpack(">II", bytes(data[16:24]))
+        return w, h
+    if len(data) < 4 or bytes(data[:2]) != b"\xff\xd8":
+        return None
+    pos = 2
+    while pos + 9 < len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        length = struct.unpack(">H", bytes(data[pos + 2:pos + 4]))[0]
+        # SOF0-SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h, w = struct.unpack(">HH", bytes(data[pos + 5:pos + 9]))
+            return w, h
+        pos += 2 + length
+    return None
+
+
+def _reduction_for(size: Optional[Tuple[int, int]], max_side: int, max_pixels: int) -> int:
+    """Smallest IMREAD_REDUCED factor that brings the image within both limits (at most 8)."""
+    if size is None:
+        return 1
+    w, h = size
+    for factor in (1, 2, 4, 8):
+        if max(w, h) / factor <= max_side and (w * h) / (factor * factor) <= max_pixels:
+            return factor
+    return 8
+
+
+def decode_image(
+    buf: np.ndarray,
+    max_side: int = INGEST_MAX_SIDE,
+    max_pixels: int = INGEST_MAX_PIXELS,
+) -> Optional[IngestedImage]:
+    """Decode within the side/pixel budget; None when the bytes are not an image."""
+    size = image_size(buf)
+    factor = _reduction_for(size, max_side, max_pixels)
+    frame = cv2.imdecode(buf, _REDUCED_FLAGS[factor])
+    if frame is None and factor > 1:
+        # some encoders' files do not support scaled decoding
+        factor = 1
+        frame = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    if frame is None:
+        return None
+
+    resized = False
+    peak = buf.nbytes + frame.nbytes
+    h, w = frame.shape[:2]
+    scale = min(1.0, max_side / max(w, h), (max_pixels / float(w * h)) ** 0.5)
+    if scale < 1.0:
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        peak += small.nbytes
+        frame = small  # the full decode is freed here
+        resized = True
+    return IngestedImage(buf, frame, size, factor, resized, peak)
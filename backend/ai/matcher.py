@@ -0,0 +1,144 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.config import GALLERY_MATCH_MODE
+
+
+SIMILARITY_THRESHOLD = 0.4  # how strict the match is
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class GalleryMatcher:
+    """
+    Packed gallery of one class's face embeddings.
+
+    All enrolled embeddings live in a single contiguous (n_students x d)
+    float32 matrix, so every detected face is scored against every student
+    with one matrix multiply instead of a Python loop of cosine calls.
+
+    ``matrix`` holds one row per student (their centroid). Optionally
+    ``samples`` holds every enrollment embedding with ``sample_owner`` giving
+    the student row each belongs to; in "max" mode a face is scored against
+    all samples in one product and each student keeps their best sample.
+    """
+
+    def __init__(
+        self,
+        reg_nos: Sequence[str],
+        matrix: np.ndarray,
+        samples: Optional[np.ndarray] = None,
+        sample_owner: Optional[np.ndarray] = None,
+        mode: str = GALLERY_MATCH_MODE,
+    ) -> None:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(reg_nos):
+            raise ValueError("Gallery matrix must be (n_students, dim)")
+        if mode not in ("max", "centroid"):
+            raise ValueError(f"Unknown gallery match mode {mode!r}")
+        self.reg_nos: List[str] = list(reg_nos)
+        self.matrix = np.ascontiguousarray(_l2_normalize(matrix))
+        self.mode = mode
+        self.samples: Optional[np.ndarray] = None
+        self._sample_starts: Optional[np.ndarray] = None
+
+        if samples is not None and len(self.reg_nos) > 0:
+            samples = np.asarray(samples, dtype=np.float32)
+            owner = np.asarray(sample_owner, dtype=np.int64)
+            if samples.ndim != 2 or samples.shape[0] != owner.shape[0]:
+                raise ValueError("samples must be (n_samples, dim) with one owner per row")
+            if np.bincount(owner, minlength=len(self.reg_nos)).min() == 0:
+                raise ValueError("Every student needs at least one sample")
+            order = np.argsort(owner, kind="stable")
+            self.samples = np.ascontiguousarray(_l2_normalize(samples[order]))
+            # first sample row of each student, for np.maximum.reduceat
+            self._sample_starts = np.searchsorted(owner[order], np.arange(len(self.reg_nos)))
+
+    @classmethod
+    def from_dict(cls, database: Dict[str, np.ndarray]) -> "GalleryMatcher":
+        """Build a gallery from the legacy {reg_no: embedding} mapping."""
+        reg_nos = list(database.keys())
+        if not reg_nos:
+            return cls([], np.zeros((0, 512), dtype=np.float32))
+        matrix = np.stack(
+            [np.asarray(database[r], dtype=np.float32).ravel() for r in reg_nos]
+        )
+        return cls(reg_nos, matrix)
+
+    def __len__(self) -> int:
+        return len(self.reg_nos)
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + (self.samples.nbytes if self.samples is not None else 0)
+
+    def similarities(self, embeddings: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every face (rows) against every student (cols)."""
+        faces = np.asarray(embeddings, dtype=np.float32)
+        if faces.ndim == 1:
+            faces = faces[None, :]
+        if faces.shape[0] == 0 or len(self) == 0:
+            return np.zeros((faces.shape[0], len(self)), dtype=np.float32)
+        faces = _l2_normalize(faces)
+        if self.mode == "max" and self.samples is not None:
+            per_sample = faces @ self.samples.T
+            return np.maximum.reduceat(per_sample, self._sample_starts, axis=1)
+        return faces @ self.matrix.T
+
+    def match(
+        self,
+        embeddings: np.ndarray,
+        threshold: float = SIMILARITY_THRESHOLD,
+        available: Optional[np.ndarray] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Match detected faces to students one-to-one, most similar pair
+        first: a face keeps its best student even when that leaves another
+        face unmatched, so a weak second choice never marks someone present.
+
+        Returns one (reg_no, similarity) per input face, in input order.
+        Faces that are not assigned to a student above ``threshold`` come
+        back as ("Unknown", best_similarity), so no student is ever
+        counted twice for the same photo. ``available`` is an optional
+        boolean mask over students; masked-out students are never assigned.
+        """
+        sims = self.similarities(embeddings)
+        n_faces = sims.shape[0]
+        if n_faces == 0:
+            return []
+
+        results: List[Tuple[str, float]] = [
+            ("Unknown", float(sims[i].max(initial=0.0)))
+            for i in range(n_faces)
+        ]
+        if len(self) == 0:
+            return results
+
+        valid = sims > threshold
+        if available is not None:
+            valid &= np.asarray(available, dtype=bool)[None, :]
+        if not valid.any():
+            return results
+        # Greedy over the pairs above the threshold, by descending similarity
+        rows, cols = np.nonzero(valid)
+        order = np.argsort(-sims[rows, cols], kind="stable")
+        face_done = np.zeros(n_faces, dtype=bool)
+        student_done = np.zeros(len(self), dtype=bool)
+        for face_idx, student_idx in zip(rows[order], cols[order]):
+            if face_done[face_idx] or student_done[student_idx]:
+                continue
+            face_done[face_idx] = student_done[student_idx] = True
+            results[face_idx] = (
+                self.reg_nos[student_idx],
+                float(sims[face_idx, student_idx]),
+            )
+        return results
@@ -0,0 +1,336 @@
+"""
+Micro-benchmarks for the AI attendance pipeline building blocks.
+
+Run from the project root, e.g.:
+
+    python -m backend.ai.microbench matcher --students 120 --faces 80
+    python -m backend.ai.microbench nms --boxes 50 200 1000
+    python -m backend.ai.microbench parity --image classroom.jpg --gallery enroll_photos/
+    python -m backend.ai.microbench tiling --sizes 640x480 4032x3024 [--with-model]
+
+Only ``parity`` and ``tiling --with-model`` load the InsightFace models.
+"""
+import argparse
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from backend.ai.engine import FaceAttendanceEngine
+from backend.ai.matcher import GalleryMatcher
+from backend.ai.nms import nms
+from backend.ai.tiling import TilePlan, fixed_plan, grid_plan
+from backend.config import AI_TILING
+
+
+def _random_embeddings(rng: np.random.Generator, n: int, dim: int = 512) -> np.ndarray:
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _time_it(fn: Callable[[], object], repeat: int) -> float:
+    """Best-of-``repeat`` wall time in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def bench_matcher(students: int, faces: int, repeat: int, seed: int) -> Dict[str, float]:
+    rng = np.random.default_rng(seed)
+    gallery = _random_embeddings(rng, students)
+    database = {f"REG{i:04d}": gallery[i] for i in range(students)}
+
+    # Detected faces are noisy copies of enrolled students plus strangers.
+    known = min(faces, students)
+    probes = gallery[rng.permutation(students)[:known]] + 0.05 * _random_embeddings(rng, known)
+    if faces > known:
+        probes = np.vstack([probes, _random_embeddings(rng, faces - known)])
+
+    def loop() -> None:
+        for emb in probes:
+            FaceAttendanceEngine._find_match(emb, database)
+
+    matcher = GalleryMatcher.from_dict(database)
+
+    def vectorized() -> None:
+        matcher.match(probes)
+
+    def vectorized_with_build() -> None:
+        GalleryMatcher.from_dict(database).match(probes)
+
+    loop_ms = _time_it(loop, repeat)
+    vec_ms = _time_it(vectorized, repeat)
+    build_ms = _time_it(vectorized_with_build, repeat)
+    return {
+        "students": students,
+        "faces": faces,
+        "loop_ms": round(loop_ms, 3),
+        "matrix_ms": round(vec_ms, 3),
+        "matrix_incl_build_ms": round(build_ms, 3),
+        "speedup": round(loop_ms / vec_ms, 1) if vec_ms else float("inf"),
+    }
+
+
+def _reference_nms(faces, iou_thresh: float = 0.4):
+    """The original pop(0)/list-rebuild NMS, used as the benchmark baseline."""
+    faces = sorted(faces, key=lambda x: x.det_score, reverse=True)
+    keep = []
+    while faces:
+        current = faces.pop(0)
+        keep.append(current)
+        remaining = []
+        for other in faces:
+            xA = max(current.bbox[0], other.bbox[0])
+            yA = max(current.bbox[1], other.bbox[1])
+            xB = min(current.bbox[2], other.bbox[2])
+            yB = min(current.bbox[3], other.bbox[3])
+            interArea = max(0, xB - xA) * max(0, yB - yA)
+            boxAArea = (current.bbox[2] - current.bbox[0]) * (current.bbox[3] - current.bbox[1])
+            boxBArea = (other.bbox[2] - other.bbox[0]) * (other.bbox[3] - other.bbox[1])
+            denom = float(boxAArea + boxBArea - interArea) or 1.0
+            if interArea / denom < iou_thresh:
+                remaining.append(other)
+        faces = remaining
+    return keep
+
+
+def _synthetic_detections(rng: np.random.Generator, n: int) -> np.ndarray:
+    """(n, 5) boxes+scores: ~1/3 unique faces, the rest jittered tile duplicates."""
+    n_unique = max(1, n // 3)
+    xy = rng.uniform(0, 4000, size=(n_unique, 2))
+    size = rng.uniform(30, 120, size=(n_unique, 1))
+    base = np.hstack([xy, xy + size])
+    picks = base[rng.integers(0, n_unique, size=n)]
+    picks += rng.normal(0, 3, size=picks.shape)
+    scores = rng.uniform(0.5, 1.0, size=(n, 1))
+    return np.hstack([picks, scores]).astype(np.float32)
+
+
+def bench_nms(sizes: List[int], repeat: int, seed: int) -> List[Dict[str, float]]:
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in sizes:
+        dets = _synthetic_detections(rng, n)
+        faces = [SimpleNamespace(bbox=d[:4], det_score=d[4]) for d in dets]
+        boxes, scores = dets[:, :4], dets[:, 4]
+        kept_ref = len(_reference_nms(faces))
+        kept_vec = len(nms(boxes, scores))
+        ref_ms = _time_it(lambda: _reference_nms(faces), repeat)
+        vec_ms = _time_it(lambda: nms(boxes, scores), repeat)
+        results.append({
+            "boxes": n,
+            "kept": kept_vec,
+            "same_result": kept_ref == kept_vec,
+            "python_ms": round(ref_ms, 3),
+            "numpy_ms": round(vec_ms, 3),
+            "speedup": round(ref_ms / vec_ms, 1) if vec_ms else float("inf"),
+        })
+    return results
+
+
+def _box_iou(a: np.ndarray, b: np.ndarray) -> float:
+    xA, yA = max(a[0], b[0]), max(a[1], b[1])
+    xB, yB = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, xB - xA) * max(0.0, yB - yA)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+def check_parity(
+    engine: FaceAttendanceEngine,
+    img: np.ndarray,
+    gallery: Optional[GalleryMatcher] = None,
+    iou_thresh: float = 0.5,
+    tiling: str = AI_TILING,
+) -> Dict[str, object]:
+    """
+    Compare the sequential and batched detection/recognition paths on one
+    image: every sequential box must have a batched box on top of it, and
+    both paths must assign the same student to each pair of boxes when
+    matched against ``gallery``. Without a gallery the batched faces are
+    matched against the sequential ones, which only checks consistency.
+    """
+    seq_faces = engine.detect_and_embed(img.copy(), batched=False, tiling=tiling)
+    bat_faces = engine.detect_and_embed(img.copy(), batched=True, tiling=tiling)
+
+    pairs = []
+    used = set()
+    for i, sf in enumerate(seq_faces):
+        best_j, best_iou = -1, 0.0
+        for j, bf in enumerate(bat_faces):
+            if j in used:
+                continue
+            iou = _box_iou(sf.bbox, bf.bbox)
+            if iou > best_iou:
+                best_j, best_iou = j, iou
+        if best_iou >= iou_thresh:
+            used.add(best_j)
+            pairs.append((i, best_j))
+
+    if gallery is None and seq_faces:
+        gallery = GalleryMatcher(
+            [f"F{i}" for i in range(len(seq_faces))],
+            np.stack([f.normed_embedding for f in seq_faces]),
+        )
+    seq_ids: List[str] = []
+    bat_ids: List[str] = []
+    if gallery is not None and len(gallery):
+        if seq_faces:
+            seq_ids = [name for name, _ in gallery.match(np.stack([f.normed_embedding for f in seq_faces]))]
+        if bat_faces:
+            bat_ids = [name for name, _ in gallery.match(np.stack([f.normed_embedding for f in bat_faces]))]
+    identity_agree = sum(1 for i, j in pairs if seq_ids and bat_ids and seq_ids[i] == bat_ids[j])
+    seq_students = sorted(name for name in seq_ids if name != "Unknown")
+    bat_students = sorted(name for name in bat_ids if name != "Unknown")
+
+    return {
+        "sequential_faces": len(seq_faces),
+        "batched_faces": len(bat_faces),
+        "boxes_matched": len(pairs),
+        "identities_agree": identity_agree,
+        "sequential_students": seq_students,
+        "batched_students": bat_students,
+        "parity": (
+            len(pairs) == len(seq_faces) == len(bat_faces) == identity_agree
+            and seq_students == bat_students
+        ),
+    }
+
+
+def load_gallery(engine: FaceAttendanceEngine, folder: str) -> GalleryMatcher:
+    """One enrollment photo per student, named ``<reg_no>.<ext>``."""
+    reg_nos, vectors = [], []
+    for path in sorted(Path(folder).iterdir()):
+        img = cv2.imread(str(path))
+        if img is None:
+            continue
+        reg_nos.append(path.stem)
+        vectors.append(engine.extract_enrollment_embedding(img))
+    if not reg_nos:
+        raise ValueError(f"No readable photos in {folder}")
+    return GalleryMatcher(reg_nos, np.stack(vectors))
+
+
+def _synthetic_classroom(rng: np.random.Generator, w: int, h: int) -> Tuple[np.ndarray, float]:
+    """
+    A classroom-like test image: rows of face-coloured ellipses that shrink
+    towards the back (top) of the room. Returns the image and the smallest
+    face height in pixels.
+    """
+    img = np.full((h, w, 3), 90, dtype=np.uint8)
+    img[: h // 4] = 160  # wall
+    rows = 6
+    smallest = float(h)
+    for r in range(rows):
+        # front row faces are ~8% of the image height, back row ~2%
+        face_h = h * (0.02 + 0.06 * r / (rows - 1))
+        y = int(h * (0.3 + 0.6 * r / (rows - 1)))
+        per_row = max(4, int(w / (face_h * 2.5)))
+        for c in range(per_row):
+            x = int((c + 0.5) * w / per_row + rng.normal(0, face_h * 0.2))
+            axes = (max(1, int(face_h * 0.4)), max(1, int(face_h * 0.5)))
+            cv2.ellipse(img, (x, y), axes, 0, 0, 360, (120, 160, 210), -1)
+        smallest = min(smallest, face_h)
+    return img, smallest
+
+
+def _plan_cost(plan: TilePlan, det_size: Tuple[int, int], smallest_face: float) -> Dict[str, object]:
+    """Detector calls and the back-row face size after each tile is resized to det_size."""
+    scales = [
+        min(det_size[0] / (x1 - x0), det_size[1] / (y1 - y0), 1.0)
+        for x0, y0, x1, y1 in plan.tiles
+    ]
+    return {
+        **plan.as_dict(),
+        "detector_calls": len(plan.tiles) + (1 if plan.strategy == "density" else 0),
+        "smallest_face_at_detector_px": round(smallest_face * min(scales), 1),
+    }
+
+
+def bench_tiling(
+    sizes: List[Tuple[int, int]], repeat: int, seed: int, with_model: bool = False
+) -> List[Dict[str, object]]:
+    """
+    Compare the fixed 2x3 grid with the adaptive planners on synthetic
+    classroom images. Without the models only the plans are compared; with
+    ``with_model`` each strategy's detection pass is also timed.
+    """
+    rng = np.random.default_rng(seed)
+    det_size = (640, 640)
+    engine = FaceAttendanceEngine() if with_model else None
+    results = []
+    for w, h in sizes:
+        img, smallest = _synthetic_classroom(rng, w, h)
+        plans = {"fixed": fixed_plan(h, w), "adaptive": grid_plan(h, w, det_size)}
+        if engine is not None:
+            plans["density"] = engine.plan_tiles(img, "density")
+        for name, plan in plans.items():
+            row = {"image": f"{w}x{h}", "strategy": name, **_plan_cost(plan, det_size, smallest)}
+            if engine is not None:
+                row["detect_ms"] = round(_time_it(
+                    lambda: engine.detect_and_embed(img, tiling=name), repeat
+                ), 1)
+            results.append(row)
+    return results
+
+
+def _parse_size(value: str) -> Tuple[int, int]:
+    w, _, h = value.lower().partition("x")
+    return int(w), int(h)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p_match = sub.add_parser("matcher", help="loop vs packed-matrix face matching")
+    p_match.add_argument("--students", type=int, default=120)
+    p_match.add_argument("--faces", type=int, default=80)
+
+    p_nms = sub.add_parser("nms", help="pure-Python vs NumPy NMS")
+    p_nms.add_argument("--boxes", type=int, nargs="+", default=[50, 200, 1000])
+
+    p_parity = sub.add_parser("parity", help="sequential vs batched inference on a real photo")
+    p_parity.add_argument("--image", required=True)
+    p_parity.add_argument("--gallery", default=None, help="folder of <reg_no>.jpg enrollment photos")
+
+    p_tiling = sub.add_parser("tiling", help="fixed vs adaptive tiling on synthetic classroom images")
+    p_tiling.add_argument(
+        "--sizes", type=_parse_size, nargs="+",
+        default=[(640, 480), (1920, 1080), (4032, 3024), (8000, 6000)],
+    )
+    p_tiling.add_argument("--with-model", action="store_true", help="also time detection per strategy")
+
+    args = parser.parse_args()
+    if args.bench == "matcher":
+        print(bench_matcher(args.students, args.faces, args.repeat, args.seed))
+    elif args.bench == "nms":
+        for row in bench_nms(args.boxes, args.repeat, args.seed):
+            print(row)
+    elif args.bench == "parity":
+        img = cv2.imread(args.image)
+        if img is None:
+            parser.error(f"Could not read image {args.image}")
+        engine = FaceAttendanceEngine()
+        gallery = load_gallery(engine, args.gallery) if args.gallery else None
+        result = check_parity(engine, img, gallery)
+        result["sequential_ms"] = round(_time_it(lambda: engine.detect_and_embed(img, batched=False), args.repeat), 1)
+        result["batched_ms"] = round(_time_it(lambda: engine.detect_and_embed(img, batched=True), args.repeat), 1)
+        print(result)
+        if not result["parity"]:
+            raise SystemExit(1)
+    elif args.bench == "tiling":
+        for row in bench_tiling(args.sizes, args.repeat, args.seed, args.with_model):
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def _suppress(
+    boxes: np.ndarray, scores: np.ndarray, iou_thresh: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).ravel()
+    n = boxes.shape[0]
+    owner = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), owner
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    # Stable sort so equal scores keep their input order.
+    order = np.argsort(-scores, kind="stable")
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        owner[i] = i
+        rest = order[1:]
+        xx1 = np.maximum(x1[i], x1[rest])
+        yy1 = np.maximum(y1[i], y1[rest])
+        xx2 = np.minimum(x2[i], x2[rest])
+        yy2 = np.minimum(y2[i], y2[rest])
+        inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
+        denom = areas[i] + areas[rest] - inter
+        denom[denom == 0] = 1.0
+        iou = inter / denom
+        suppressed = iou >= iou_thresh
+        owner[rest[suppressed]] = i
+        order = rest[~suppressed]
+    return np.asarray(keep, dtype=np.int64), owner
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thresh: float = 0.4) -> np.ndarray:
+    """
+    Greedy non-maximum suppression on a packed (N, 4) x1,y1,x2,y2 array.
+
+    Returns the indices of the kept boxes, highest score first. A box is
+    dropped when its IoU with an already kept box is >= ``iou_thresh``.
+    """
+    keep, _ = _suppress(boxes, scores, iou_thresh)
+    return keep
+
+
+def nms_groups(
+    boxes: np.ndarray, scores: np.ndarray, iou_thresh: float = 0.4
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Like ``nms`` but also returns ``owner``: for every input box, the index
+    of the kept box that suppressed it (kept boxes own themselves). Used to
+    merge duplicate detections of one face seen from overlapping tiles.
+    """
+    return _suppress(boxes, scores, iou_thresh)
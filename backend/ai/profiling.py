@@ -0,0 +1,106 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from backend.config import AI_PROFILE_LOG
+
+
+logger = logging.getLogger("backend.ai.profiling")
+if AI_PROFILE_LOG and not logger.handlers:
+    # one JSON object per line on stderr, independent of uvicorn's log config
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+# Upper bucket bounds; the last bucket is open ended
+TIMING_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+@contextmanager
+def stage(report: Optional[Dict[str, object]], name: str) -> Iterator[None]:
+    """
+    Add the wall time of the block to ``report["timings_ms"][name]``.
+    Repeated stages (per tile, per frame) accumulate. No-op without a report.
+    """
+    if report is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = report.setdefault("timings_ms", {})
+        timings[name] = round(timings.get(name, 0.0) + (time.perf_counter() - started) * 1000.0, 3)
+
+
+class Histogram:
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> Dict[str, object]:
+        labels: List[str] = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            "max": round(self.max, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class PipelineProfile:
+    """Process-wide histograms of per-stage timings and per-request counts."""
+
+    def __init__(self) -> None:
+        self._timings: Dict[str, Histogram] = {}
+        self._counts: Dict[str, Histogram] = {}
+        self._gate: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, report: Dict[str, object]) -> None:
+        timings = report.get("timings_ms") or {}
+        tiling = report.get("tiling") or {}
+        counts = {"faces": report.get("faces"), "tiles": tiling.get("tiles")}
+        with self._lock:
+            for name, ms in timings.items():
+                self._timings.setdefault(name, Histogram(TIMING_BUCKETS_MS)).observe(ms)
+            for name, value in counts.items():
+                if value is not None:
+                    self._counts.setdefault(name, Histogram(COUNT_BUCKETS)).observe(value)
+            gate = report.get("quality_gate") or {}
+            if gate:
+                self._gate["passed"] = self._gate.get("passed", 0) + gate["passed"]
+                for reason, n in gate["rejected"].items():
+                    self._gate[reason] = self._gate.get(reason, 0) + n
+        if AI_PROFILE_LOG:
+            logger.info(json.dumps({"event": "attendance_profile", "endpoint": endpoint, **report}, default=str))
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "timings_ms": {k: h.snapshot() for k, h in sorted(self._timings.items())},
+                "counts": {k: h.snapshot() for k, h in sorted(self._counts.items())},
+                "quality_gate": dict(self._gate),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timings.clear()
+            self._counts.clear()
+            self._gate.clear()
+
+
+pipeline_profile = PipelineProfile()
@@ -0,0 +1,160 @@
+"""
+Deferred attendance proof images.
+
+Recognition only records the detections (box, label, score). The request
+stores them as a small JSON file next to the original upload bytes; a
+size-capped proof JPEG and a thumbnail are rendered later (a background
+task after the response, or on first view) and the source is dropped.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from backend.ai.ingest import image_size
+from backend.config import PROOF_JPEG_QUALITY, PROOF_MAX_SIDE, PROOF_THUMB_SIDE
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+ATTENDANCE_PROOF_DIR = PROJECT_ROOT / "storage" / "attendance_proofs"
+ATTENDANCE_PROOF_DIR.mkdir(parents=True, exist_ok=True)
+
+_render_lock = threading.Lock()
+
+
+def detections_from(faces, matches: Sequence[Tuple[str, float]]) -> List[Dict[str, object]]:
+    """Compact per-face metadata: integer box, reg_no or "Unknown", similarity."""
+    return [
+        {
+            "box": [int(v) for v in face.bbox[:4]],
+            "label": name,
+            "score": round(float(sim), 3),
+        }
+        for face, (name, sim) in zip(faces, matches)
+    ]
+
+
+def draw_detections(img: np.ndarray, detections: Sequence[Dict[str, object]], scale: float = 1.0) -> np.ndarray:
+    """Draw boxes and labels in place; ``scale`` maps stored boxes onto a resized image."""
+    for det in detections:
+        box = [int(round(v * scale)) for v in det["box"]]
+        color = (0, 0, 255)  # red default
+        label = f"Unknown"
+
+        if det["label"] != "Unknown":
+            color = (0, 255, 0)
+            label = f"{det['label']} ({int(det['score'] * 100)}%)"
+
+        cv2.putText(
+            img,
+            label,
+            (box[0], box[1] - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            color,
+            2,
+        )
+        cv2.rectangle(img, (box[0], box[1]), (box[2], box[3]), color, 2)
+    return img
+
+
+def _paths(session_id: int) -> Dict[str, Path]:
+    stem = ATTENDANCE_PROOF_DIR / f"session_{session_id}"
+    return {
+        "proof": stem.with_suffix(".jpg"),
+        "thumb": stem.with_name(f"{stem.name}_thumb.jpg"),
+        "meta": stem.with_suffix(".json"),
+        "source": stem.with_name(f"{stem.name}_source"),
+    }
+
+
+def _write_atomic(path: Path, data) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def store_proof_source(
+    session_id: int,
+    detections: Sequence[Dict[str, object]],
+    width: int,
+    height: int,
+    image_bytes=None,
+    image: Optional[np.ndarray] = None,
+) -> None:
+    """
+    Keep what is needed to render a proof later: the original upload bytes
+    as-is (no re-encode) or, for frames already in memory, a capped JPEG.
+    ``width``/``height`` are those of the frame the boxes refer to. Any
+    earlier render for the session is removed.
+    """
+    paths = _paths(session_id)
+    if image_bytes is None:
+        scale = min(1.0, PROOF_MAX_SIDE / max(width, height))
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        image_bytes = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+    with _render_lock:
+        _write_atomic(paths["source"], image_bytes)
+        meta = {"width": width, "height": height, "detections": list(detections)}
+        _write_atomic(paths["meta"], json.dumps(meta, separators=(",", ":")).encode())
+        paths["proof"].unlink(missing_ok=True)
+        paths["thumb"].unlink(missing_ok=True)
+
+
+def _reduced_flag(width: int, height: int) -> int:
+    """Largest IMREAD_REDUCED_* factor that still leaves PROOF_MAX_SIDE pixels."""
+    longest = max(width, height)
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if longest // factor >= PROOF_MAX_SIDE:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def render_proof(session_id: int) -> bool:
+    """Render the capped proof and thumbnail from a stored source. False if nothing is pending."""
+    paths = _paths(session_id)
+    with _render_lock:
+        if not paths["source"].exists() or not paths["meta"].exists():
+            return False
+        meta = json.loads(paths["meta"].read_text())
+        raw = np.frombuffer(paths["source"].read_bytes(), np.uint8)
+        source_w, source_h = image_size(raw) or (meta["width"], meta["height"])
+        img = cv2.imdecode(raw, _reduced_flag(source_w, source_h))
+        if img is None:
+            return False
+        scale = min(1.0, PROOF_MAX_SIDE / max(img.shape[:2]))
+        if scale < 1.0:
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        # stored boxes are in original pixels; the source may be smaller
+        draw_detections(img, meta["detections"], img.shape[1] / meta["width"])
+
+        quality = [cv2.IMWRITE_JPEG_QUALITY, PROOF_JPEG_QUALITY]
+        _write_atomic(paths["proof"], cv2.imencode(".jpg", img, quality)[1].tobytes())
+        thumb_scale = PROOF_THUMB_SIDE / max(img.shape[:2])
+        thumb = cv2.resize(img, None, fx=thumb_scale, fy=thumb_scale, interpolation=cv2.INTER_AREA)
+        _write_atomic(paths["thumb"], cv2.imencode(".jpg", thumb, quality)[1].tobytes())
+        paths["source"].unlink(missing_ok=True)
+        return True
+
+
+def get_proof_path(session_id: int, thumbnail: bool = False) -> Optional[Path]:
+    """Path of the rendered proof (or thumbnail), rendering a pending one first."""
+    paths = _paths(session_id)
+    if paths["source"].exists():
+        render_proof(session_id)
+    if thumbnail and paths["thumb"].exists():
+        return paths["thumb"]
+    # sessions from before deferred rendering only have the full-size proof
+    return paths["proof"] if paths["proof"].exists() else None
+
+
+def delete_proof(session_id: int) -> None:
+    """Remove every proof file of a session (render, thumbnail, metadata, source)."""
+    with _render_lock:
+        for path in _paths(session_id).values():
+            path.unlink(missing_ok=True)
@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from backend.config import (
+    QUALITY_ENROLL_MIN_BLUR,
+    QUALITY_ENROLL_MIN_FACE_PX,
+    QUALITY_MAX_PITCH,
+    QUALITY_MAX_YAW,
+    QUALITY_MIN_BLUR,
+    QUALITY_MIN_DET_SCORE,
+    QUALITY_MIN_FACE_PX,
+)
+
+
+# Gate reasons, cheapest check first
+REASON_MESSAGES = {
+    "low_score": "Face was not detected confidently",
+    "too_small": "Face is too small, move closer to the camera",
+    "pose": "Face is not looking at the camera",
+    "blurry": "Image is too blurry",
+}
+
+
+@dataclass(frozen=True)
+class QualityThresholds:
+    min_det_score: float
+    min_face_px: int
+    min_blur: float
+    max_yaw: float
+    max_pitch: float
+
+
+RECOGNITION_THRESHOLDS = QualityThresholds(
+    QUALITY_MIN_DET_SCORE, QUALITY_MIN_FACE_PX, QUALITY_MIN_BLUR, QUALITY_MAX_YAW, QUALITY_MAX_PITCH
+)
+ENROLLMENT_THRESHOLDS = QualityThresholds(
+    QUALITY_MIN_DET_SCORE, QUALITY_ENROLL_MIN_FACE_PX, QUALITY_ENROLL_MIN_BLUR, QUALITY_MAX_YAW, QUALITY_MAX_PITCH
+)
+
+
+def pose_offsets(kps: np.ndarray) -> tuple:
+    """
+    (yaw, pitch) proxies from the 5 SCRFD landmarks (eyes, nose, mouth
+    corners). Yaw is the nose's horizontal offset from the eye midpoint in
+    eye-distances; pitch is how far the nose sits from halfway between the
+    eye line and the mouth line. Both are about 0 for a frontal face.
+    """
+    left_eye, right_eye, nose, left_mouth, right_mouth = np.asarray(kps, dtype=np.float32)[:5]
+    eye_mid = (left_eye + right_eye) / 2
+    mouth_mid = (left_mouth + right_mouth) / 2
+    eye_dist = float(np.linalg.norm(right_eye - left_eye)) or 1.0
+    yaw = (nose[0] - eye_mid[0]) / eye_dist
+    face_height = float(mouth_mid[1] - eye_mid[1]) or 1.0
+    pitch = (nose[1] - eye_mid[1]) / face_height - 0.5
+    return float(yaw), float(pitch)
+
+
+def blur_score(img: np.ndarray, bbox: np.ndarray) -> float:
+    """Variance of the Laplacian over the face box, resized to 64x64 so sizes compare."""
+    h, w = img.shape[:2]
+    x0, y0, x1, y1 = [int(v) for v in bbox[:4]]
+    x0, y0, x1, y1 = max(0, x0), max(0, y0), min(w, x1), min(h, y1)
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return 0.0
+    gray = cv2.cvtColor(img[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, (64, 64), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def assess_face(img: np.ndarray, face, thresholds: QualityThresholds = RECOGNITION_THRESHOLDS) -> Optional[str]:
+    """Return the first failed check (a REASON_MESSAGES key), or None when the face passes."""
+    if face.det_score is not None and face.det_score < thresholds.min_det_score:
+        return "low_score"
+    x0, y0, x1, y1 = face.bbox[:4]
+    if min(x1 - x0, y1 - y0) < thresholds.min_face_px:
+        return "too_small"
+    if face.kps is not None:
+        yaw, pitch = pose_offsets(face.kps)
+        if abs(yaw) > thresholds.max_yaw or abs(pitch) > thresholds.max_pitch:
+            return "pose"
+    if blur_score(img, face.bbox) < thresholds.min_blur:
+        return "blurry"
+    return None
@@ -0,0 +1,225 @@
+"""
+ONNX Runtime settings for the InsightFace models.
+
+insightface creates its sessions with default options, so after
+``FaceAnalysis`` has loaded the models we re-create each session with the
+configured thread counts and graph optimization level (and, optionally, a
+quantized recognition model), then prepare the app again.
+
+Run from the project root, e.g.:
+
+    python -m backend.ai.runtime bench --threads 1 2 4 --levels extended all
+    python -m backend.ai.runtime quantize --out models/w600k_r50_int8.onnx
+"""
+import argparse
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import onnxruntime as ort
+from insightface.model_zoo.model_zoo import PickableInferenceSession
+
+from backend.config import (
+    AI_DET_SIZE,
+    AI_GRAPH_OPT,
+    AI_INTER_OP_THREADS,
+    AI_INTRA_OP_THREADS,
+    AI_MODULES,
+    AI_PROCESSES,
+    AI_REC_MODEL,
+)
+
+
+GRAPH_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+@dataclass(frozen=True)
+class RuntimeSettings:
+    intra_op_threads: int
+    inter_op_threads: int
+    graph_opt: str
+    det_size: Tuple[int, int]
+    rec_model: Optional[str]
+    modules: Tuple[str, ...]
+    processes: int = 1
+
+    def as_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def parse_det_size(value: str) -> Tuple[int, int]:
+    """ "640" -> (640, 640); "640x480" -> (640, 480) (width x height)."""
+    w, _, h = value.lower().partition("x")
+    return int(w), int(h or w)
+
+
+def default_intra_threads(processes: int = AI_PROCESSES) -> int:
+    """This process's share of the host's cores when ``processes`` workers run side by side."""
+    return max(1, (os.cpu_count() or 1) // max(1, processes))
+
+
+def runtime_settings() -> RuntimeSettings:
+    if AI_GRAPH_OPT not in GRAPH_LEVELS:
+        raise ValueError(f"AI_GRAPH_OPT must be one of {', '.join(GRAPH_LEVELS)}")
+    return RuntimeSettings(
+        intra_op_threads=AI_INTRA_OP_THREADS or default_intra_threads(),
+        inter_op_threads=max(1, AI_INTER_OP_THREADS),
+        graph_opt=AI_GRAPH_OPT,
+        det_size=parse_det_size(AI_DET_SIZE),
+        rec_model=AI_REC_MODEL,
+        modules=tuple(m.strip() for m in AI_MODULES.split(",") if m.strip()),
+        processes=max(1, AI_PROCESSES),
+    )
+
+
+def session_options(settings: RuntimeSettings) -> ort.SessionOptions:
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = settings.intra_op_threads
+    opts.inter_op_num_threads = settings.inter_op_threads
+    opts.graph_optimization_level = GRAPH_LEVELS[settings.graph_opt]
+    opts.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL if settings.inter_op_threads > 1 else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    if settings.processes > 1:
+        # idle threads spinning would steal cores from the other workers
+        opts.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        opts.add_session_config_entry("session.inter_op.allow_spinning", "0")
+    return opts
+
+
+def rebuild_model(model, providers: Sequence[str], opts: ort.SessionOptions, model_file: Optional[str] = None):
+    """Same insightface model class over a new session (optionally from another .onnx file)."""
+    model_file = model_file or model.model_file
+    session = PickableInferenceSession(model_file, sess_options=opts, providers=list(providers))
+    return type(model)(model_file=model_file, session=session)
+
+
+def apply_settings(app, providers: Sequence[str], settings: RuntimeSettings, ctx_id: int = 0) -> None:
+    """Re-create every session of a loaded ``FaceAnalysis`` with ``settings`` and prepare it."""
+    opts = session_options(settings)
+    for task, model in list(app.models.items()):
+        model_file = settings.rec_model if task == "recognition" else None
+        app.models[task] = rebuild_model(model, providers, opts, model_file)
+    app.det_model = app.models["detection"]
+    app.prepare(ctx_id=ctx_id, det_size=settings.det_size)
+
+
+def _time_ms(fn, repeat: int) -> float:
+    """Median wall time in milliseconds after one untimed warm-up call."""
+    fn()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return round(float(np.median(runs)) * 1000.0, 2)
+
+
+def self_benchmark(
+    app,
+    providers: Sequence[str],
+    base: RuntimeSettings,
+    threads: Optional[Sequence[int]] = None,
+    levels: Sequence[str] = ("extended", "all"),
+    repeat: int = 5,
+    batch: int = 16,
+) -> Dict[str, object]:
+    """
+    Time one detection pass and one recognition batch for each thread count
+    and optimization level on this host, fastest first. The models of
+    ``app`` are left untouched; each candidate gets its own sessions.
+    """
+    cpus = os.cpu_count() or 1
+    if threads is None:
+        threads = sorted({1, 2, 4, base.intra_op_threads, cpus})
+    threads = [t for t in threads if 0 < t <= cpus]
+    rng = np.random.default_rng(0)
+    w, h = base.det_size
+    det_img = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    crops = [rng.integers(0, 256, (112, 112, 3), dtype=np.uint8) for _ in range(batch)]
+    rec_files = [app.models["recognition"].model_file]
+    if base.rec_model and base.rec_model not in rec_files:
+        rec_files.append(base.rec_model)
+
+    results: List[Dict[str, object]] = []
+    for level in levels:
+        for n in threads:
+            candidate = RuntimeSettings(n, base.inter_op_threads, level, base.det_size, None, base.modules, base.processes)
+            opts = session_options(candidate)
+            det = rebuild_model(app.det_model, providers, opts)
+            det.prepare(0, input_size=base.det_size, det_thresh=app.det_thresh)
+            det_ms = _time_ms(lambda: det.detect(det_img, max_num=0, metric="default"), repeat)
+            for rec_file in rec_files:
+                rec = rebuild_model(app.models["recognition"], providers, opts, rec_file)
+                rec_ms = _time_ms(lambda: rec.get_feat(crops), repeat)
+                results.append(
+                    {
+                        "intra_op_threads": n,
+                        "graph_opt": level,
+                        "rec_model": os.path.basename(rec_file),
+                        "detect_ms": det_ms,
+                        "recognize_batch_ms": rec_ms,
+                        "total_ms": round(det_ms + rec_ms, 2),
+                    }
+                )
+    results.sort(key=lambda r: r["total_ms"])
+    return {
+        "cpu_count": cpus,
+        "processes": base.processes,
+        "det_size": list(base.det_size),
+        "batch": batch,
+        "fastest": results[0] if results else None,
+        "results": results,
+    }
+
+
+def quantize_recognition(out_path: str, model_file: Optional[str] = None) -> str:
+    """Dynamic INT8 quantization of the recognition model (weights only, no calibration set)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from insightface.utils import ensure_available
+
+    if model_file is None:
+        model_file = os.path.join(ensure_available("models", "buffalo_l"), "w600k_r50.onnx")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    quantize_dynamic(model_file, out_path, weight_type=QuantType.QInt8)
+    return out_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("bench", help="time thread counts and optimization levels on this host")
+    p.add_argument("--threads", type=int, nargs="+", default=None)
+    p.add_argument("--levels", nargs="+", default=["extended", "all"], choices=list(GRAPH_LEVELS))
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--batch", type=int, default=16)
+
+    p = sub.add_parser("quantize", help="write an INT8 recognition model for AI_REC_MODEL")
+    p.add_argument("--out", required=True)
+    p.add_argument("--model", default=None, help="source .onnx (default: buffalo_l w600k_r50.onnx)")
+
+    args = parser.parse_args()
+    if args.command == "quantize":
+        print(quantize_recognition(args.out, args.model))
+        return
+
+    from backend.ai.engine import get_engine, _get_providers
+
+    engine = get_engine()
+    report = self_benchmark(
+        engine.app, _get_providers(), engine.settings, args.threads, args.levels, args.repeat, args.batch
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
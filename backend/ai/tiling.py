@@ -0,0 +1,149 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.config import AI_TILE_MAX_DOWNSCALE, AI_TILE_OVERLAP, AI_MAX_TILES
+
+
+Box = Tuple[int, int, int, int]  # x0, y0, x1, y1
+
+
+@dataclass
+class TilePlan:
+    """Tiles to run the detector on, in full-image pixel coordinates."""
+
+    strategy: str  # "fixed", "single", "grid", "density"
+    rows: int
+    cols: int
+    overlap: float
+    tiles: List[Box]
+    # coarse-pass face count per tile (density strategy only), same order as tiles
+    weights: List[int] = field(default_factory=list)
+    skipped_tiles: int = 0
+    coarse_faces: Optional[int] = None
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "strategy": self.strategy,
+            "rows": self.rows,
+            "cols": self.cols,
+            "overlap": self.overlap,
+            "tiles": len(self.tiles),
+            "skipped_tiles": self.skipped_tiles,
+            "coarse_faces": self.coarse_faces,
+        }
+
+
+def _intervals(length: int, count: int, overlap: float) -> List[Tuple[int, int]]:
+    """``count`` equal spans covering ``length`` where neighbours share ``overlap`` of a span."""
+    if count <= 1:
+        return [(0, length)]
+    span = length / (1 + (count - 1) * (1 - overlap))
+    step = span * (1 - overlap)
+    out = []
+    for i in range(count):
+        start = int(round(i * step))
+        end = length if i == count - 1 else int(round(i * step + span))
+        out.append((start, end))
+    return out
+
+
+def fixed_plan(h: int, w: int) -> TilePlan:
+    """The original 2x3 grid (rows 0-60% / 40-100%, cols 0-45% / 30-75% / 55-100%)."""
+    ys = [(0, int(h * 0.60)), (int(h * 0.40), h)]
+    xs = [(0, int(w * 0.45)), (int(w * 0.30), int(w * 0.75)), (int(w * 0.55), w)]
+    tiles = [(x0, y0, x1, y1) for y0, y1 in ys for x0, x1 in xs]
+    return TilePlan("fixed", 2, 3, 0.25, tiles)
+
+
+def grid_plan(
+    h: int,
+    w: int,
+    det_size: Tuple[int, int] = (640, 640),
+    max_downscale: float = AI_TILE_MAX_DOWNSCALE,
+    overlap: float = AI_TILE_OVERLAP,
+    max_tiles: int = AI_MAX_TILES,
+) -> TilePlan:
+    """
+    Pick rows x cols from the image resolution and the detector input size.
+
+    Each tile is at most ``max_downscale`` times the detector input, so
+    small faces keep enough pixels; an image that already fits gets a single
+    tile. When that would need more than ``max_tiles`` tiles the allowed
+    downscale is raised until it fits.
+    """
+    det_w, det_h = det_size
+    scale = max_downscale
+    while True:
+        cols = max(1, math.ceil(w / (det_w * scale)))
+        rows = max(1, math.ceil(h / (det_h * scale)))
+        if rows * cols <= max_tiles:
+            break
+        scale *= 1.25
+    if rows == 1 and cols == 1:
+        return TilePlan("single", 1, 1, 0.0, [(0, 0, w, h)])
+    tiles = [
+        (x0, y0, x1, y1)
+        for y0, y1 in _intervals(h, rows, overlap)
+        for x0, x1 in _intervals(w, cols, overlap)
+    ]
+    return TilePlan("grid", rows, cols, overlap, tiles)
+
+
+def density_plan(
+    h: int,
+    w: int,
+    coarse_boxes: np.ndarray,
+    det_size: Tuple[int, int] = (640, 640),
+    margin: float = 0.15,
+) -> TilePlan:
+    """
+    Restrict the adaptive grid to the region where a cheap downscaled pass
+    found faces, grown by ``margin`` of the image size (back rows are small
+    and may be missed by the coarse pass). Tiles are ordered densest first.
+    """
+    plan = grid_plan(h, w, det_size)
+    plan.coarse_faces = int(len(coarse_boxes))
+    if len(coarse_boxes) == 0 or len(plan.tiles) == 1:
+        plan.weights = [0] * len(plan.tiles)
+        return plan
+
+    boxes = np.asarray(coarse_boxes, dtype=np.float32)[:, :4]
+    rx0 = max(0.0, boxes[:, 0].min() - margin * w)
+    ry0 = max(0.0, boxes[:, 1].min() - margin * h)
+    rx1 = min(float(w), boxes[:, 2].max() + margin * w)
+    ry1 = min(float(h), boxes[:, 3].max() + margin * h)
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+
+    kept: List[Tuple[int, Box]] = []
+    for x0, y0, x1, y1 in plan.tiles:
+        if x1 <= rx0 or x0 >= rx1 or y1 <= ry0 or y0 >= ry1:
+            continue
+        count = int(((cx >= x0) & (cx < x1) & (cy >= y0) & (cy < y1)).sum())
+        kept.append((count, (x0, y0, x1, y1)))
+    kept.sort(key=lambda item: -item[0])
+
+    plan.strategy = "density"
+    plan.skipped_tiles = len(plan.tiles) - len(kept)
+    plan.tiles = [tile for _, tile in kept]
+    plan.weights = [count for count, _ in kept]
+    return plan
+
+
+def priority_order(plan: TilePlan, h: int, w: int) -> List[int]:
+    """
+    Tile indices in the order an early-exit pass should visit them: densest
+    first when the plan has coarse-pass counts, otherwise nearest the image
+    centre first (where most of a class photo's faces are).
+    """
+    if plan.weights and any(plan.weights):
+        return sorted(range(len(plan.tiles)), key=lambda i: -plan.weights[i])
+
+    def centre_distance(i: int) -> float:
+        x0, y0, x1, y1 = plan.tiles[i]
+        return ((x0 + x1 - w) / w) ** 2 + ((y0 + y1 - h) / h) ** 2
+
+    return sorted(range(len(plan.tiles)), key=centre_distance)
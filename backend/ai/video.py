@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+from backend.ai.ingest import decode_image
+from backend.config import VIDEO_MAX_FRAMES, VIDEO_MAX_SECONDS, VIDEO_SAMPLE_FPS
+
+
+class VideoTooLong(ValueError):
+    """The clip runs longer than the allowed duration."""
+
+
+class UnreadableVideo(ValueError):
+    """OpenCV could not open the file as a video."""
+
+
+def sample_video_frames(
+    path: str,
+    sample_fps: float = VIDEO_SAMPLE_FPS,
+    max_frames: int = VIDEO_MAX_FRAMES,
+    max_seconds: float = VIDEO_MAX_SECONDS,
+) -> Iterator[np.ndarray]:
+    """
+    Yield about ``sample_fps`` frames per second of a video file, at most
+    ``max_frames``. Skipped frames are only grabbed, never decoded. Raises
+    UnreadableVideo when the file cannot be opened, and VideoTooLong, before
+    decoding anything, when the container reports a duration over
+    ``max_seconds``.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise UnreadableVideo("Could not open video")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        if frame_count > 0 and frame_count / fps > max_seconds:
+            raise VideoTooLong(f"Video is longer than {max_seconds:g} seconds")
+        step = max(1, int(round(fps / sample_fps)))
+        index = 0
+        yielded = 0
+        while yielded < max_frames and cap.grab():
+            if index % step == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    yielded += 1
+                    yield frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def decode_frames(blobs: Iterable[bytes], max_frames: int = VIDEO_MAX_FRAMES) -> Iterator[np.ndarray]:
+    """Decode a burst of uploaded stills lazily within the ingest budget, skipping unreadable ones."""
+    for i, blob in enumerate(blobs):
+        if i >= max_frames:
+            break
+        ingested = decode_image(np.frombuffer(blob, np.uint8))
+        if ingested is not None:
+            yield ingested.frame
+
+
+@dataclass
+class Track:
+    bbox: np.ndarray
+    reg_no: Optional[str] = None
+    similarity: float = 0.0
+
+
+def _iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class IdentityTracker:
+    """
+    Frame-to-frame IoU tracker. A face that overlaps a track already tied to
+    a student keeps that identity, so it is recognised once rather than
+    re-embedded on every sampled frame.
+    """
+
+    def __init__(self, iou_thresh: float = 0.3) -> None:
+        self.iou_thresh = iou_thresh
+        self.tracks: List[Track] = []
+
+    def match(self, boxes: List[np.ndarray]) -> List[Optional[Track]]:
+        """Greedy best-IoU assignment of this frame's boxes to the previous tracks."""
+        out: List[Optional[Track]] = [None] * len(boxes)
+        if not boxes or not self.tracks:
+            return out
+        iou = _iou_matrix(
+            np.stack([np.asarray(b[:4], dtype=np.float32) for b in boxes]),
+            np.stack([t.bbox for t in self.tracks]),
+        )
+        used = set()
+        for flat in np.argsort(-iou, axis=None):
+            i, j = np.unravel_index(flat, iou.shape)
+            if iou[i, j] < self.iou_thresh:
+                break
+            if out[i] is None and j not in used:
+                out[i] = self.tracks[j]
+                used.add(j)
+        return out
+
+    def update(self, tracks: List[Track]) -> None:
+        self.tracks = tracks
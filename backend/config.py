@@ -17,3 +17,99 @@ JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "super-secret-key-change-in-product
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+
+# AI engine
+# Set AI_WARMUP=1 to load the face models at startup instead of on first use
+AI_WARMUP = os.getenv("AI_WARMUP", "0") == "1"
+# Worker threads used to embed photos in bulk face enrollment
+ENROLL_WORKERS = int(os.getenv("ENROLL_WORKERS", "4"))
+# Bulk enrollment limits: more photos (400), a larger photo or more bytes in
+# total once uncompressed (413) reject the whole upload before it is embedded
+BULK_ENROLL_MAX_FILES = int(os.getenv("BULK_ENROLL_MAX_FILES", "2000"))
+BULK_ENROLL_MAX_FILE_MB = int(os.getenv("BULK_ENROLL_MAX_FILE_MB", "10"))
+BULK_ENROLL_MAX_TOTAL_MB = int(os.getenv("BULK_ENROLL_MAX_TOTAL_MB", "1024"))
+# Concurrent image-pipeline jobs per worker process, and how many more may wait
+# before /attendance/auto answers 503
+AI_MAX_WORKERS = int(os.getenv("AI_MAX_WORKERS", "2"))
+AI_MAX_QUEUE = int(os.getenv("AI_MAX_QUEUE", "4"))
+# Background threads draining the attendance job queue (0 disables the scheduler)
+ATTENDANCE_JOB_WORKERS = int(os.getenv("ATTENDANCE_JOB_WORKERS", "1"))
+# A "running" job older than this is assumed orphaned by a dead worker and requeued
+ATTENDANCE_JOB_STALE_SECONDS = int(os.getenv("ATTENDANCE_JOB_STALE_SECONDS", "600"))
+ATTENDANCE_JOB_MAX_ATTEMPTS = int(os.getenv("ATTENDANCE_JOB_MAX_ATTEMPTS", "3"))
+# Memory cap for cached per-class embedding matrices
+GALLERY_CACHE_MAX_MB = int(os.getenv("GALLERY_CACHE_MAX_MB", "64"))
+# Cached galleries are reloaded after this long, so enrollments made through
+# another worker process show up even without a local invalidation
+GALLERY_CACHE_TTL_SECONDS = int(os.getenv("GALLERY_CACHE_TTL_SECONDS", "300"))
+# Storage precision for FaceProfile.embedding_blob: "float32" or "float16"
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+# Enrollment samples kept per student (oldest dropped first)
+MAX_FACE_SAMPLES = int(os.getenv("MAX_FACE_SAMPLES", "5"))
+# "max": best similarity over a student's samples; "centroid": their mean only
+GALLERY_MATCH_MODE = os.getenv("GALLERY_MATCH_MODE", "max")
+# Tiling planner for group photos: "adaptive" sizes the grid from the image
+# resolution, "density" also skips tiles far from faces found by a cheap
+# downscaled pass, "fixed" is the original 2x3 grid
+AI_TILING = os.getenv("AI_TILING", "adaptive")
+# A tile may be at most this many times the detector input before it is split
+AI_TILE_MAX_DOWNSCALE = float(os.getenv("AI_TILE_MAX_DOWNSCALE", "2.0"))
+AI_TILE_OVERLAP = float(os.getenv("AI_TILE_OVERLAP", "0.25"))
+AI_MAX_TILES = int(os.getenv("AI_MAX_TILES", "12"))
+# Multi-frame attendance (/attendance/auto/video): frames sampled per second
+# of video, and the most frames (video or burst) looked at per request.
+# Larger (413) or longer clips are rejected before any frame is decoded
+VIDEO_SAMPLE_FPS = float(os.getenv("VIDEO_SAMPLE_FPS", "2.0"))
+VIDEO_MAX_FRAMES = int(os.getenv("VIDEO_MAX_FRAMES", "20"))
+VIDEO_MAX_UPLOAD_MB = int(os.getenv("VIDEO_MAX_UPLOAD_MB", "100"))
+VIDEO_MAX_SECONDS = float(os.getenv("VIDEO_MAX_SECONDS", "60"))
+# Early-exit recognition: visit tiles in priority order and stop once every
+# student is matched at or above AI_EARLY_EXIT_CONFIRM similarity
+AI_EARLY_EXIT = os.getenv("AI_EARLY_EXIT", "0") == "1"
+AI_EARLY_EXIT_CONFIRM = float(os.getenv("AI_EARLY_EXIT_CONFIRM", "0.5"))
+# Log one JSON line with stage timings per attendance recognition request
+AI_PROFILE_LOG = os.getenv("AI_PROFILE_LOG", "0") == "1"
+# Attendance proof images are rendered after the response, capped to this
+# longest side, plus a thumbnail
+PROOF_MAX_SIDE = int(os.getenv("PROOF_MAX_SIDE", "1600"))
+PROOF_THUMB_SIDE = int(os.getenv("PROOF_THUMB_SIDE", "320"))
+PROOF_JPEG_QUALITY = int(os.getenv("PROOF_JPEG_QUALITY", "85"))
+# Ingest limits for classroom uploads: larger files are rejected (413); larger
+# photos are decoded at reduced size and/or resized to fit before detection
+INGEST_MAX_UPLOAD_MB = int(os.getenv("INGEST_MAX_UPLOAD_MB", "40"))
+INGEST_MAX_SIDE = int(os.getenv("INGEST_MAX_SIDE", "4096"))
+INGEST_MAX_PIXELS = int(os.getenv("INGEST_MAX_PIXELS", "16000000"))
+# Face quality gate: faces failing these checks are not embedded or matched
+# (recognition) or are refused (enrollment, with the stricter size/blur values)
+QUALITY_GATE = os.getenv("QUALITY_GATE", "1") == "1"
+QUALITY_MIN_DET_SCORE = float(os.getenv("QUALITY_MIN_DET_SCORE", "0.55"))
+QUALITY_MIN_FACE_PX = int(os.getenv("QUALITY_MIN_FACE_PX", "20"))
+QUALITY_MIN_BLUR = float(os.getenv("QUALITY_MIN_BLUR", "15"))
+QUALITY_MAX_YAW = float(os.getenv("QUALITY_MAX_YAW", "0.5"))
+QUALITY_MAX_PITCH = float(os.getenv("QUALITY_MAX_PITCH", "0.35"))
+QUALITY_ENROLL_MIN_FACE_PX = int(os.getenv("QUALITY_ENROLL_MIN_FACE_PX", "64"))
+QUALITY_ENROLL_MIN_BLUR = float(os.getenv("QUALITY_ENROLL_MIN_BLUR", "40"))
+# Institution-wide face search (IVF index over every FaceProfile): used by
+# /attendance/lookup and as a second pass for faces /attendance/auto could not
+# match in the class. Below AI_ANN_MIN_TRAIN students the search is exact.
+AI_ANN_FALLBACK = os.getenv("AI_ANN_FALLBACK", "1") == "1"
+AI_ANN_NPROBE = int(os.getenv("AI_ANN_NPROBE", "8"))
+AI_ANN_MIN_TRAIN = int(os.getenv("AI_ANN_MIN_TRAIN", "1024"))
+AI_ANN_VISITOR_THRESHOLD = float(os.getenv("AI_ANN_VISITOR_THRESHOLD", "0.5"))
+AI_ANN_REFRESH_SECONDS = float(os.getenv("AI_ANN_REFRESH_SECONDS", "600"))
+# ONNX Runtime tuning for the face models. Threads per session default to
+# the CPU count divided by AI_PROCESSES (worker processes sharing the host,
+# e.g. uvicorn --workers; WEB_CONCURRENCY if set). AI_GRAPH_OPT is one of
+# disable/basic/extended/all. AI_DET_SIZE is "640" or "WxH". AI_REC_MODEL
+# points at an optional (e.g. INT8-quantized) recognition model, and
+# AI_MODULES lists the buffalo_l models to load.
+AI_PROCESSES = int(os.getenv("AI_PROCESSES", os.getenv("WEB_CONCURRENCY", "1")))
+AI_INTRA_OP_THREADS = int(os.getenv("AI_INTRA_OP_THREADS", "0"))
+AI_INTER_OP_THREADS = int(os.getenv("AI_INTER_OP_THREADS", "1"))
+AI_GRAPH_OPT = os.getenv("AI_GRAPH_OPT", "all")
+AI_DET_SIZE = os.getenv("AI_DET_SIZE", "640")
+AI_REC_MODEL = os.getenv("AI_REC_MODEL") or None
+AI_MODULES = os.getenv("AI_MODULES", "detection,recognition")
+# Set AI_SELF_BENCHMARK=1 to time thread counts / optimization levels at
+# startup and report the fastest in /api/admin/ai/stats
+AI_SELF_BENCHMARK = os.getenv("AI_SELF_BENCHMARK", "0") == "1"
@@ -0,0 +1,221 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.config import (
+    ATTENDANCE_JOB_MAX_ATTEMPTS,
+    ATTENDANCE_JOB_STALE_SECONDS,
+    ATTENDANCE_JOB_WORKERS,
+)
+from backend.database import SessionLocal
+
+
+JobHandler = Callable[[Session, models.AttendanceJob], dict]
+
+# How many queued jobs are looked at when picking the next one
+CANDIDATE_WINDOW = 200
+
+
+def _fail(job: models.AttendanceJob, error: str) -> None:
+    """Mark ``job`` failed for good; its stored upload will never be read again."""
+    job.status = "failed"
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    Path(job.image_path).unlink(missing_ok=True)
+
+
+class AttendanceJobScheduler:
+    """
+    In-process scheduler for queued attendance photos.
+
+    Jobs live in the ``attendance_jobs`` table, so nothing is lost when a
+    worker restarts: jobs left "running" by a dead process are requeued once
+    they go stale. Higher ``priority`` runs first; within a priority level
+    the teacher served least recently goes next, so one teacher uploading a
+    burst of photos cannot starve everyone else. A teacher's own jobs stay
+    in upload order.
+    """
+
+    def __init__(self, handler: JobHandler, workers: int, poll_interval: float = 2.0) -> None:
+        self._handler = handler
+        self._workers = workers
+        self._poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._claim_lock = threading.Lock()
+        self._last_served: Dict[int, float] = {}
+        self._last_stale_check = 0.0
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self._workers):
+            thread = threading.Thread(target=self._run, name=f"attendance-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def notify(self) -> None:
+        """Wake an idle worker after a new job was committed."""
+        self._wakeup.set()
+
+    def _requeue_stale(self, db: Session) -> None:
+        now = time.monotonic()
+        if now - self._last_stale_check < min(ATTENDANCE_JOB_STALE_SECONDS, 60):
+            return
+        self._last_stale_check = now
+        cutoff = datetime.utcnow() - timedelta(seconds=ATTENDANCE_JOB_STALE_SECONDS)
+        stale = db.query(models.AttendanceJob).filter(
+            models.AttendanceJob.status == "running",
+            models.AttendanceJob.started_at < cutoff,
+        )
+        # Out of attempts (the worker died on it every time): fail for good
+        exhausted = stale.filter(models.AttendanceJob.attempts >= ATTENDANCE_JOB_MAX_ATTEMPTS).all()
+        for job in exhausted:
+            _fail(job, "Worker stopped while processing this job")
+        stale.filter(models.AttendanceJob.attempts < ATTENDANCE_JOB_MAX_ATTEMPTS).update(
+            {"status": "queued"}, synchronize_session=False
+        )
+        db.commit()
+
+    def _claim_next(self, db: Session) -> Optional[int]:
+        with self._claim_lock:
+            candidates = (
+                db.query(
+                    models.AttendanceJob.job_id,
+                    models.AttendanceJob.teacher_id,
+                    models.AttendanceJob.priority,
+                )
+                .filter(models.AttendanceJob.status == "queued")
+                .order_by(
+                    models.AttendanceJob.priority.desc(),
+                    models.AttendanceJob.created_at,
+                    models.AttendanceJob.job_id,
+                )
+                .limit(CANDIDATE_WINDOW)
+                .all()
+            )
+            if not candidates:
+                return None
+            top = [c for c in candidates if c.priority == candidates[0].priority]
+            # min() is stable, so ties keep upload order
+            chosen = min(top, key=lambda c: self._last_served.get(c.teacher_id, 0.0))
+
+            # Conditional update: another process may have claimed it first
+            claimed = (
+                db.query(models.AttendanceJob)
+                .filter(
+                    models.AttendanceJob.job_id == chosen.job_id,
+                    models.AttendanceJob.status == "queued",
+                )
+                .update(
+                    {
+                        "status": "running",
+                        "started_at": datetime.utcnow(),
+                        "attempts": models.AttendanceJob.attempts + 1,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if not claimed:
+                return None
+            self._last_served[chosen.teacher_id] = time.monotonic()
+            return chosen.job_id
+
+    def _run_once(self) -> bool:
+        db = SessionLocal()
+        try:
+            self._requeue_stale(db)
+            job_id = self._claim_next(db)
+            if job_id is None:
+                return False
+
+            job = db.query(models.AttendanceJob).filter(models.AttendanceJob.job_id == job_id).first()
+            try:
+                result = self._handler(db, job)
+            except Exception as exc:
+                db.rollback()
+                job = db.query(models.AttendanceJob).filter(models.AttendanceJob.job_id == job_id).first()
+                client_error = isinstance(exc, HTTPException) and exc.status_code < 500
+                error = str(getattr(exc, "detail", None) or exc)
+                if not client_error and job.attempts < ATTENDANCE_JOB_MAX_ATTEMPTS:
+                    job.status = "queued"
+                    job.error = error
+                    job.finished_at = None
+                else:
+                    _fail(job, error)
+                db.commit()
+                return True
+
+            job.status = "done"
+            job.result = result
+            job.error = None
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            # Only now is the upload safe to drop: a failure anywhere above
+            # leaves it in place for the retry
+            Path(job.image_path).unlink(missing_ok=True)
+            return True
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                ran = self._run_once()
+            except Exception as exc:
+                print(f"⚠️ Attendance job worker error: {exc}")
+                ran = False
+            if not ran:
+                self._wakeup.wait(self._poll_interval)
+                self._wakeup.clear()
+
+
+def queue_position(db: Session, job: models.AttendanceJob) -> int:
+    """Number of queued jobs ahead of ``job`` by priority and upload order."""
+    return (
+        db.query(models.AttendanceJob)
+        .filter(
+            models.AttendanceJob.status == "queued",
+            models.AttendanceJob.job_id != job.job_id,
+            (models.AttendanceJob.priority > job.priority)
+            | (
+                (models.AttendanceJob.priority == job.priority)
+                & (models.AttendanceJob.created_at <= job.created_at)
+            ),
+        )
+        .count()
+    )
+
+
+_scheduler: Optional[AttendanceJobScheduler] = None
+
+
+def start_job_scheduler(handler: JobHandler) -> Optional[AttendanceJobScheduler]:
+    global _scheduler
+    if _scheduler is None and ATTENDANCE_JOB_WORKERS > 0:
+        _scheduler = AttendanceJobScheduler(handler, ATTENDANCE_JOB_WORKERS)
+        _scheduler.start()
+    return _scheduler
+
+
+def stop_job_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def get_job_scheduler() -> Optional[AttendanceJobScheduler]:
+    return _scheduler
@@ -3,8 +3,13 @@ from fastapi.middleware.cors import CORSMiddleware
 
 
 from backend import models  # noqa: F401
+from backend.ai.ann import face_index
+from backend.ai.engine import warm_up_engine
+from backend.config import AI_SELF_BENCHMARK, AI_WARMUP
 from backend.database import engine
+from backend.jobs import start_job_scheduler, stop_job_scheduler
 from backend.routers import api_router
+from backend.routers.attendance import process_attendance_job
 
 
 models.Base.metadata.create_all(bind=engine)
@@ -22,6 +27,26 @@ app.add_middleware(
 app.include_router(api_router, prefix="/api")
 
 
+@app.on_event("startup")
+def load_ai_models():
+    if AI_WARMUP or AI_SELF_BENCHMARK:
+        warm_up_engine()
+
+
+@app.on_event("startup")
+def build_face_index():
+    # in the background: /lookup and the /auto fallback find no one until it is built
+    face_index.refresh()
+
+
+@app.on_event("startup")
+def start_attendance_jobs():
+    start_job_scheduler(process_attendance_job)
+
+
+@app.on_event("shutdown")
+def stop_attendance_jobs():
+    stop_job_scheduler()
 
 
 @app.get("/")
@@ -0,0 +1,101 @@
+"""
+Convert FaceProfile embeddings from JSONB to the binary embedding_blob column
+and seed one FaceEmbedding sample per profile for multi-sample galleries.
+
+    python -m backend.migrate_embeddings [--dtype float16] [--drop-json]
+
+Safe to re-run: only rows without a blob are converted.
+"""
+import argparse
+
+from sqlalchemy import text
+
+from backend.ai.embeddings import encode_embedding
+from backend.config import EMBEDDING_STORAGE_DTYPE
+from backend.database import SessionLocal, engine
+from backend.models import FaceEmbedding, FaceProfile
+
+
+SCHEMA_STATEMENTS = [
+    "ALTER TABLE face_profiles ADD COLUMN IF NOT EXISTS embedding_blob BYTEA",
+    "ALTER TABLE face_profiles ADD COLUMN IF NOT EXISTS embedding_dtype VARCHAR(8)",
+    "ALTER TABLE face_profiles ALTER COLUMN embedding_vector DROP NOT NULL",
+]
+
+
+SEED_SAMPLES_STATEMENT = """
+    INSERT INTO face_embeddings (reg_no, embedding_blob, embedding_dtype)
+    SELECT p.reg_no, p.embedding_blob, p.embedding_dtype
+    FROM face_profiles p
+    WHERE p.embedding_blob IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM face_embeddings e WHERE e.reg_no = p.reg_no)
+"""
+
+
+def upgrade_schema():
+    with engine.begin() as conn:
+        for stmt in SCHEMA_STATEMENTS:
+            conn.execute(text(stmt))
+    FaceEmbedding.__table__.create(bind=engine, checkfirst=True)
+
+
+def seed_face_samples():
+    with engine.begin() as conn:
+        seeded = conn.execute(text(SEED_SAMPLES_STATEMENT)).rowcount
+    print(f"Seeded {seeded} face samples from existing profiles.")
+
+
+def migrate_embeddings(dtype: str, batch_size: int, drop_json: bool):
+    upgrade_schema()
+    db = SessionLocal()
+    converted = 0
+    try:
+        while True:
+            profiles = (
+                db.query(FaceProfile)
+                .filter(
+                    FaceProfile.embedding_blob.is_(None),
+                    FaceProfile.embedding_vector.isnot(None),
+                )
+                .order_by(FaceProfile.face_id)
+                .limit(batch_size)
+                .all()
+            )
+            if not profiles:
+                break
+            for profile in profiles:
+                profile.embedding_blob = encode_embedding(profile.embedding_vector, dtype)
+                profile.embedding_dtype = dtype
+                if drop_json:
+                    profile.embedding_vector = None
+            db.commit()
+            converted += len(profiles)
+            print(f"Converted {converted} profiles...")
+
+        if drop_json:
+            cleared = (
+                db.query(FaceProfile)
+                .filter(
+                    FaceProfile.embedding_blob.isnot(None),
+                    FaceProfile.embedding_vector.isnot(None),
+                )
+                .update({"embedding_vector": None}, synchronize_session=False)
+            )
+            db.commit()
+            print(f"Cleared JSON embeddings on {cleared} already converted profiles.")
+        print(f"Done. {converted} profiles converted to {dtype}.")
+        seed_face_samples()
+    except Exception as e:
+        print(f"Error: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert JSONB face embeddings to binary")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default=EMBEDDING_STORAGE_DTYPE)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--drop-json", action="store_true", help="null the JSONB copy after converting")
+    args = parser.parse_args()
+    migrate_embeddings(args.dtype, args.batch_size, args.drop_json)
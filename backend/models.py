@@ -7,6 +7,7 @@ from sqlalchemy import (
     Float,
     ForeignKey,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
@@ -176,8 +177,12 @@ class FaceProfile(Base):
 
     face_id = Column(Integer, primary_key=True, index=True)
     reg_no = Column(String(50), ForeignKey("students.reg_no"), unique=True, nullable=False)
-    # store embedding as JSON array of floats for simplicity
-    embedding_vector = Column(JSONB, nullable=False)
+    # legacy: embedding as JSON array of floats (see migrate_embeddings.py)
+    embedding_vector = Column(JSONB, nullable=True)
+    # raw little-endian float32/float16 bytes, read with np.frombuffer;
+    # the normalized centroid of the student's FaceEmbedding samples
+    embedding_blob = Column(LargeBinary, nullable=True)
+    embedding_dtype = Column(String(8), nullable=True)  # "float32", "float16"
 
     student = relationship("Student", back_populates="face_profile", primaryjoin="FaceProfile.reg_no==Student.reg_no")
 
@@ -192,6 +197,19 @@ class FaceImage(Base):
     student = relationship("Student", back_populates="face_images", primaryjoin="FaceImage.reg_no==Student.reg_no")
 
 
+class FaceEmbedding(Base):
+    """One enrollment sample; a student keeps up to MAX_FACE_SAMPLES of these."""
+    __tablename__ = "face_embeddings"
+
+    embedding_id = Column(Integer, primary_key=True, index=True)
+    reg_no = Column(String(50), ForeignKey("students.reg_no"), nullable=False, index=True)
+    image_id = Column(Integer, ForeignKey("face_images.image_id", ondelete="SET NULL"), nullable=True)
+    embedding_blob = Column(LargeBinary, nullable=False)
+    embedding_dtype = Column(String(8), nullable=False, default="float32")
+
+    image = relationship("FaceImage")
+
+
 class AttendanceSession(Base):
     __tablename__ = "attendance_sessions"
 
@@ -235,6 +253,29 @@ class AttendanceRecord(Base):
     )
 
 
+class AttendanceJob(Base):
+    """Queued /attendance/jobs upload; persisted so a restart loses no photo."""
+    __tablename__ = "attendance_jobs"
+
+    job_id = Column(Integer, primary_key=True, index=True)
+    class_id = Column(String(10), ForeignKey("classes.class_id"), nullable=False)
+    subject_code = Column(String(50), ForeignKey("subjects.subject_code"), nullable=False)
+    teacher_id = Column(Integer, ForeignKey("teachers.teacher_id"), nullable=False, index=True)
+    date = Column(Date, nullable=False)
+    period = Column(Integer, nullable=False)
+    image_path = Column(Text, nullable=False)
+    priority = Column(Integer, nullable=False, default=0)  # higher runs first
+    status = Column(String(20), nullable=False, default="queued", index=True)  # "queued", "running", "done", "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSONB, nullable=True)  # AttendanceSummary payload
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    teacher = relationship("Teacher")
+
+
 class LeaveRequest(Base):
     __tablename__ = "leave_requests"
 
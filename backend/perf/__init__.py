@@ -0,0 +1 @@
+# Performance regression checks (SQL statement counts, latency budgets)
@@ -0,0 +1,84 @@
+"""
+SQL statement-count regression check for the /attendance/auto finalize
+step (session, roster snapshot, status classification).
+
+Seeds classes of several sizes in a rolled-back transaction against
+DATABASE_URL and counts the statements ``_finalize_auto_attendance``
+sends, for a new session and for a repeat upload to an existing one. The
+count must stay within ``--budget`` and must not grow with the class size.
+
+    python -m backend.perf.auto_attendance_sql --sizes 30 70 200 --budget 4
+
+Exits with status 1 when the budget is broken.
+"""
+import argparse
+import json
+import sys
+from datetime import date
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from backend.ai.proof import delete_proof
+from backend.database import engine
+from backend.perf.seed import rollback_session, seed_class
+from backend.perf.sql_counter import StatementCounter
+from backend.routers.attendance import SessionCreate, _finalize_auto_attendance
+
+
+def _diagnostics() -> Dict[str, object]:
+    return {"image": {"width": 640, "height": 480}, "detections": []}
+
+
+def measure(students: int) -> Dict[str, object]:
+    proof_source = np.zeros(16, dtype=np.uint8)  # stand-in for the encoded upload
+    with rollback_session() as db:
+        seeded = seed_class(db, students)
+        payload = SessionCreate(
+            class_id=seeded.class_id,
+            subject_code=seeded.subject_code,
+            teacher_id=seeded.teacher_id,
+            date=date.today(),
+            period=1,
+        )
+        present = seeded.reg_nos[: students * 3 // 4]
+        runs = {}
+        session_id = None
+        with StatementCounter(engine) as counter:
+            for run in ("new_session", "existing_session"):
+                counter.reset()
+                summary = _finalize_auto_attendance(db, payload, present, proof_source, _diagnostics())
+                session_id = summary.session_id
+                runs[run] = {"statements": counter.count, "by_verb": counter.by_verb()}
+                if len(summary.present) != len(present) or len(summary.absent) != students - len(present):
+                    raise AssertionError(f"wrong classification for {students} students")
+        delete_proof(session_id)
+    return {"students": students, **runs}
+
+
+def check(results: Sequence[Dict[str, object]], budget: int) -> List[str]:
+    failures = []
+    for run in ("new_session", "existing_session"):
+        counts = {r["students"]: r[run]["statements"] for r in results}
+        for students, count in counts.items():
+            if count > budget:
+                failures.append(f"{run}: {count} statements for {students} students (budget {budget})")
+        if len(set(counts.values())) > 1:
+            failures.append(f"{run}: statement count grows with class size {counts}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 70, 200])
+    parser.add_argument("--budget", type=int, default=4, help="max statements per finalize")
+    args = parser.parse_args()
+
+    results = [measure(n) for n in args.sizes]
+    failures = check(results, args.budget)
+    print(json.dumps({"budget": args.budget, "results": results, "failures": failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
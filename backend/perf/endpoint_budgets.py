@@ -0,0 +1,271 @@
+"""
+SQL statement-count and latency budgets for the API routers.
+
+Seeds a small institution inside a transaction that is rolled back
+(``seed_institution``: generate_institution.py's rules at 2 departments,
+4 classes of 60 and a semester of attendance, with tasks, marks and leave
+requests) against
+DATABASE_URL, then calls each endpoint below through the FastAPI app with
+a real JWT. Every request gets its own Session on the seeded connection;
+write endpoints run inside a savepoint that is rolled back after each
+call, so every endpoint sees the same data.
+
+For each endpoint the statements of the first call are counted and the
+median wall time of ``--repeat`` calls is taken. It fails when either is
+over the endpoint's budget:
+
+    python -m backend.perf.endpoint_budgets
+    python -m backend.perf.endpoint_budgets --only teacher. --repeat 10
+    python -m backend.perf.endpoint_budgets --time-factor 3      # slow host
+    python -m backend.perf.endpoint_budgets --record budgets.json
+    python -m backend.perf.endpoint_budgets --budgets budgets.json
+
+The built-in budgets below were recorded against the default seed;
+``--record`` writes the measured counts and times as a JSON file that
+``--budgets`` reads back in place of them (for a slower or faster host).
+Endpoints that touch files under storage/ are listed in EXCLUDED instead.
+
+Exits with status 1 when a budget is broken or an endpoint does not
+return 2xx.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from backend.database import engine, get_db
+from backend.main import app
+from backend.perf.seed import SeededInstitution, rollback_connection, seed_institution
+from backend.perf.sql_counter import StatementCounter
+from backend.routers.auth import create_access_token
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: str  # formatted with the SeededInstitution fields
+    role: Optional[str]  # whose JWT is sent: "admin", "teacher", "student" or None
+    statements: int
+    ms: float
+    params: Optional[Callable[[SeededInstitution], dict]] = None
+    body: Optional[Callable[[SeededInstitution], object]] = None
+
+
+# Recorded with --record --repeat 9 against the default seed on PostgreSQL 16
+# (one vCPU). Statement budgets are the measured counts; ms budgets are three
+# times the slowest median of three runs, rounded up to 5 ms and at least 25.
+ENDPOINTS: List[Endpoint] = [
+    Endpoint("auth.me", "GET", "/api/auth/me", "teacher", 2, 25),
+    # admin
+    Endpoint("admin.departments", "GET", "/api/admin/departments", "admin", 2, 25),
+    Endpoint("admin.classes", "GET", "/api/admin/classes", "admin", 2, 25),
+    Endpoint("admin.students", "GET", "/api/admin/students", "admin", 2, 25, params=lambda s: {"class_id": s.class_id}),
+    Endpoint("admin.teachers", "GET", "/api/admin/teachers", "admin", 2, 25),
+    Endpoint("admin.class_timetable", "GET", "/api/admin/timetable/class/{class_id}", "admin", 2, 25),
+    Endpoint("admin.student_attendance", "GET", "/api/admin/attendance/records/{student_reg_no}", "admin", 3, 205),
+    # student
+    Endpoint("student.today", "GET", "/api/student/today", "student", 6, 30),
+    Endpoint("student.weekly", "GET", "/api/student/weekly", "student", 5, 35),
+    Endpoint("student.timetable", "GET", "/api/student/timetable", "student", 5, 35),
+    Endpoint("student.subjects", "GET", "/api/student/subjects", "student", 5, 25),
+    Endpoint("student.reg_today", "GET", "/api/student/{student_reg_no}/today", None, 1, 25),
+    Endpoint(
+        "student.sheet",
+        "GET",
+        "/api/student/{student_reg_no}/sheet",
+        None,
+        1,
+        180,
+        params=lambda s: {"from_date": str(s.latest_day - timedelta(days=125)), "to_date": str(s.latest_day)},
+    ),
+    # teacher
+    Endpoint("teacher.classes", "GET", "/api/teacher/{teacher_id}/classes", None, 7, 25),
+    Endpoint("teacher.students", "GET", "/api/teacher/{teacher_id}/students/{class_id}", None, 2, 25),
+    Endpoint("teacher.sessions", "GET", "/api/teacher/{teacher_id}/sessions", None, 2, 25, params=lambda s: {"day": str(s.latest_day)}),
+    Endpoint(
+        "teacher.history", "GET", "/api/teacher/attendance-history", "teacher", 6, 35,
+        params=lambda s: {"subject_code": s.subject_code},
+    ),
+    Endpoint(
+        "teacher.class_history", "GET", "/api/teacher/{teacher_id}/attendance-history/{class_id}", None, 3, 30,
+        params=lambda s: {"subject_code": s.subject_code, "days": 7},
+    ),
+    Endpoint("teacher.session_detail", "GET", "/api/teacher/{teacher_id}/session/{latest_session_id}", None, 2, 25),
+    Endpoint(
+        "teacher.weekly", "GET", "/api/teacher/{teacher_id}/weekly-attendance", None, 4, 50,
+        params=lambda s: {"class_id": s.class_id, "subject_code": s.subject_code},
+    ),
+    Endpoint("teacher.inbox", "GET", "/api/teacher/{teacher_id}/inbox", None, 1, 25),
+    Endpoint(
+        "teacher.session_edit", "PUT", "/api/teacher/{teacher_id}/session/{latest_session_id}/edit", None, 2, 40,
+        body=lambda s: [{"reg_no": r, "status": "A" if i % 5 == 0 else "P"} for i, r in enumerate(s.roster)],
+    ),
+    Endpoint(
+        "teacher.bulk_approve", "POST", "/api/teacher/{teacher_id}/inbox/bulk-approve", None, 3, 30,
+        body=lambda s: {"approval_ids": s.approval_ids},
+    ),
+    # marks
+    Endpoint("marks.config", "GET", "/api/marks/config/{subject_code}", None, 1, 25),
+    Endpoint(
+        "marks.entry_sheet", "GET", "/api/marks/entry_sheet", "teacher", 7, 55,
+        params=lambda s: {"class_id": s.class_id, "subject_code": s.subject_code},
+    ),
+    Endpoint("marks.statistics", "GET", "/api/marks/statistics/{class_id}/{subject_code}", "teacher", 3, 35),
+    # tasks
+    Endpoint("tasks.teacher_list", "GET", "/api/tasks/teacher/list", "teacher", 5, 25),
+    Endpoint("tasks.student_list", "GET", "/api/tasks/student/list", "student", 6, 50),
+    Endpoint("tasks.submissions", "GET", "/api/tasks/{assignment_task_id}/submissions", "teacher", 5, 40),
+    # ebook
+    Endpoint("ebook.subject", "GET", "/api/ebook/subject/{subject_code}", "teacher", 3, 25),
+    Endpoint("ebook.teacher", "GET", "/api/ebook/teacher", "teacher", 5, 25),
+    # profiles
+    Endpoint("profiles.get", "GET", "/api/profiles/{student_id}", "admin", 5, 25),
+    Endpoint("profiles.my", "GET", "/api/profiles/my/profile", "student", 9, 25),
+    Endpoint(
+        "profiles.save", "POST", "/api/profiles/", "admin", 8, 30,
+        body=lambda s: {"student_id": s.student_id, "student_mobile": "9000000000", "state": "Kerala"},
+    ),
+    # attendance
+    Endpoint("attendance.session_summary", "GET", "/api/attendance/sessions/{latest_session_id}/summary", None, 2, 25),
+    Endpoint(
+        "attendance.manual", "POST", "/api/attendance/manual", None, 3, 75,
+        body=lambda s: {
+            "class_id": s.class_id,
+            "subject_code": s.subject_code,
+            "teacher_id": s.teacher_id,
+            "date": str(s.latest_day),
+            "period": s.period,
+            "records": [{"reg_no": r, "status": "A" if i % 4 == 0 else "P"} for i, r in enumerate(s.roster)],
+        },
+    ),
+]
+
+# Not measured here: they read or write files under storage/, which the
+# rolled-back transaction does not undo and the seed does not create
+EXCLUDED = {
+    "POST /api/ebook/upload": "writes the uploaded file to storage/ebooks",
+    "GET /api/ebook/download/{material_id}": "serves a file from storage/ebooks; the seeded rows have none",
+}
+
+
+def _tokens(seeded: SeededInstitution) -> Dict[str, str]:
+    return {
+        "admin": create_access_token({"user_id": seeded.admin_user_id, "role": "admin"}),
+        "teacher": create_access_token({"user_id": seeded.teacher_user_id, "role": "teacher"}),
+        "student": create_access_token({"user_id": seeded.student_user_id, "role": "student"}),
+    }
+
+
+def _call(client: TestClient, spec: Endpoint, seeded: SeededInstitution, headers: Dict[str, str]):
+    return client.request(
+        spec.method,
+        spec.path.format(**asdict(seeded)),
+        params=spec.params(seeded) if spec.params else None,
+        json=spec.body(seeded) if spec.body else None,
+        headers=headers,
+    )
+
+
+def measure(specs: List[Endpoint], repeat: int) -> Dict[str, object]:
+    with rollback_connection() as connection:
+
+        def request_session():
+            db = Session(bind=connection, join_transaction_mode="create_savepoint")
+            try:
+                yield db
+            finally:
+                db.close()
+
+        seed_db = Session(bind=connection, join_transaction_mode="create_savepoint")
+        seeded = seed_institution(seed_db)
+        seed_db.commit()
+        seed_db.close()
+
+        tokens = _tokens(seeded)
+        app.dependency_overrides[get_db] = request_session
+        # no context manager: startup hooks (model warm-up, job workers) are not run
+        client = TestClient(app)
+        results = []
+        try:
+            with StatementCounter(engine) as counter:
+                for spec in specs:
+                    headers = {"Authorization": f"Bearer {tokens[spec.role]}"} if spec.role else {}
+                    runs, statements, status_code = [], None, None
+                    for _ in range(max(1, repeat)):
+                        savepoint = connection.begin_nested()
+                        counter.reset()
+                        start = time.perf_counter()
+                        response = _call(client, spec, seeded, headers)
+                        runs.append(time.perf_counter() - start)
+                        if statements is None:
+                            statements, by_verb, status_code = counter.count, counter.by_verb(), response.status_code
+                        savepoint.rollback()
+                    results.append(
+                        {
+                            "name": spec.name,
+                            "status": status_code,
+                            "statements": statements,
+                            "by_verb": by_verb,
+                            "ms": round(statistics.median(runs) * 1000.0, 2),
+                        }
+                    )
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+    return {"seed": seeded.counts, "results": results}
+
+
+def check(specs: List[Endpoint], results: List[Dict[str, object]], time_factor: float) -> List[str]:
+    by_name = {spec.name: spec for spec in specs}
+    failures = []
+    for r in results:
+        spec = by_name[r["name"]]
+        if not 200 <= r["status"] < 300:
+            failures.append(f"{spec.name}: HTTP {r['status']}")
+        if r["statements"] > spec.statements:
+            failures.append(f"{spec.name}: {r['statements']} statements (budget {spec.statements})")
+        if r["ms"] > spec.ms * time_factor:
+            failures.append(f"{spec.name}: {r['ms']} ms (budget {spec.ms * time_factor:g})")
+    return failures
+
+
+def load_budgets(path: str, specs: List[Endpoint]) -> None:
+    """Replace the built-in budgets with the ones recorded in ``path``."""
+    with open(path) as f:
+        recorded = json.load(f)
+    for spec in specs:
+        if spec.name in recorded:
+            spec.statements = recorded[spec.name]["statements"]
+            spec.ms = recorded[spec.name]["ms"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", default=None, help="endpoint name prefixes, e.g. teacher. marks.")
+    parser.add_argument("--repeat", type=int, default=5, help="calls per endpoint for the median time")
+    parser.add_argument("--time-factor", type=float, default=1.0, help="scale every latency budget")
+    parser.add_argument("--budgets", default=None, help="JSON budgets written by --record")
+    parser.add_argument("--record", default=None, help="write the measured counts and times here")
+    args = parser.parse_args()
+
+    specs = [s for s in ENDPOINTS if not args.only or s.name.startswith(tuple(args.only))]
+    if args.budgets:
+        load_budgets(args.budgets, specs)
+    report = measure(specs, args.repeat)
+    if args.record:
+        with open(args.record, "w") as f:
+            json.dump({r["name"]: {"statements": r["statements"], "ms": r["ms"]} for r in report["results"]}, f, indent=2)
+    failures = check(specs, report["results"], args.time_factor)
+    print(json.dumps({**report, "failures": failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+"""
+A synthetic institution: departments, classes, students with profiles,
+teachers, a timetable, attendance with leave requests, tasks, submissions,
+marks and e-book listings (rows only; no files are written).
+
+``Institution`` decides every row and a writer stores them:
+generate_institution.py streams a large one with ``CopyWriter``, and the
+endpoint budget checks (``backend.perf.seed.seed_institution``) write a
+small one with ``InsertWriter`` inside a transaction that is rolled back.
+"""
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from types import SimpleNamespace
+from typing import Iterable, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.models import Base
+from backend.routers.marks import compute_marks
+
+YEARS = 4  # class c of a department is year c % 4 + 1, section c // 4
+PERIODS = 7  # also the number of subjects per year of a department
+DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat")
+COPY_CHUNK = 200_000
+# tables whose ids other rows point at: written explicitly, then the serials are moved past them
+EXPLICIT_IDS = (
+    ("users", "user_id"),
+    ("departments", "dept_id"),
+    ("batches", "batch_id"),
+    ("teachers", "teacher_id"),
+    ("students", "student_id"),
+    ("attendance_sessions", "session_id"),
+    ("tasks", "task_id"),
+    ("leave_requests", "request_id"),
+)
+
+
+class CopyWriter:
+    """Streams rows with COPY over a raw psycopg2 cursor (generate_institution.py)."""
+
+    def __init__(self, cur, verbose: bool = True) -> None:
+        self.cur = cur
+        self.verbose = verbose
+
+    def write(self, table: str, columns: Sequence[str], rows: Iterable[tuple]) -> int:
+        """COPY ``rows`` (tuples, None for NULL) into ``table`` in chunks; returns the row count."""
+        started = time.perf_counter()
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+            if count % COPY_CHUNK == 0:
+                buf.seek(0)
+                self.cur.copy_expert(sql, buf)
+                buf = io.StringIO()
+                writer = csv.writer(buf)
+        if buf.tell():
+            buf.seek(0)
+            self.cur.copy_expert(sql, buf)
+        if self.verbose:
+            print(f"  {table}: {count:,} rows in {time.perf_counter() - started:.1f}s", flush=True)
+        return count
+
+    def scalar(self, sql: str):
+        self.cur.execute(sql)
+        return self.cur.fetchone()[0]
+
+
+class InsertWriter:
+    """Executemany INSERTs through a Session, inside the caller's transaction (the perf checks)."""
+
+    def __init__(self, db: Session, chunk: int = 10_000) -> None:
+        self.db = db
+        self.chunk = chunk
+
+    def write(self, table: str, columns: Sequence[str], rows: Iterable[tuple]) -> int:
+        stmt = Base.metadata.tables[table].insert()
+        count = 0
+        rows = iter(rows)
+        while True:
+            batch = [dict(zip(columns, row)) for row in islice(rows, self.chunk)]
+            if not batch:
+                return count
+            self.db.execute(stmt, batch)
+            count += len(batch)
+
+    def scalar(self, sql: str):
+        return self.db.execute(text(sql)).scalar()
+
+
+def next_id(writer, table: str, column: str) -> int:
+    return writer.scalar(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+
+
+def sync_sequence(writer, table: str, column: str) -> None:
+    """Move the serial past the ids written explicitly."""
+    writer.scalar(
+        f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), (SELECT COALESCE(MAX({column}), 1) FROM {table}))"
+    )
+
+
+class Institution:
+    """
+    The rows of a synthetic institution, written table by table through a
+    writer (CopyWriter or InsertWriter). The same arguments always give the
+    same rows, apart from the ids, which continue from what is in the database.
+    """
+
+    def __init__(self, seed, departments, classes_per_dept, students, days, end, prefix, password_hash):
+        if not 1 <= classes_per_dept <= 3 * YEARS:
+            raise ValueError(f"classes_per_dept must be 1-{3 * YEARS}")
+        self.rng = random.Random(seed)
+        self.end = end
+        self.prefix = prefix
+        self.password_hash = password_hash
+        self.n_depts = departments
+        self.working_days = [
+            d for d in (end - timedelta(days=k) for k in range(days - 1, -1, -1)) if d.weekday() < len(DAYS)
+        ]
+        self.classes = [(d, c) for d in range(self.n_depts) for c in range(classes_per_dept)]
+        self.years = sorted({self.year_of(c) for c in range(classes_per_dept)})
+        total = max(len(self.classes), students)
+        per_class, extra = divmod(total, len(self.classes))
+        self.roster = {
+            key: [f"{prefix}{key[0]:03d}{key[1]}{i:03d}" for i in range(per_class + (n < extra))]
+            for n, key in enumerate(self.classes)
+        }
+        # how often each student misses a period
+        self.absence = {reg: self.rng.uniform(0.02, 0.25) for regs in self.roster.values() for reg in regs}
+        self.counts = {}
+
+    # ---------- naming ----------
+
+    def class_id(self, d, c):
+        return f"{self.prefix}{d:03d}{c}"
+
+    def subject_code(self, d, year, s):
+        return f"{self.prefix}{d:03d}{year}{s}"
+
+    @staticmethod
+    def year_of(c):
+        return c % YEARS + 1
+
+    @staticmethod
+    def slot(d, c, period):
+        """(subject index, year) taught to class c in ``period``; sections rotate so teachers never clash."""
+        return (period - 1 + c // YEARS) % PERIODS, Institution.year_of(c)
+
+    # ---------- tables ----------
+
+    def run(self, writer):
+        self.writer = writer
+        self.ids = {
+            table: next_id(writer, table, column)
+            for table, column in EXPLICIT_IDS
+        }
+        self.structure()
+        self.people()
+        self.attendance()
+        self.coursework()
+        for table, column in EXPLICIT_IDS:
+            sync_sequence(writer, table, column)
+
+    def _write(self, table, columns, rows):
+        n = self.writer.write(table, columns, rows)
+        self.counts[table] = self.counts.get(table, 0) + n
+
+    def structure(self):
+        ids, p = self.ids, self.prefix
+        self.dept_ids = [ids["departments"] + d for d in range(self.n_depts)]
+        self._write(
+            "departments", ("dept_id", "dept_name"),
+            ((dept_id, f"{p} Department {d + 1:03d}") for d, dept_id in enumerate(self.dept_ids)),
+        )
+        # the batch currently in year y started y years before the end of the range
+        self.batch_ids = {y: ids["batches"] + y - 1 for y in range(1, YEARS + 1)}
+        self._write(
+            "batches", ("batch_id", "start_year", "end_year"),
+            ((bid, self.end.year - y, self.end.year - y + YEARS) for y, bid in self.batch_ids.items()),
+        )
+        self._write(
+            "classes", ("class_id", "dept_id", "batch_id", "year", "section"),
+            (
+                (self.class_id(d, c), self.dept_ids[d], self.batch_ids[self.year_of(c)], self.year_of(c), "ABC"[c // YEARS])
+                for d, c in self.classes
+            ),
+        )
+        self.subjects = [(d, y, s) for d in range(self.n_depts) for y in self.years for s in range(PERIODS)]
+        self._write(
+            "subjects", ("subject_code", "subject_name", "credits", "dept_id", "semester"),
+            (
+                (self.subject_code(d, y, s), f"Subject {y}.{s + 1}", 4 if s < 4 else 3, self.dept_ids[d], 2 * y - 1)
+                for d, y, s in self.subjects
+            ),
+        )
+        # the last subject of every year is a lab-integrated 50/50 course
+        self.grading = {
+            key: SimpleNamespace(
+                internal_weight=50 if key[2] == PERIODS - 1 else 40,
+                external_weight=50 if key[2] == PERIODS - 1 else 60,
+                has_lab=key[2] == PERIODS - 1,
+                is_pure_practical=False,
+            )
+            for key in self.subjects
+        }
+        self._write(
+            "subject_grading_configs",
+            ("subject_code", "internal_weight", "external_weight", "has_lab", "is_pure_practical", "cia_count", "assignment_count"),
+            (
+                (self.subject_code(*key), g.internal_weight, g.external_weight, g.has_lab, g.is_pure_practical, 2, 2)
+                for key, g in self.grading.items()
+            ),
+        )
+        self._write(
+            "class_subject_map", ("class_id", "subject_code"),
+            (
+                (self.class_id(d, c), self.subject_code(d, self.year_of(c), s))
+                for d, c in self.classes
+                for s in range(PERIODS)
+            ),
+        )
+
+    def people(self):
+        ids, p = self.ids, self.prefix
+        # one teacher per subject; teacher (d, y, s) teaches s to every section of year y
+        self.teacher_ids = {key: ids["teachers"] + i for i, key in enumerate(self.subjects)}
+        n_teachers = len(self.subjects)
+        self.student_ids = {}
+        self.student_user_ids = {}
+        next_user = ids["users"] + n_teachers
+        next_student = ids["students"]
+        for key in self.classes:
+            for reg in self.roster[key]:
+                self.student_user_ids[reg] = next_user
+                self.student_ids[reg] = next_student
+                next_user += 1
+                next_student += 1
+
+        def users():
+            for i, (d, y, s) in enumerate(self.subjects):
+                yield ids["users"] + i, f"{p.lower()}t{d:03d}{y}{s}@example.com", self.password_hash, "teacher", "active"
+            for reg, user_id in self.student_user_ids.items():
+                yield user_id, f"{reg.lower()}@example.com", self.password_hash, "student", "active"
+
+        self._write("users", ("user_id", "email", "password", "role", "status"), users())
+        self._write(
+            "teachers", ("teacher_id", "employee_no", "name", "dept_id", "user_id"),
+            (
+                (tid, f"{p}T{d:03d}{y}{s}", f"Teacher {d + 1}-{y}-{s + 1}", self.dept_ids[d], ids["users"] + i)
+                for i, ((d, y, s), tid) in enumerate(self.teacher_ids.items())
+            ),
+        )
+        self._write(
+            "teacher_subject_map", ("teacher_id", "subject_code"),
+            ((tid, self.subject_code(*key)) for key, tid in self.teacher_ids.items()),
+        )
+        self._write(
+            "students", ("student_id", "reg_no", "name", "dept_id", "batch_id", "class_id", "user_id"),
+            (
+                (
+                    self.student_ids[reg],
+                    reg,
+                    f"Student {reg[len(p):]}",
+                    self.dept_ids[d],
+                    self.batch_ids[self.year_of(c)],
+                    self.class_id(d, c),
+                    self.student_user_ids[reg],
+                )
+                for d, c in self.classes
+                for reg in self.roster[(d, c)]
+            ),
+        )
+        # contact details use no rng draws, so the rows after them do not depend on them
+        self._write(
+            "student_profiles",
+            ("student_id", "personal_email", "student_mobile", "address", "state", "tenth_mark", "twelfth_mark"),
+            (
+                (
+                    student_id,
+                    f"{reg.lower()}@mail.example.com",
+                    f"9{student_id % 10**9:09d}",
+                    f"{student_id % 200 + 1} Main Road",
+                    "Tamil Nadu",
+                    f"{95 - 100 * self.absence[reg]:.1f}",
+                    f"{93 - 100 * self.absence[reg]:.1f}",
+                )
+                for reg, student_id in self.student_ids.items()
+            ),
+        )
+
+        def timetable():
+            for d, c in self.classes:
+                for day in DAYS:
+                    for period in range(1, PERIODS + 1):
+                        s, y = self.slot(d, c, period)
+                        yield day, period, self.class_id(d, c), self.teacher_ids[(d, y, s)], self.subject_code(d, y, s)
+
+        self._write("timetables", ("day", "period", "class_id", "teacher_id", "subject_code"), timetable())
+
+    def session_id(self, day_index, class_index, period):
+        return self.ids["attendance_sessions"] + (day_index * len(self.classes) + class_index) * PERIODS + period - 1
+
+    def attendance(self):
+        rng = self.rng
+        day_index = {day: k for k, day in enumerate(self.working_days)}
+        class_index = {key: i for i, key in enumerate(self.classes)}
+
+        # Leave requests: about two per student over the range, a day each.
+        # Older ones are decided (the approved ones override the record status),
+        # the last three days are still pending.
+        requests, approved = [], {}
+        for key in self.classes:
+            for reg in self.roster[key]:
+                for _ in range(rng.randint(0, 4)):
+                    day = rng.choice(self.working_days)
+                    periods = sorted(rng.sample(range(1, PERIODS + 1), rng.randint(1, 3))) if rng.random() < 0.3 else None
+                    kind = "OD" if rng.random() < 0.7 else "ML"
+                    if day > self.end - timedelta(days=3):
+                        decision = "Pending"
+                    else:
+                        decision = "Approved" if rng.random() < 0.8 else "Rejected"
+                    requests.append((key, reg, day, kind, periods, decision))
+                    if decision == "Approved":
+                        for period in periods or range(1, PERIODS + 1):
+                            approved[(reg, day, period)] = kind
+
+        def sessions():
+            for k, day in enumerate(self.working_days):
+                for i, (d, c) in enumerate(self.classes):
+                    for period in range(1, PERIODS + 1):
+                        s, y = self.slot(d, c, period)
+                        yield (
+                            self.session_id(k, i, period),
+                            self.class_id(d, c),
+                            self.subject_code(d, y, s),
+                            self.teacher_ids[(d, y, s)],
+                            day,
+                            period,
+                        )
+
+        def records():
+            for k, day in enumerate(self.working_days):
+                for i, key in enumerate(self.classes):
+                    roster = self.roster[key]
+                    for period in range(1, PERIODS + 1):
+                        sid = self.session_id(k, i, period)
+                        for reg in roster:
+                            status = approved.get((reg, day, period))
+                            if status is None:
+                                status = "A" if rng.random() < self.absence[reg] else "P"
+                            yield sid, reg, status
+
+        self._write("attendance_sessions", ("session_id", "class_id", "subject_code", "teacher_id", "date", "period"), sessions())
+        self._write("attendance_records", ("session_id", "reg_no", "status"), records())
+
+        request_ids = [self.ids["leave_requests"] + n for n in range(len(requests))]
+        self._write(
+            "leave_requests",
+            ("request_id", "student_reg_no", "request_type", "from_date", "to_date", "periods", "reason", "created_at"),
+            (
+                (
+                    rid,
+                    reg,
+                    kind,
+                    day,
+                    day,
+                    ",".join(map(str, periods)) if periods else "All",
+                    "Symposium" if kind == "OD" else "Fever",
+                    day - timedelta(days=rng.randint(0, 3)),
+                )
+                for rid, (_, reg, day, kind, periods, _) in zip(request_ids, requests)
+            ),
+        )
+
+        def approvals():
+            for rid, (key, _, day, _, periods, decision) in zip(request_ids, requests):
+                d, c = key
+                for period in periods or range(1, PERIODS + 1):
+                    s, y = self.slot(d, c, period)
+                    yield rid, self.session_id(day_index[day], class_index[key], period), self.teacher_ids[(d, y, s)], decision
+
+        self._write("leave_request_approvals", ("request_id", "session_id", "teacher_id", "status"), approvals())
+
+    def coursework(self):
+        rng = self.rng
+        start = datetime.combine(self.working_days[0], datetime.min.time())
+        end = datetime.combine(self.end, datetime.min.time())
+        span = max(1, (end - start).days)
+        span_days = len(self.working_days)
+        # per class and subject: an assignment every ~3 months, a daily task every two weeks
+        n_assignments = max(2, span_days // 78)
+        n_daily = max(1, span_days // 12)
+
+        tasks = []
+        for d, c in self.classes:
+            y = self.year_of(c)
+            for s in range(PERIODS):
+                for kind, n in (("Assignment", n_assignments), ("Daily", n_daily)):
+                    for j in range(n):
+                        created = start + timedelta(days=span * j // n, hours=rng.randint(8, 16))
+                        tasks.append(((d, c), (d, y, s), kind, j + 1, created))
+        task_ids = [self.ids["tasks"] + n for n in range(len(tasks))]
+        self.tasks = dict(zip(task_ids, tasks))
+        self._write(
+            "tasks",
+            ("task_id", "teacher_id", "class_id", "subject_code", "type", "title", "description", "deadline", "max_marks", "created_at"),
+            (
+                (
+                    tid,
+                    self.teacher_ids[subject],
+                    self.class_id(*key),
+                    self.subject_code(*subject),
+                    kind,
+                    f"{kind} {j}",
+                    None,
+                    created + timedelta(days=7 if kind == "Assignment" else 1),
+                    10,
+                    created,
+                )
+                for tid, (key, subject, kind, j, created) in zip(task_ids, tasks)
+            ),
+        )
+
+        def submissions():
+            for tid, (key, _, kind, _, created) in zip(task_ids, tasks):
+                if kind != "Assignment":
+                    continue
+                deadline = created + timedelta(days=7)
+                for reg in self.roster[key]:
+                    if rng.random() < self.absence[reg] * 2:
+                        continue
+                    submitted = created + timedelta(days=rng.randint(0, 9), minutes=rng.randint(0, 600))
+                    if submitted > end:
+                        continue
+                    late = submitted > deadline
+                    graded = deadline < end and rng.random() < 0.9
+                    yield (
+                        tid,
+                        self.student_ids[reg],
+                        submitted,
+                        "Graded" if graded else ("Late" if late else "Submitted"),
+                        float(rng.randint(3, 10)) if graded else None,
+                    )
+
+        self._write("submissions", ("task_id", "student_id", "submitted_at", "status", "marks_obtained"), submissions())
+
+        def marks():
+            for d, c in self.classes:
+                y = self.year_of(c)
+                for s in range(PERIODS):
+                    config = self.grading[(d, y, s)]
+                    for reg in self.roster[(d, c)]:
+                        ability = 1.0 - self.absence[reg]
+                        entry = SimpleNamespace(
+                            cia1_score=round(max(0.0, min(100.0, rng.gauss(70 * ability, 12))), 1),
+                            cia2_score=round(max(0.0, min(100.0, rng.gauss(72 * ability, 12))), 1),
+                            assign1_score=float(rng.randint(5, 10)),
+                            assign2_score=float(rng.randint(5, 10)),
+                            lab_internal_score=float(rng.randint(25, 50)) if config.has_lab else None,
+                            lab_external_score=None,
+                            final_exam_score=round(max(0.0, min(100.0, rng.gauss(68 * ability, 15))), 1),
+                        )
+                        compute_marks(entry, config)
+                        yield (
+                            self.student_ids[reg],
+                            self.subject_code(d, y, s),
+                            entry.cia1_score,
+                            entry.cia2_score,
+                            entry.assign1_score,
+                            entry.assign2_score,
+                            entry.lab_internal_score,
+                            entry.lab_external_score,
+                            entry.final_exam_score,
+                            entry.total_internal,
+                            entry.total_external,
+                            entry.grand_total,
+                            entry.grade,
+                            entry.status,
+                        )
+
+        self._write(
+            "mark_entries",
+            (
+                "student_id", "subject_code", "cia1_score", "cia2_score", "assign1_score", "assign2_score",
+                "lab_internal_score", "lab_external_score", "final_exam_score", "total_internal",
+                "total_external", "grand_total", "grade", "status",
+            ),
+            marks(),
+        )
+
+        # three units of notes per subject, spread over the range
+        self._write(
+            "ebooks", ("subject_code", "teacher_id", "title", "file_path", "file_type", "uploaded_at"),
+            (
+                (
+                    self.subject_code(*key),
+                    tid,
+                    f"Unit {u} notes",
+                    f"storage/ebooks/{self.subject_code(*key)}_{tid}_unit{u}.pdf",
+                    "pdf",
+                    self.working_days[(len(self.working_days) - 1) * (u - 1) // 3],
+                )
+                for key, tid in self.teacher_ids.items()
+                for u in range(1, 4)
+            ),
+        )
@@ -0,0 +1,216 @@
+"""
+Throwaway data for the perf checks. Everything is created inside the
+caller's transaction, which the checks roll back, so nothing persists.
+"""
+import random
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Iterator, List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.database import engine
+from backend.perf.institution import PERIODS, InsertWriter, Institution
+
+
+@dataclass
+class SeededClass:
+    class_id: str
+    dept_id: int
+    subject_code: str
+    teacher_id: int
+    reg_nos: List[str]
+
+
+@contextmanager
+def rollback_connection() -> Iterator[Connection]:
+    """A connection inside one outer transaction that is always rolled back."""
+    connection = engine.connect()
+    outer = connection.begin()
+    try:
+        yield connection
+    finally:
+        outer.rollback()
+        connection.close()
+
+
+@contextmanager
+def rollback_session() -> Iterator[Session]:
+    """
+    A Session whose commits only release savepoints inside one outer
+    transaction that is always rolled back.
+    """
+    with rollback_connection() as connection:
+        db = Session(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def seed_class(db: Session, students: int, password_hash: str = "!") -> SeededClass:
+    """One department, batch, class, subject and teacher plus ``students`` students."""
+    tag = uuid.uuid4().hex[:6].upper()
+    dept = models.Department(dept_name=f"PERF-{tag}")
+    batch = models.Batch(start_year=2024, end_year=2028)
+    db.add_all([dept, batch])
+    db.flush()
+
+    cls = models.Class(class_id=f"P{tag}", dept_id=dept.dept_id, batch_id=batch.batch_id, year=1, section="A")
+    subject = models.Subject(
+        subject_code=f"PS{tag}", subject_name="Perf Subject", credits=3, dept_id=dept.dept_id, semester=1
+    )
+    teacher_user = models.User(email=f"perf-teacher-{tag}@example.com", password=password_hash, role="teacher")
+    db.add_all([cls, subject, teacher_user])
+    db.flush()
+
+    teacher = models.Teacher(
+        employee_no=f"PT{tag}", name="Perf Teacher", dept_id=dept.dept_id, user_id=teacher_user.user_id
+    )
+    users = [
+        models.User(email=f"perf-{tag}-{i:04d}@example.com", password=password_hash, role="student")
+        for i in range(students)
+    ]
+    db.add(teacher)
+    db.add_all(users)
+    db.flush()
+
+    reg_nos = [f"PR{tag}{i:04d}" for i in range(students)]
+    db.add_all(
+        [
+            models.TeacherSubjectMap(teacher_id=teacher.teacher_id, subject_code=subject.subject_code),
+            models.ClassSubjectMap(class_id=cls.class_id, subject_code=subject.subject_code),
+        ]
+        + [
+            models.Student(
+                reg_no=reg_no,
+                name=f"Perf Student {i}",
+                dept_id=dept.dept_id,
+                batch_id=batch.batch_id,
+                class_id=cls.class_id,
+                user_id=user.user_id,
+            )
+            for i, (reg_no, user) in enumerate(zip(reg_nos, users))
+        ]
+    )
+    db.flush()
+    return SeededClass(cls.class_id, dept.dept_id, subject.subject_code, teacher.teacher_id, reg_nos)
+
+
+@dataclass
+class SeededInstitution:
+    """
+    Ids the endpoint checks address: "teacher" teaches ``subject_code`` to
+    ``class_id`` in ``period``, ``latest_session_id`` is that period on
+    ``latest_day`` (the last working day, today unless it is a Sunday) and ``approval_ids`` are the teacher's pending OD/ML
+    approvals for the class.
+    """
+    admin_user_id: int
+    teacher_id: int
+    teacher_user_id: int
+    student_reg_no: str
+    student_id: int
+    student_user_id: int
+    class_id: str
+    subject_code: str
+    period: int
+    latest_day: date
+    latest_session_id: int
+    assignment_task_id: int
+    roster: List[str] = field(default_factory=list)
+    approval_ids: List[int] = field(default_factory=list)
+    counts: dict = field(default_factory=dict)
+
+
+def _free_prefix(db: Session, rng: random.Random) -> str:
+    while True:
+        prefix = "P" + "".join(rng.choices("ABCDEFGHJKLMNPQRSTUVWXYZ", k=2))
+        in_use = db.execute(
+            select(models.Department.dept_id).where(models.Department.dept_name.like(f"{prefix} Department %")).limit(1)
+        ).first()
+        if not in_use:
+            return prefix
+
+
+def seed_institution(
+    db: Session,
+    departments: int = 2,
+    classes_per_dept: int = 2,
+    students_per_class: int = 60,
+    days: int = 126,
+    seed: int = 0,
+    today: Optional[date] = None,
+) -> SeededInstitution:
+    """
+    A small institution from the same generator as generate_institution.py
+    (a semester of attendance ending ``today`` by default), written with
+    plain INSERTs, plus an admin user. The class and teacher handed to the
+    checks are the pair with the most pending leave approvals.
+    """
+    today = today or date.today()
+    institution = Institution(
+        seed,
+        departments,
+        classes_per_dept,
+        departments * classes_per_dept * students_per_class,
+        days,
+        today,
+        _free_prefix(db, random.Random()),
+        "!",
+    )
+    institution.run(InsertWriter(db))
+    # planner statistics for the new rows, as generate_institution.py does; rolled back with them
+    for table in institution.counts:
+        db.execute(text(f"ANALYZE {table}"))
+    admin = models.User(email=f"{institution.prefix.lower()}-admin@example.com", password="!", role="admin", status="active")
+    db.add(admin)
+    db.flush()
+
+    A, S = models.LeaveRequestApproval, models.AttendanceSession
+    pending = db.execute(
+        select(A.teacher_id, S.class_id, func.count())
+        .join(S, S.session_id == A.session_id)
+        .where(A.status == "Pending", S.class_id.like(f"{institution.prefix}%"))
+        .group_by(A.teacher_id, S.class_id)
+        .order_by(func.count().desc(), A.teacher_id, S.class_id)
+        .limit(1)
+    ).first()
+    if pending is None:
+        raise RuntimeError("The seed has no pending leave requests; raise students_per_class or days")
+    teacher_id, class_id, _ = pending
+
+    key = next(k for k in institution.classes if institution.class_id(*k) == class_id)
+    subject = next(k for k, tid in institution.teacher_ids.items() if tid == teacher_id)
+    period = next(p for p in range(1, PERIODS + 1) if institution.slot(*key, p) == (subject[2], subject[1]))
+    class_index = institution.classes.index(key)
+    approval_ids = db.execute(
+        select(A.approval_id)
+        .join(S, S.session_id == A.session_id)
+        .where(A.teacher_id == teacher_id, A.status == "Pending", S.class_id == class_id)
+        .order_by(A.approval_id)
+    ).scalars().all()
+    roster = institution.roster[key]
+    return SeededInstitution(
+        admin_user_id=admin.user_id,
+        teacher_id=teacher_id,
+        teacher_user_id=institution.ids["users"] + institution.subjects.index(subject),
+        student_reg_no=roster[0],
+        student_id=institution.student_ids[roster[0]],
+        student_user_id=institution.student_user_ids[roster[0]],
+        class_id=class_id,
+        subject_code=institution.subject_code(*subject),
+        period=period,
+        latest_day=institution.working_days[-1],
+        latest_session_id=institution.session_id(len(institution.working_days) - 1, class_index, period),
+        assignment_task_id=next(
+            tid for tid, (k, subj, kind, _, _) in institution.tasks.items() if k == key and subj == subject and kind == "Assignment"
+        ),
+        roster=roster,
+        approval_ids=approval_ids,
+        counts=institution.counts,
+    )
@@ -0,0 +1,51 @@
+import threading
+from collections import Counter
+from typing import Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Emitted by the harness's own savepoint isolation, not by the code under test
+_IGNORED_PREFIXES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class StatementCounter:
+    """
+    Records every SQL statement ``engine`` sends to the database while the
+    context is active (executemany counts once, as one round trip).
+
+        with StatementCounter(engine) as counter:
+            ...
+        counter.count, counter.by_verb()
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+        self.statements: List[str] = []
+        self._lock = threading.Lock()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.lstrip().upper().startswith(_IGNORED_PREFIXES):
+            return
+        with self._lock:
+            self.statements.append(statement)
+
+    def __enter__(self) -> "StatementCounter":
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.statements.clear()
+
+    def by_verb(self) -> Dict[str, int]:
+        """Statement counts by leading keyword (SELECT, INSERT, ...)."""
+        return dict(Counter(s.lstrip().split(None, 1)[0].upper() for s in self.statements))
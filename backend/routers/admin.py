@@ -1,16 +1,40 @@
+import json
+import os
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager, joinedload
 
 from backend import models
-from backend.database import get_db
-from backend.database import get_db
+from backend.ai.ann import face_index
+from backend.ai.embeddings import (
+    centroid,
+    decode_embedding,
+    encode_embedding,
+    has_embedding,
+    profile_embedding,
+)
+from backend.ai.engine import get_engine, get_engine_stats
+from backend.ai.gallery_cache import gallery_cache
+from backend.ai.profiling import pipeline_profile
+from backend.config import (
+    BULK_ENROLL_MAX_FILE_MB,
+    BULK_ENROLL_MAX_FILES,
+    BULK_ENROLL_MAX_TOTAL_MB,
+    EMBEDDING_STORAGE_DTYPE,
+    ENROLL_WORKERS,
+    MAX_FACE_SAMPLES,
+)
+from backend.database import SessionLocal, get_db
 from backend.routers.auth import get_password_hash, get_current_active_admin
 
 
@@ -729,6 +753,87 @@ def list_student_subject_maps(
 # ---------- Face Enrollment ----------
 
 
+def _store_profile_embedding(profile: models.FaceProfile, embedding: np.ndarray) -> None:
+    profile.embedding_blob = encode_embedding(embedding)
+    profile.embedding_dtype = EMBEDDING_STORAGE_DTYPE
+    profile.embedding_vector = None
+
+
+def _write_pending_image(image_path: Path, frame: np.ndarray) -> Path:
+    """
+    Write ``frame`` next to ``image_path`` under a temporary name; it is moved
+    into place by ``_publish_images`` once the database rows are committed.
+    """
+    pending = image_path.with_name(f".pending-{uuid.uuid4().hex}-{image_path.name}")
+    if not cv2.imwrite(str(pending), frame):
+        raise ValueError("Could not store image")
+    return pending
+
+
+def _publish_images(moves: List[Tuple[Path, Path]]) -> None:
+    for pending, image_path in moves:
+        os.replace(pending, image_path)
+
+
+def _discard_images(paths: List[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def _add_face_samples(
+    db: Session,
+    profile: models.FaceProfile,
+    existing: List[models.FaceEmbedding],
+    new_samples: List[Tuple[np.ndarray, models.FaceImage]],
+) -> None:
+    """
+    Append enrollment samples for one student, drop the oldest beyond
+    MAX_FACE_SAMPLES and store the normalized centroid on the profile.
+    ``existing`` must be the student's current samples, oldest first.
+    """
+    existing = list(existing)
+    if not existing and has_embedding(profile):
+        # Profile enrolled before multi-sample galleries: keep it as a sample
+        seed = models.FaceEmbedding(
+            reg_no=profile.reg_no,
+            embedding_blob=encode_embedding(profile_embedding(profile)),
+            embedding_dtype=EMBEDDING_STORAGE_DTYPE,
+        )
+        db.add(seed)
+        existing.append(seed)
+
+    new_samples = new_samples[-MAX_FACE_SAMPLES:]
+    overflow = max(0, len(existing) + len(new_samples) - MAX_FACE_SAMPLES)
+    for old in existing[:overflow]:
+        db.delete(old)
+    kept = existing[overflow:]
+
+    vectors = [decode_embedding(s.embedding_blob, s.embedding_dtype) for s in kept]
+    for embedding, face_image in new_samples:
+        db.add(
+            models.FaceEmbedding(
+                reg_no=profile.reg_no,
+                image=face_image,
+                embedding_blob=encode_embedding(embedding),
+                embedding_dtype=EMBEDDING_STORAGE_DTYPE,
+            )
+        )
+        vectors.append(np.asarray(embedding, dtype=np.float32))
+    _store_profile_embedding(profile, centroid(np.stack(vectors)))
+
+
+def _face_samples_by_reg_no(db: Session, reg_nos: List[str]) -> Dict[str, List[models.FaceEmbedding]]:
+    samples: Dict[str, List[models.FaceEmbedding]] = {r: [] for r in reg_nos}
+    for sample in (
+        db.query(models.FaceEmbedding)
+        .filter(models.FaceEmbedding.reg_no.in_(reg_nos))
+        .order_by(models.FaceEmbedding.embedding_id)
+        .all()
+    ):
+        samples[sample.reg_no].append(sample)
+    return samples
+
+
 @router.post("/faces/enroll", dependencies=[Depends(get_current_active_admin)])
 async def enroll_face(
     reg_no: str = Form(...),
@@ -754,54 +859,60 @@ async def enroll_face(
             detail="Could not decode image",
         )
     
-    # Initialize face analysis (lazy load to avoid startup delay)
-    from backend.ai.engine import FaceAttendanceEngine
-    engine = FaceAttendanceEngine()
-    
-    # Detect faces
-    faces = engine.app.get(frame)
-    if len(faces) == 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No face detected in the image",
-        )
-    if len(faces) > 1:
+    # Shared engine (loaded once per process, on first use or at startup)
+    engine = get_engine()
+
+    # Detect the single face and get its embedding
+    try:
+        embedding = engine.extract_enrollment_embedding(frame)
+    except ValueError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Multiple faces ({len(faces)}) detected. Please upload an image with only one face.",
+            detail=str(exc),
         )
     
-    # Get embedding
-    embedding = faces[0].normed_embedding.tolist()
-    
-    # Save image to disk
+    # Save image to disk (under a temporary name until the rows are committed)
     image_filename = f"{reg_no}_{image.filename}"
     image_path = FACE_IMAGES_DIR / image_filename
-    cv2.imwrite(str(image_path), frame)
-    
-    # Update or create face profile
-    face_profile = (
-        db.query(models.FaceProfile)
-        .filter(models.FaceProfile.reg_no == reg_no)
-        .first()
-    )
-    if face_profile:
-        face_profile.embedding_vector = embedding
-    else:
-        face_profile = models.FaceProfile(
+    try:
+        pending = _write_pending_image(image_path, frame)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(exc),
+        )
+
+    try:
+        # Update or create face profile
+        face_profile = (
+            db.query(models.FaceProfile)
+            .filter(models.FaceProfile.reg_no == reg_no)
+            .first()
+        )
+        if not face_profile:
+            face_profile = models.FaceProfile(reg_no=reg_no)
+            db.add(face_profile)
+
+        # Save face image record
+        face_image = models.FaceImage(
             reg_no=reg_no,
-            embedding_vector=embedding,
+            image_path=str(image_path),
         )
-        db.add(face_profile)
-    
-    # Save face image record
-    face_image = models.FaceImage(
-        reg_no=reg_no,
-        image_path=str(image_path),
-    )
-    db.add(face_image)
-    
-    db.commit()
+        db.add(face_image)
+
+        # Add this photo as a new sample and refresh the centroid
+        existing = _face_samples_by_reg_no(db, [reg_no])[reg_no]
+        _add_face_samples(db, face_profile, existing, [(embedding, face_image)])
+        profile_vector = profile_embedding(face_profile)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        _discard_images([pending])
+        raise
+    _publish_images([(pending, image_path)])
+    gallery_cache.invalidate(student.class_id)
+    face_index.upsert(reg_no, student.class_id, profile_vector)
     
     return {
         "message": "Face enrolled successfully",
@@ -810,6 +921,221 @@ async def enroll_face(
     }
 
 
+BULK_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _bulk_reg_no_candidates(name: str) -> Tuple[str, ...]:
+    """``reg_no.jpg`` or ``reg_no/any.jpg``: the file stem first, then the folder name."""
+    path = Path(name)
+    return (path.stem, path.parent.name) if path.parent.name else (path.stem,)
+
+
+class _BulkBudget:
+    """Running photo count and byte total for one bulk upload; raises once a limit is passed."""
+
+    def __init__(self) -> None:
+        self.files = 0
+        self.bytes = 0
+
+    def add_file(self) -> None:
+        self.files += 1
+        if self.files > BULK_ENROLL_MAX_FILES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Upload has more than {BULK_ENROLL_MAX_FILES} photos",
+            )
+
+    def read(self, name: str, stream, declared_size: Optional[int]) -> bytes:
+        """Read one photo, never more than the per-file cap (+1 byte, to notice an overrun)."""
+        max_file = BULK_ENROLL_MAX_FILE_MB * 1024 * 1024
+        if declared_size is None or declared_size <= max_file:
+            data = stream.read(max_file + 1)
+            declared_size = len(data)
+        if declared_size > max_file:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"{name} is larger than {BULK_ENROLL_MAX_FILE_MB} MB",
+            )
+        self.bytes += declared_size
+        if self.bytes > BULK_ENROLL_MAX_TOTAL_MB * 1024 * 1024:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Upload is larger than {BULK_ENROLL_MAX_TOTAL_MB} MB uncompressed",
+            )
+        return data
+
+
+def _collect_bulk_items(
+    archive: Optional[UploadFile], images: List[UploadFile]
+) -> List[Tuple[Tuple[str, ...], str, bytes]]:
+    items: List[Tuple[Tuple[str, ...], str, bytes]] = []
+    budget = _BulkBudget()
+    if archive is not None:
+        try:
+            with zipfile.ZipFile(archive.file) as zf:
+                for info in zf.infolist():
+                    name = info.filename
+                    if info.is_dir() or Path(name).name.startswith("."):
+                        continue
+                    if Path(name).suffix.lower() not in BULK_IMAGE_EXTENSIONS:
+                        continue
+                    budget.add_file()
+                    # file_size is only what the archive claims: the read itself is capped too
+                    with zf.open(info) as entry:
+                        img_bytes = budget.read(name, entry, info.file_size)
+                    items.append((_bulk_reg_no_candidates(name), Path(name).name, img_bytes))
+        except zipfile.BadZipFile:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Archive is not a valid ZIP file",
+            )
+    for upload in images:
+        if not upload.filename:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Every image needs a filename (<reg_no>.jpg)",
+            )
+        budget.add_file()
+        img_bytes = budget.read(upload.filename, upload.file, upload.size)
+        items.append((_bulk_reg_no_candidates(upload.filename), Path(upload.filename).name, img_bytes))
+    return items
+
+
+def _embed_enrollment_image(
+    engine, reg_no: str, filename: str, img_bytes: bytes
+) -> Tuple[np.ndarray, Path, Path]:
+    """
+    Worker: decode, embed and write one enrollment photo under a pending name.
+    Returns (embedding, final path, pending path). Raises ValueError on bad input.
+    """
+    frame = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode image")
+    embedding = engine.extract_enrollment_embedding(frame)
+    image_path = FACE_IMAGES_DIR / f"{reg_no}_{filename}"
+    return embedding, image_path, _write_pending_image(image_path, frame)
+
+
+@router.post("/faces/enroll/bulk", dependencies=[Depends(get_current_active_admin)])
+def enroll_faces_bulk(
+    archive: Optional[UploadFile] = File(None),
+    images: List[UploadFile] = File(default=[]),
+    db: Session = Depends(get_db),
+):
+    """
+    Enroll many students at once from a ZIP (or multipart batch) of photos
+    named by reg_no. Photos are embedded by a worker pool and all profiles
+    are written in one transaction. The response streams one JSON line per
+    photo as it finishes, then a final summary line.
+    """
+    collected = _collect_bulk_items(archive, images)
+    if not collected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No images found in upload",
+        )
+
+    requested = {c for candidates, _, _ in collected for c in candidates}
+    known = dict(
+        db.query(models.Student.reg_no, models.Student.class_id)
+        .filter(models.Student.reg_no.in_(requested))
+        .all()
+    )
+    items = [
+        (next((c for c in candidates if c in known), candidates[0]), filename, img_bytes)
+        for candidates, filename, img_bytes in collected
+    ]
+    collected.clear()
+    engine = get_engine()
+
+    def progress():
+        total = len(items)
+        done = 0
+        enrolled: Dict[str, List[Tuple[np.ndarray, Path]]] = {}
+        # photos written under a pending name, moved into place after the commit
+        moves: List[Tuple[Path, Path]] = []
+        errors = 0
+
+        for reg_no, filename, _ in items:
+            if reg_no not in known:
+                done += 1
+                errors += 1
+                yield json.dumps({"reg_no": reg_no, "file": filename, "status": "error",
+                                  "detail": "Student not found", "done": done, "total": total}) + "\n"
+
+        futures = {}
+        published = False
+        try:
+            with ThreadPoolExecutor(max_workers=ENROLL_WORKERS) as pool:
+                futures = {
+                    pool.submit(_embed_enrollment_image, engine, reg_no, filename, img_bytes): (reg_no, filename)
+                    for reg_no, filename, img_bytes in items
+                    if reg_no in known
+                }
+                items.clear()  # futures hold the only remaining references to the bytes
+                for future in as_completed(futures):
+                    reg_no, filename = futures[future]
+                    done += 1
+                    try:
+                        embedding, image_path, pending = future.result()
+                    except Exception as exc:
+                        errors += 1
+                        yield json.dumps({"reg_no": reg_no, "file": filename, "status": "error",
+                                          "detail": str(exc), "done": done, "total": total}) + "\n"
+                        continue
+                    moves.append((pending, image_path))
+                    enrolled.setdefault(reg_no, []).append((embedding, image_path))
+                    yield json.dumps({"reg_no": reg_no, "file": filename, "status": "ok",
+                                      "done": done, "total": total}) + "\n"
+
+            # Single transaction for every profile and image row
+            write_db = SessionLocal()
+            try:
+                profiles = {
+                    p.reg_no: p
+                    for p in write_db.query(models.FaceProfile)
+                    .filter(models.FaceProfile.reg_no.in_(list(enrolled)))
+                    .all()
+                }
+                existing = _face_samples_by_reg_no(write_db, list(enrolled))
+                profile_vectors = {}
+                for reg_no, photos in enrolled.items():
+                    profile = profiles.get(reg_no)
+                    if not profile:
+                        profile = models.FaceProfile(reg_no=reg_no)
+                        write_db.add(profile)
+                    new_samples = []
+                    for embedding, image_path in photos:
+                        face_image = models.FaceImage(reg_no=reg_no, image_path=str(image_path))
+                        write_db.add(face_image)
+                        new_samples.append((embedding, face_image))
+                    _add_face_samples(write_db, profile, existing[reg_no], new_samples)
+                    profile_vectors[reg_no] = profile_embedding(profile)
+                write_db.commit()
+                _publish_images(moves)
+                published = True
+                gallery_cache.invalidate(*{known[r] for r in enrolled})
+                for reg_no, vector in profile_vectors.items():
+                    face_index.upsert(reg_no, known[reg_no], vector)
+            except Exception as exc:
+                write_db.rollback()
+                yield json.dumps({"summary": {"enrolled": 0, "errors": errors, "total": total,
+                                              "detail": f"Database write failed: {exc}"}}) + "\n"
+                return
+            finally:
+                write_db.close()
+        finally:
+            # rolled back, failed or the client went away: no photo without its rows
+            if not published:
+                _discard_images([
+                    f.result()[2] for f in futures if f.done() and not f.cancelled() and f.exception() is None
+                ])
+
+        yield json.dumps({"summary": {"enrolled": len(enrolled), "errors": errors, "total": total}}) + "\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
 @router.get("/faces/profiles", response_model=List[FaceProfileRead], dependencies=[Depends(get_current_active_admin)])
 def list_face_profiles(db: Session = Depends(get_db)):
     profiles = db.query(models.FaceProfile).all()
@@ -817,7 +1143,7 @@ def list_face_profiles(db: Session = Depends(get_db)):
         FaceProfileRead(
             face_id=p.face_id,
             reg_no=p.reg_no,
-            has_embedding=p.embedding_vector is not None,
+            has_embedding=has_embedding(p),
         )
         for p in profiles
     ]
@@ -834,6 +1160,7 @@ def list_face_images(reg_no: Optional[str] = None, db: Session = Depends(get_db)
 @router.delete("/faces/{reg_no}", dependencies=[Depends(get_current_active_admin)])
 def delete_face_profile(reg_no: str, db: Session = Depends(get_db)):
     """Delete face profile and images for a student."""
+    student = db.query(models.Student).filter(models.Student.reg_no == reg_no).first()
     profile = (
         db.query(models.FaceProfile)
         .filter(models.FaceProfile.reg_no == reg_no)
@@ -841,6 +1168,9 @@ def delete_face_profile(reg_no: str, db: Session = Depends(get_db)):
     )
     if profile:
         db.delete(profile)
+    db.query(models.FaceEmbedding).filter(models.FaceEmbedding.reg_no == reg_no).delete(
+        synchronize_session=False
+    )
     
     images = db.query(models.FaceImage).filter(models.FaceImage.reg_no == reg_no).all()
     for img in images:
@@ -852,9 +1182,30 @@ def delete_face_profile(reg_no: str, db: Session = Depends(get_db)):
         db.delete(img)
     
     db.commit()
+    if student:
+        gallery_cache.invalidate(student.class_id)
+    face_index.remove(reg_no)
     return {"message": f"Face data deleted for {reg_no}"}
 
 
+@router.get("/ai/stats", dependencies=[Depends(get_current_active_admin)])
+def ai_engine_stats():
+    """Model load time and process memory of the shared face engine, plus cache counters."""
+    stats = get_engine_stats()
+    stats["gallery_cache"] = gallery_cache.stats()
+    stats["face_index"] = face_index.stats()
+    return stats
+
+
+@router.get("/ai/profile", dependencies=[Depends(get_current_active_admin)])
+def ai_pipeline_profile(reset: bool = False):
+    """Histograms of per-stage attendance pipeline timings and face/tile counts."""
+    snapshot = pipeline_profile.snapshot()
+    if reset:
+        pipeline_profile.reset()
+    return snapshot
+
+
 # ---------- Delete Routes for Other Entities ----------
 
 
@@ -868,8 +1219,11 @@ def delete_student(reg_no: str, db: Session = Depends(get_db)):
         user = db.query(models.User).filter(models.User.user_id == student.user_id).first()
         if user:
             db.delete(user)
+    class_id = student.class_id
     db.delete(student)
     db.commit()
+    gallery_cache.invalidate(class_id)
+    face_index.remove(reg_no)
     return {"message": f"Student {reg_no} deleted"}
 
 
@@ -977,6 +1331,11 @@ def get_class_timetable(class_id: str, db: Session = Depends(get_db)):
     entries = (
         db.query(models.Timetable)
         .filter(models.Timetable.class_id == class_id)
+        .options(
+            joinedload(models.Timetable.teacher),
+            joinedload(models.Timetable.subject),
+            joinedload(models.Timetable.class_),
+        )
         .all()
     )
     result = []
@@ -1226,11 +1585,15 @@ def update_student(reg_no: str, payload: StudentUpdate, db: Session = Depends(ge
     student = db.query(models.Student).filter(models.Student.reg_no == reg_no).first()
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
+    old_class_id = student.class_id
     student.name = payload.name
     student.dept_id = payload.dept_id
     student.batch_id = payload.batch_id
     student.class_id = payload.class_id
     db.commit()
+    if old_class_id != payload.class_id:
+        gallery_cache.invalidate(old_class_id, payload.class_id)
+        face_index.set_class(reg_no, payload.class_id)
     db.refresh(student)
     return student
 
@@ -1292,6 +1655,8 @@ def list_student_attendance(
         db.query(models.AttendanceRecord)
         .join(models.AttendanceSession)
         .join(models.Teacher, models.AttendanceSession.teacher_id == models.Teacher.teacher_id)
+        # fill rec.session and rec.session.teacher from the joins above
+        .options(contains_eager(models.AttendanceRecord.session).contains_eager(models.AttendanceSession.teacher))
         .filter(models.AttendanceRecord.reg_no == reg_no)
         .order_by(models.AttendanceSession.date.desc(), models.AttendanceSession.period.asc())
         .all()
@@ -1,25 +1,49 @@
-from datetime import date
+import asyncio
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import date, datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
 
-import cv2
 import numpy as np
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from sqlalchemy import and_, func
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
 from sqlalchemy.orm import Session
 
 from backend import models
 #from backend.ai.engine import FaceAttendanceEngine
 from backend.database import get_db
-from backend.ai.engine import get_engine
+from backend.jobs import get_job_scheduler, queue_position
+from backend.ai.ann import FaceSearchIndex, face_index
+from backend.ai.engine import _current_rss_mb, get_engine
+from backend.ai.executor import InferencePoolSaturated, get_inference_pool
+from backend.ai.gallery_cache import get_class_gallery
+from backend.ai.ingest import decode_image, read_spooled
+from backend.ai.matcher import GalleryMatcher
+from backend.ai.profiling import pipeline_profile, stage
+from backend.ai.proof import render_proof, store_proof_source
+from backend.ai.video import UnreadableVideo, VideoTooLong, decode_frames, sample_video_frames
+from backend.config import (
+    AI_ANN_FALLBACK,
+    AI_ANN_VISITOR_THRESHOLD,
+    AI_EARLY_EXIT,
+    INGEST_MAX_UPLOAD_MB,
+    VIDEO_MAX_FRAMES,
+    VIDEO_MAX_UPLOAD_MB,
+)
 
 
 router = APIRouter()
 
 #ENGINE = FaceAttendanceEngine()
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
-ATTENDANCE_PROOF_DIR = PROJECT_ROOT / "storage" / "attendance_proofs"
-ATTENDANCE_PROOF_DIR.mkdir(parents=True, exist_ok=True)
+ATTENDANCE_JOB_DIR = PROJECT_ROOT / "storage" / "attendance_jobs"
+ATTENDANCE_JOB_DIR.mkdir(parents=True, exist_ok=True)
 
 
 class SessionCreate(BaseModel):
@@ -45,8 +69,35 @@ class AttendanceSummary(BaseModel):
     absent: List[str]
     od: List[str] = []
     ml: List[str] = []
+    # Faces not in this class but found in the institution-wide index; /auto only
+    visitors: List[Dict[str, Any]] = []
+    # Engine diagnostics for tuning (tiling plan, face count); /auto only
+    diagnostics: Optional[Dict[str, Any]] = None
+
+
+class FaceCandidate(BaseModel):
+    reg_no: str
+    class_id: Optional[str] = None
+    similarity: float
+
+
+class FaceLookupResult(BaseModel):
+    box: List[int]
+    candidates: List[FaceCandidate]
 
 
+class AttendanceJobAccepted(BaseModel):
+    job_id: int
+    status: str
+
+
+class AttendanceJobStatus(BaseModel):
+    job_id: int
+    status: str  # "queued", "running", "done", "failed"
+    position: Optional[int] = None  # jobs ahead of this one while queued
+    result: Optional[AttendanceSummary] = None
+    error: Optional[str] = None
+
 
 def _get_or_create_session(payload: SessionCreate, db: Session) -> models.AttendanceSession:
     # Check if a session already exists for this slot (Class + Date + Period)
@@ -93,144 +144,544 @@ def _get_or_create_session(payload: SessionCreate, db: Session) -> models.Attend
     return session
 
 
+VALID_STATUSES = ("P", "A", "OD", "ML", "NT")
+
+
+def upsert_attendance_records(db: Session, rows: Iterable[Tuple[int, str, str]]) -> int:
+    """
+    Write ``(session_id, reg_no, status)`` rows in a single
+    ``INSERT ... ON CONFLICT DO UPDATE`` on uq_attendance_per_student_per_session.
+    A repeated (session_id, reg_no) keeps its last status, since PostgreSQL
+    refuses to update the same row twice in one statement. Does not commit.
+    """
+    latest = {(session_id, reg_no): status_val for session_id, reg_no, status_val in rows}
+    if not latest:
+        return 0
+    stmt = pg_insert(models.AttendanceRecord).values(
+        [
+            {"session_id": session_id, "reg_no": reg_no, "status": status_val}
+            for (session_id, reg_no), status_val in latest.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_attendance_per_student_per_session",
+        set_={"status": stmt.excluded.status},
+    )
+    db.execute(stmt)
+    return len(latest)
+
+
+# AttendanceSummary list for each status; "NT" (no class) is left out
+_SUMMARY_BUCKETS = {"P": "present", "A": "absent", "OD": "od", "ML": "ml"}
+
+
+def build_session_summary(
+    db: Session,
+    session_id: int,
+    statuses: Optional[Dict[str, str]] = None,
+    **extra: Any,
+) -> AttendanceSummary:
+    """
+    Status buckets of a session. ``statuses`` ({reg_no: status}) is used
+    as-is when the caller already has the full picture; otherwise the stored
+    records are read in one query grouped by status. ``extra`` goes straight
+    to AttendanceSummary (visitors, diagnostics).
+    """
+    if statuses is None:
+        grouped = (
+            db.query(
+                models.AttendanceRecord.status,
+                func.array_agg(aggregate_order_by(models.AttendanceRecord.reg_no, models.AttendanceRecord.reg_no)),
+            )
+            .filter(models.AttendanceRecord.session_id == session_id)
+            .group_by(models.AttendanceRecord.status)
+            .all()
+        )
+    else:
+        by_status: Dict[str, List[str]] = {}
+        for reg_no, status_val in statuses.items():
+            by_status.setdefault(status_val, []).append(reg_no)
+        grouped = list(by_status.items())
+    buckets: Dict[str, List[str]] = {field: [] for field in _SUMMARY_BUCKETS.values()}
+    for status_val, reg_nos in grouped:
+        if status_val in _SUMMARY_BUCKETS:
+            buckets[_SUMMARY_BUCKETS[status_val]] = list(reg_nos)
+    return AttendanceSummary(session_id=session_id, **buckets, **extra)
+
+
+def _load_class_embeddings(db: Session, class_id: str) -> GalleryMatcher:
+    """Packed embeddings for a class, served from the per-class cache."""
+    gallery = get_class_gallery(db, class_id)
+    if len(gallery) == 0:
+        has_students = (
+            db.query(models.Student.student_id)
+            .filter(models.Student.class_id == class_id)
+            .first()
+        )
+        if not has_students:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No students found for this class_id",
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No face embeddings found for students in this class. Please enroll faces first.",
+        )
+    return gallery
+
+
+def _check_upload_size(upload: UploadFile, max_mb: int = INGEST_MAX_UPLOAD_MB, kind: str = "Image") -> None:
+    if upload.size is not None and upload.size > max_mb * 1024 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"{kind} is larger than {max_mb} MB",
+        )
+
+
+def _load_face_index() -> Optional[FaceSearchIndex]:
+    """The institution-wide index for the second pass, or None when disabled. Never waits on a rebuild."""
+    return face_index.refresh() if AI_ANN_FALLBACK else None
+
+
+def _recognize_image(
+    source: Union[BinaryIO, np.ndarray],
+    embeddings: GalleryMatcher,
+    early_exit: bool = AI_EARLY_EXIT,
+    index: Optional[FaceSearchIndex] = None,
+):
+    """
+    Ingest + detect + recognise; runs on the bounded inference pool.
+
+    ``source`` is the upload's spooled file or an already loaded byte
+    buffer. Nothing is drawn: the encoded buffer comes back as the proof
+    source. With an ``index``, faces unmatched in the class are looked up
+    institution-wide and reported as ``report["visitors"]``.
+    """
+    report: Dict[str, Any] = {}
+    rss_before = _current_rss_mb()
+    with stage(report, "ingest"):
+        encoded = source if isinstance(source, np.ndarray) else read_spooled(source)
+    with stage(report, "decode"):
+        ingested = decode_image(encoded)
+    if ingested is None:
+        return None
+    engine = get_engine()
+    report["image"] = ingested.describe()
+    present, absent, _ = engine.mark_attendance(
+        ingested.frame, embeddings, report=report, early_exit=early_exit, draw=False
+    )
+    unmatched = report.pop("unmatched_embeddings")
+    if index is not None and len(unmatched):
+        with stage(report, "ann_fallback"):
+            boxes = [d["box"] for d in report["detections"] if d["label"] == "Unknown"]
+            hits = index.lookup(
+                unmatched, k=1, min_similarity=AI_ANN_VISITOR_THRESHOLD, exclude=set(embeddings.reg_nos)
+            )
+            report["visitors"] = [dict(row[0], box=box) for box, row in zip(boxes, hits) if row]
+    report["memory_mb"] = {
+        "upload": round(encoded.nbytes / 1048576.0, 2),
+        "frame": round(ingested.frame.nbytes / 1048576.0, 2),
+        "ingest_peak": round(ingested.peak_bytes / 1048576.0, 2),
+        "rss_delta": round(_current_rss_mb() - rss_before, 1),
+    }
+    return present, absent, ingested.encoded, report
+
+
+def _finalize_auto_attendance(
+    db: Session,
+    session_payload: SessionCreate,
+    present: List[str],
+    proof_source: np.ndarray,
+    diagnostics: Dict[str, Any],
+) -> AttendanceSummary:
+    """
+    Create/fetch the session, store the proof source for deferred rendering
+    and build the AI summary. ``proof_source`` is the encoded upload (1-D
+    buffer) or an undrawn frame; the detections are taken out of
+    ``diagnostics``.
+    """
+    # 4. Create or fetch session
+    with stage(diagnostics, "session"):
+        session = _get_or_create_session(session_payload, db)
+
+    # 5. Keep the proof source + detections; the JPEG is rendered later (one per session)
+    detections = diagnostics.pop("detections", [])
+    with stage(diagnostics, "proof_write"):
+        store_proof_source(
+            session.session_id,
+            detections,
+            diagnostics["image"]["width"],
+            diagnostics["image"]["height"],
+            image_bytes=proof_source if proof_source.ndim == 1 else None,
+            image=proof_source if proof_source.ndim == 3 else None,
+        )
+
+    # 6. One roster snapshot: every student in the class with any record
+    # already stored for this session. Nothing is written here; the
+    # teacher confirms the AI result before records are saved.
+    with stage(diagnostics, "roster"):
+        roster = (
+            db.query(models.Student.reg_no, models.AttendanceRecord.status)
+            .outerjoin(
+                models.AttendanceRecord,
+                and_(
+                    models.AttendanceRecord.reg_no == models.Student.reg_no,
+                    models.AttendanceRecord.session_id == session.session_id,
+                ),
+            )
+            .filter(models.Student.class_id == session_payload.class_id)
+            .order_by(models.Student.reg_no)
+            .all()
+        )
+
+    # OD/ML marked beforehand is kept; otherwise detected -> P, else A
+    present_set = set(present)
+    statuses: Dict[str, str] = {
+        reg_no: stored if stored in ("OD", "ML") else ("P" if reg_no in present_set else "A")
+        for reg_no, stored in roster
+    }
+
+    return build_session_summary(
+        db,
+        session.session_id,
+        statuses,
+        visitors=diagnostics.pop("visitors", []),
+        diagnostics=diagnostics,
+    )
+
+
 @router.post(
     "/auto",
     response_model=AttendanceSummary,
     summary="Mark attendance from classroom image using AI",
 )
 async def auto_attendance(
+    background_tasks: BackgroundTasks,
     class_id: str = Form(...),
     subject_code: str = Form(...),
     teacher_id: int = Form(...),
     date_value: date = Form(..., alias="date"),
     period: int = Form(...),
     image: UploadFile = File(...),
+    early_exit: bool = Form(AI_EARLY_EXIT),
     db: Session = Depends(get_db),
 ):
+    started = time.perf_counter()
+    timings: Dict[str, Any] = {}
     # 1. Load students & embeddings for this class
-    students = (
-        db.query(models.Student)
-        .filter(models.Student.class_id == class_id)
-        .all()
-    )
-    if not students:
+    with stage(timings, "gallery"):
+        # A gallery-cache miss queries the database: keep it off the event loop
+        embeddings = await run_in_threadpool(_load_class_embeddings, db, class_id)
+        index = await run_in_threadpool(_load_face_index)
+
+    # 2 + 3. Ingest the spooled upload and run the AI engine off the event loop
+    _check_upload_size(image)
+    try:
+        with stage(timings, "inference_wall"):
+            result = await get_inference_pool().run(_recognize_image, image.file, embeddings, early_exit, index)
+    except InferencePoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Attendance recognition is busy, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No students found for this class_id",
+            detail="Could not decode image",
         )
+    present, absent, proof_source, diagnostics = result
+    diagnostics.setdefault("timings_ms", {}).update(timings["timings_ms"])
 
-    embeddings = {}
-    for s in students:
-        profile = (
-            db.query(models.FaceProfile)
-            .filter(models.FaceProfile.reg_no == s.reg_no)
-            .first()
+    # 4-6. Session, proof image and status lists
+    session_payload = SessionCreate(
+        class_id=class_id,
+        subject_code=subject_code,
+        teacher_id=teacher_id,
+        date=date_value,
+        period=period,
+    )
+    summary = await run_in_threadpool(
+        _finalize_auto_attendance, db, session_payload, present, proof_source, diagnostics
+    )
+    background_tasks.add_task(render_proof, summary.session_id)
+    diagnostics["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000.0, 3)
+    pipeline_profile.record("auto", diagnostics)
+    summary.diagnostics = diagnostics
+    return summary
+
+
+def _recognize_frames(video_file, video_suffix: str, frame_blobs: List[bytes], embeddings: GalleryMatcher):
+    """Sample a clip (or decode a burst) and recognise across frames, on the inference pool."""
+    engine = get_engine()
+    report: Dict[str, Any] = {"source": "video" if video_file is not None else "burst"}
+    if video_file is None:
+        present, absent, best_frame = engine.mark_attendance_frames(
+            decode_frames(frame_blobs), embeddings, report=report, draw=False
         )
-        if profile and profile.embedding_vector:
-            embeddings[s.reg_no] = np.array(profile.embedding_vector, dtype=np.float32)
+    else:
+        # OpenCV can only demux from a path
+        with tempfile.NamedTemporaryFile(suffix=video_suffix) as tmp:
+            shutil.copyfileobj(video_file, tmp)
+            tmp.flush()
+            try:
+                present, absent, best_frame = engine.mark_attendance_frames(
+                    sample_video_frames(tmp.name), embeddings, report=report, draw=False
+                )
+            except VideoTooLong as exc:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc))
+            except UnreadableVideo:
+                return None
+    if best_frame is None:
+        return None
+    report["image"] = {"width": best_frame.shape[1], "height": best_frame.shape[0]}
+    return present, absent, best_frame, report
+
 
-    if not embeddings:
+@router.post(
+    "/auto/video",
+    response_model=AttendanceSummary,
+    summary="Mark attendance from a short classroom video or a burst of photos",
+)
+async def auto_attendance_video(
+    background_tasks: BackgroundTasks,
+    class_id: str = Form(...),
+    subject_code: str = Form(...),
+    teacher_id: int = Form(...),
+    date_value: date = Form(..., alias="date"),
+    period: int = Form(...),
+    video: Optional[UploadFile] = File(None),
+    frames: Optional[List[UploadFile]] = File(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Like /auto, but a student only has to be recognised in one of the
+    sampled frames. Send either ``video`` or several ``frames``.
+    """
+    if video is None and not frames:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No face embeddings found for students in this class. Please enroll faces first.",
+            detail="Upload a video or at least one frame",
+        )
+    if video is not None:
+        _check_upload_size(video, VIDEO_MAX_UPLOAD_MB, "Video")
+    else:
+        frames = frames[:VIDEO_MAX_FRAMES]
+        for f in frames:
+            _check_upload_size(f)
+    started = time.perf_counter()
+    embeddings = await run_in_threadpool(_load_class_embeddings, db, class_id)
+
+    frame_blobs: List[bytes] = []
+    if video is None:
+        frame_blobs = [await f.read() for f in frames]
+    try:
+        result = await get_inference_pool().run(
+            _recognize_frames,
+            video.file if video is not None else None,
+            Path(video.filename or "").suffix if video is not None else "",
+            frame_blobs,
+            embeddings,
+        )
+    except InferencePoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Attendance recognition is busy, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    del frame_blobs
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not decode video or frames",
         )
+    present, absent, proof_source, diagnostics = result
 
-    # 2. Read uploaded image into OpenCV
-    img_bytes = await image.read()
-    np_arr = np.frombuffer(img_bytes, np.uint8)
-    frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-    if frame is None:
+    session_payload = SessionCreate(
+        class_id=class_id,
+        subject_code=subject_code,
+        teacher_id=teacher_id,
+        date=date_value,
+        period=period,
+    )
+    summary = await run_in_threadpool(
+        _finalize_auto_attendance, db, session_payload, present, proof_source, diagnostics
+    )
+    background_tasks.add_task(render_proof, summary.session_id)
+    diagnostics.setdefault("timings_ms", {})["total"] = round((time.perf_counter() - started) * 1000.0, 3)
+    pipeline_profile.record("video", diagnostics)
+    summary.diagnostics = diagnostics
+    return summary
+
+
+def process_attendance_job(db: Session, job: models.AttendanceJob) -> dict:
+    """Job-queue handler: the /auto pipeline for a stored upload."""
+    started = time.perf_counter()
+    embeddings = _load_class_embeddings(db, job.class_id)
+    image_path = Path(job.image_path)
+    encoded = np.fromfile(str(image_path), dtype=np.uint8)
+    # Wait for a pool slot rather than failing: the job is already queued
+    index = _load_face_index()
+    result = get_inference_pool().submit(
+        _recognize_image, encoded, embeddings, AI_EARLY_EXIT, index, block=True
+    ).result()
+    del encoded
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Could not decode image",
         )
+    present, absent, proof_source, diagnostics = result
 
-    # 3. Run AI engine
-    #present, absent, annotated = ENGINE.mark_attendance(frame, embeddings)
-    engine = get_engine()
-    present, absent, annotated = engine.mark_attendance(frame, embeddings)
+    session_payload = SessionCreate(
+        class_id=job.class_id,
+        subject_code=job.subject_code,
+        teacher_id=job.teacher_id,
+        date=job.date,
+        period=job.period,
+    )
+    summary = _finalize_auto_attendance(db, session_payload, present, proof_source, diagnostics)
+    # Already off the request path, so render straight away
+    render_proof(summary.session_id)
+    diagnostics["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000.0, 3)
+    pipeline_profile.record("job", diagnostics)
+    summary.diagnostics = diagnostics
+    return summary.model_dump()
 
 
-    # 4. Create or fetch session
-    session_payload = SessionCreate(
+@router.post(
+    "/jobs",
+    response_model=AttendanceJobAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Queue a classroom image for AI attendance and return a job id",
+)
+async def submit_attendance_job(
+    class_id: str = Form(...),
+    subject_code: str = Form(...),
+    teacher_id: int = Form(...),
+    date_value: date = Form(..., alias="date"),
+    period: int = Form(...),
+    priority: int = Form(0),
+    image: UploadFile = File(...),
+    db: Session = Depends(get_db),
+):
+    _check_upload_size(image)
+    if image.size == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Empty image upload",
+        )
+    job_path = ATTENDANCE_JOB_DIR / f"{uuid.uuid4().hex}{Path(image.filename or '').suffix}"
+
+    def _spool_to_disk() -> None:
+        image.file.seek(0)
+        with open(job_path, "wb") as fh:
+            shutil.copyfileobj(image.file, fh)
+
+    # Copy the spooled upload to disk in chunks instead of reading it into memory
+    await run_in_threadpool(_spool_to_disk)
+
+    job = models.AttendanceJob(
         class_id=class_id,
         subject_code=subject_code,
         teacher_id=teacher_id,
         date=date_value,
         period=period,
+        image_path=str(job_path),
+        priority=priority,
+        status="queued",
+        attempts=0,
+        created_at=datetime.utcnow(),
     )
-    session = _get_or_create_session(session_payload, db)
-
-    # 5. Save annotated proof image (one per session)
-    proof_path = ATTENDANCE_PROOF_DIR / f"session_{session.session_id}.jpg"
-    cv2.imwrite(str(proof_path), annotated)
-
-    # 6. Upsert attendance records
-    existing_records = {
-        r.reg_no: r
-        for r in db.query(models.AttendanceRecord)
-        .filter(models.AttendanceRecord.session_id == session.session_id)
-        .all()
-    }
-
+    db.add(job)
     db.commit()
-
-    # Calculate status lists based on AI results
-    # Do NOT save records to DB yet - waiting for teacher confirmation
-    
-    # Get all students in class to ensure everyone is accounted for
-    all_students = (
-        db.query(models.Student)
-        .filter(models.Student.class_id == class_id)
-        .all()
-    )
-    
-    # Check for EXISTING OD/ML records (if any were marked beforehand manually)
-    # We should respect these if they exist for this session (unlikely if session just created)
-    # But if session existed, we might have records.
-    existing_records = {
-        r.reg_no: r
-        for r in db.query(models.AttendanceRecord)
-        .filter(models.AttendanceRecord.session_id == session.session_id)
-        .all()
-    }
-    
-    present_list = []
-    absent_list = []
-    od_list = []
-    ml_list = []
-    
-    for student in all_students:
-        reg_no = student.reg_no
-        
-        # Priority 1: Existing Locked Status (OD/ML)
-        if reg_no in existing_records and existing_records[reg_no].status in ("OD", "ML"):
-            status_val = existing_records[reg_no].status
-            if status_val == "OD":
-                od_list.append(reg_no)
-            else:
-                ml_list.append(reg_no)
-            continue
-            
-        # Priority 2: AI Detection
-        # If student has embedding and was detected -> Present
-        # If student has embedding and NOT detected -> Absent
-        # If student has NO embedding -> Absent (or manual check)
-        
-        if reg_no in present:
-            present_list.append(reg_no)
-        else:
-            absent_list.append(reg_no)
-
-    return AttendanceSummary(
-        session_id=session.session_id,
-        present=present_list,
-        absent=absent_list,
-        od=od_list,
-        ml=ml_list,
+    db.refresh(job)
+
+    scheduler = get_job_scheduler()
+    if scheduler:
+        scheduler.notify()
+    return AttendanceJobAccepted(job_id=job.job_id, status=job.status)
+
+
+def _read_job_status(db: Session, job_id: int) -> AttendanceJobStatus:
+    db.expire_all()
+    job = db.query(models.AttendanceJob).filter(models.AttendanceJob.job_id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return AttendanceJobStatus(
+        job_id=job.job_id,
+        status=job.status,
+        position=queue_position(db, job) if job.status == "queued" else None,
+        result=AttendanceSummary(**job.result) if job.status == "done" and job.result else None,
+        error=job.error,
     )
 
 
+@router.get(
+    "/jobs/{job_id}",
+    response_model=AttendanceJobStatus,
+    summary="Poll (or long-poll with ?wait=seconds) an attendance job",
+)
+async def get_attendance_job(
+    job_id: int,
+    wait: float = Query(default=0, ge=0, le=30),
+    db: Session = Depends(get_db),
+):
+    deadline = time.monotonic() + wait
+    while True:
+        job_status = await run_in_threadpool(_read_job_status, db, job_id)
+        if job_status.status in ("done", "failed") or time.monotonic() >= deadline:
+            return job_status
+        await asyncio.sleep(0.5)
+
+
+def _lookup_faces(source: BinaryIO, index: FaceSearchIndex, k: int) -> Optional[List[FaceLookupResult]]:
+    """Detect and embed every face in an upload, then search the whole institution."""
+    ingested = decode_image(read_spooled(source))
+    if ingested is None:
+        return None
+    faces = get_engine().detect_and_embed(ingested.frame)
+    if not faces:
+        return []
+    hits = index.lookup(np.stack([f.normed_embedding for f in faces]), k=k)
+    return [
+        FaceLookupResult(box=[int(v) for v in face.bbox[:4]], candidates=row)
+        for face, row in zip(faces, hits)
+    ]
+
+
+@router.post(
+    "/lookup",
+    response_model=List[FaceLookupResult],
+    summary="Find the closest enrolled students, across all classes, for each face in an image",
+)
+async def lookup_faces(
+    image: UploadFile = File(...),
+    k: int = Form(5, ge=1, le=50),
+):
+    index = face_index.refresh()
+    _check_upload_size(image)
+    try:
+        result = await get_inference_pool().run(_lookup_faces, image.file, index, k)
+    except InferencePoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Attendance recognition is busy, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not decode image",
+        )
+    return result
+
+
+@router.get("/pool", summary="Inference pool load")
+def inference_pool_stats():
+    return get_inference_pool().stats()
+
+
 @router.post(
     "/manual",
     response_model=AttendanceSummary,
@@ -240,77 +691,31 @@ def manual_attendance(
     payload: ManualAttendancePayload,
     db: Session = Depends(get_db),
 ):
-    session = _get_or_create_session(payload, db)
-
-    existing_records = {
-        r.reg_no: r
-        for r in db.query(models.AttendanceRecord)
-        .filter(models.AttendanceRecord.session_id == session.session_id)
-        .all()
-    }
-
     for rec in payload.records:
-        if rec.status not in ("P", "A", "OD", "ML", "NT"):
+        if rec.status not in VALID_STATUSES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid status {rec.status} for {rec.reg_no}. Must be P, A, OD, or ML.",
             )
-        record = existing_records.get(rec.reg_no)
-        if record:
-            record.status = rec.status
-        else:
-            db.add(
-                models.AttendanceRecord(
-                    session_id=session.session_id,
-                    reg_no=rec.reg_no,
-                    status=rec.status,
-                )
-            )
 
+    # read the id now: commit() expires the ORM object
+    session_id = _get_or_create_session(payload, db).session_id
+    upsert_attendance_records(db, ((session_id, rec.reg_no, rec.status) for rec in payload.records))
     db.commit()
 
-    present = [
-        rec.reg_no
-        for rec in db.query(models.AttendanceRecord)
-        .filter(
-            models.AttendanceRecord.session_id == session.session_id,
-            models.AttendanceRecord.status == "P",
-        )
-        .all()
-    ]
-    absent = [
-        rec.reg_no
-        for rec in db.query(models.AttendanceRecord)
-        .filter(
-            models.AttendanceRecord.session_id == session.session_id,
-            models.AttendanceRecord.status == "A",
-        )
-        .all()
-    ]
-    od_list = [
-        rec.reg_no
-        for rec in db.query(models.AttendanceRecord)
-        .filter(
-            models.AttendanceRecord.session_id == session.session_id,
-            models.AttendanceRecord.status == "OD",
-        )
-        .all()
-    ]
-    ml_list = [
-        rec.reg_no
-        for rec in db.query(models.AttendanceRecord)
-        .filter(
-            models.AttendanceRecord.session_id == session.session_id,
-            models.AttendanceRecord.status == "ML",
-        )
-        .all()
-    ]
+    return build_session_summary(db, session_id)
 
-    return AttendanceSummary(
-        session_id=session.session_id,
-        present=present,
-        absent=absent,
-        od=od_list,
-        ml=ml_list,
-    )
+
+@router.get(
+    "/sessions/{session_id}/summary",
+    response_model=AttendanceSummary,
+    summary="Present/absent/OD/ML lists for a session",
+)
+def get_session_summary(session_id: int, db: Session = Depends(get_db)):
+    if db.get(models.AttendanceSession, session_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found",
+        )
+    return build_session_summary(db, session_id)
 
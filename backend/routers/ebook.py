@@ -7,7 +7,7 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from backend import models
 from backend.database import get_db
@@ -89,6 +89,7 @@ def list_subject_materials(
 ):
     materials = (
         db.query(models.EBook)
+        .options(joinedload(models.EBook.teacher))
         .filter(models.EBook.subject_code == subject_code)
         .order_by(models.EBook.uploaded_at.desc())
         .all()
@@ -1,7 +1,7 @@
 from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from sqlalchemy import func
 
 from backend import models
@@ -334,7 +334,9 @@ def get_marks_statistics(
     # Fetch all marks for this class/subject
     entries = db.query(models.MarkEntry).filter(
         models.MarkEntry.subject_code == subject_code
-    ).join(models.Student).filter(models.Student.class_id == class_id).all()
+    ).join(models.Student).filter(models.Student.class_id == class_id).options(
+        contains_eager(models.MarkEntry.student)
+    ).all()
     
     if not entries:
         return {
@@ -80,6 +80,12 @@ def get_my_today_attendance(
         .all()
     )
     
+    subject_names = dict(
+        db.query(models.Subject.subject_code, models.Subject.subject_name).filter(
+            models.Subject.subject_code.in_({ses.subject_code for _, ses in records})
+        )
+    ) if records else {}
+    
     # Build period info
     periods_data = []
     present_count = 0
@@ -96,9 +102,6 @@ def get_my_today_attendance(
                 break
         
         if period_record and period_record.status != "NT":
-            subject = db.query(models.Subject).filter(
-                models.Subject.subject_code == session_info.subject_code
-            ).first() if session_info else None
             
             # Allow raw status (P, A, OD, ML) to pass to frontend
             # Or map it? Frontend likely expects lowercase 'present'/'absent' based on existing code.
@@ -121,8 +124,8 @@ def get_my_today_attendance(
             
             periods_data.append(PeriodInfo(
                 period_no=period_no,
-                subject_name=subject.subject_name if subject else None,
-                subject_code=session_info.subject_code if session_info else None,
+                subject_name=subject_names.get(session_info.subject_code),
+                subject_code=session_info.subject_code,
                 status=status_str,
             ))
         else:
@@ -486,7 +489,11 @@ def get_my_timetable(
     
     entries = (
         db.query(models.Timetable)
-        .options(joinedload(models.Timetable.subject))
+        .options(
+            joinedload(models.Timetable.subject),
+            joinedload(models.Timetable.teacher),
+            joinedload(models.Timetable.class_),
+        )
         .filter(models.Timetable.class_id == class_id)
         .all()
     )
@@ -518,15 +525,18 @@ def get_my_subjects(
     class_id = user.student.class_id
     
     # Fetch subjects mapped to this class
-    mappings = db.query(models.ClassSubjectMap).filter(models.ClassSubjectMap.class_id == class_id).all()
+    mapped = (
+        db.query(models.Subject)
+        .join(models.ClassSubjectMap, models.ClassSubjectMap.subject_code == models.Subject.subject_code)
+        .filter(models.ClassSubjectMap.class_id == class_id)
+        .all()
+    )
     
     subjects = []
-    for m in mappings:
-        sub = db.query(models.Subject).filter(models.Subject.subject_code == m.subject_code).first()
-        if sub:
-            subjects.append({
-                "subject_code": sub.subject_code,
-                "subject_name": sub.subject_name
-            })
+    for sub in mapped:
+        subjects.append({
+            "subject_code": sub.subject_code,
+            "subject_name": sub.subject_name
+        })
             
     return subjects
@@ -162,21 +162,21 @@ def list_tasks_for_student(
     if subject_code:
         query = query.filter(models.Task.subject_code == subject_code)
         
-    tasks = query.order_by(models.Task.created_at.desc()).all()
+    tasks = query.options(joinedload(models.Task.teacher)).order_by(models.Task.created_at.desc()).all()
     
-    # Enrich with submission status
+    # Enrich with submission status (one query for all of the student's submissions)
+    submitted = {
+        task_id
+        for (task_id,) in db.query(models.Submission.task_id).filter(
+            models.Submission.student_id == student.student_id,
+            models.Submission.task_id.in_([t.task_id for t in tasks]),
+        )
+    } if tasks else set()
     result = []
     for t in tasks:
         item = TaskRead.model_validate(t)
         if t.teacher: item.teacher_name = t.teacher.name
-        
-        # Check submission
-        sub = db.query(models.Submission).filter(
-            models.Submission.task_id == t.task_id,
-            models.Submission.student_id == student.student_id
-        ).first()
-        
-        item.is_submitted = (sub is not None)
+        item.is_submitted = t.task_id in submitted
         result.append(item)
         
     return result
@@ -5,19 +5,19 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session, joinedload
 
 from backend import models
+from backend.ai.embeddings import has_embedding
+from backend.ai.proof import get_proof_path
 from backend.database import get_db
+from backend.routers.attendance import VALID_STATUSES, upsert_attendance_records
 from backend.routers.auth import get_current_user, UserInfo
 
 
 router = APIRouter()
 
-PROJECT_ROOT = Path(__file__).resolve().parents[2]
-ATTENDANCE_PROOF_DIR = PROJECT_ROOT / "storage" / "attendance_proofs"
-
-
 # ---------- Pydantic Schemas ----------
 
 
@@ -169,18 +169,21 @@ def get_students_by_class(
         .all()
     )
     
+    profiles = {
+        p.reg_no: p
+        for p in db.query(models.FaceProfile)
+        .join(models.Student, models.Student.reg_no == models.FaceProfile.reg_no)
+        .filter(models.Student.class_id == class_id)
+    }
+    
     result = []
     for s in students:
-        profile = (
-            db.query(models.FaceProfile)
-            .filter(models.FaceProfile.reg_no == s.reg_no)
-            .first()
-        )
+        profile = profiles.get(s.reg_no)
         result.append(StudentInfo(
             student_id=s.student_id,
             reg_no=s.reg_no,
             name=s.name,
-            has_face_profile=profile is not None and profile.embedding_vector is not None,
+            has_face_profile=has_embedding(profile),
         ))
     
     return result
@@ -280,16 +283,21 @@ def get_simple_attendance_history(
         .all()
     )
     
+    # Count present/total for every session in one grouped query
+    counts = {
+        session_id: (present, total)
+        for session_id, present, total in db.query(
+            models.AttendanceRecord.session_id,
+            func.count(case((models.AttendanceRecord.status == "P", 1))),
+            func.count(),
+        )
+        .filter(models.AttendanceRecord.session_id.in_([ses.session_id for ses in sessions]))
+        .group_by(models.AttendanceRecord.session_id)
+    } if sessions else {}
+    
     results = []
     for ses in sessions:
-        # Count present/absent for each session
-        records = (
-            db.query(models.AttendanceRecord)
-            .filter(models.AttendanceRecord.session_id == ses.session_id)
-            .all()
-        )
-        present = sum(1 for r in records if r.status == "P")
-        total = len(records)
+        present, total = counts.get(ses.session_id, (0, 0))
         
         results.append({
             "session_id": ses.session_id,
@@ -340,6 +348,18 @@ def get_attendance_history(
     # Build history matrix
     # date_list = [(start_date + timedelta(days=i)).isoformat() for i in range(days)]
     session_dates = sorted(set(s.date for s in sessions))
+
+    # Every record of these sessions in one query, keyed by (session_id, reg_no)
+    status_of = {}
+    if sessions:
+        status_of = {
+            (session_id, reg_no): record_status
+            for session_id, reg_no, record_status in db.query(
+                models.AttendanceRecord.session_id,
+                models.AttendanceRecord.reg_no,
+                models.AttendanceRecord.status,
+            ).filter(models.AttendanceRecord.session_id.in_([ses.session_id for ses in sessions]))
+        }
     
     history = []
     for student in students:
@@ -348,19 +368,12 @@ def get_attendance_history(
         present_count = 0
         
         for ses in sessions:
-            record = (
-                db.query(models.AttendanceRecord)
-                .filter(
-                    models.AttendanceRecord.session_id == ses.session_id,
-                    models.AttendanceRecord.reg_no == student.reg_no,
-                )
-                .first()
-            )
+            record_status = status_of.get((ses.session_id, student.reg_no))
             date_key = ses.date.isoformat()
-            if record and record.status != "NT":
-                records[date_key] = record.status
+            if record_status and record_status != "NT":
+                records[date_key] = record_status
                 total_working += 1
-                if record.status == "P":
+                if record_status == "P":
                     present_count += 1
             else:
                 records[date_key] = "NT"
@@ -399,18 +412,18 @@ def get_session_detail(
         raise HTTPException(status_code=404, detail="Session not found")
     
     records = (
-        db.query(models.AttendanceRecord)
+        db.query(models.AttendanceRecord, models.Student.name)
+        .outerjoin(models.Student, models.Student.reg_no == models.AttendanceRecord.reg_no)
         .filter(models.AttendanceRecord.session_id == session_id)
         .all()
     )
     
     record_details = []
-    for r in records:
-        student = db.query(models.Student).filter(models.Student.reg_no == r.reg_no).first()
+    for r, name in records:
         record_details.append(AttendanceRecordDetail(
             attendance_id=r.attendance_id,
             reg_no=r.reg_no,
-            name=student.name if student else "Unknown",
+            name=name or "Unknown",
             status=r.status,
         ))
     
@@ -452,29 +465,13 @@ def edit_session_attendance(
         )
     
     for update in updates:
-        if update.status not in ("P", "A", "OD", "ML", "NT"):
+        if update.status not in VALID_STATUSES:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid status: {update.status}",
             )
-        
-        record = (
-            db.query(models.AttendanceRecord)
-            .filter(
-                models.AttendanceRecord.session_id == session_id,
-                models.AttendanceRecord.reg_no == update.reg_no,
-            )
-            .first()
-        )
-        if record:
-            record.status = update.status
-        else:
-            db.add(models.AttendanceRecord(
-                session_id=session_id,
-                reg_no=update.reg_no,
-                status=update.status,
-            ))
     
+    upsert_attendance_records(db, ((session_id, u.reg_no, u.status) for u in updates))
     db.commit()
     return {"message": "Attendance updated successfully"}
 
@@ -483,9 +480,10 @@ def edit_session_attendance(
 def get_proof_image(
     teacher_id: int,
     session_id: int,
+    thumbnail: bool = Query(False),
     db: Session = Depends(get_db),
 ):
-    """Get the proof image for an attendance session."""
+    """Get the proof image (or its thumbnail) for an attendance session, rendering it if still pending."""
     session = (
         db.query(models.AttendanceSession)
         .filter(
@@ -497,8 +495,8 @@ def get_proof_image(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    proof_path = ATTENDANCE_PROOF_DIR / f"session_{session_id}.jpg"
-    if not proof_path.exists():
+    proof_path = get_proof_path(session_id, thumbnail=thumbnail)
+    if proof_path is None:
         raise HTTPException(status_code=404, detail="Proof image not found")
     
     return FileResponse(str(proof_path), media_type="image/jpeg")
@@ -658,6 +656,10 @@ def get_teacher_inbox(
             models.LeaveRequestApproval.teacher_id == teacher_id,
             models.LeaveRequestApproval.status == "Pending"
         )
+        .options(
+            joinedload(models.LeaveRequestApproval.request).joinedload(models.LeaveRequest.student),
+            joinedload(models.LeaveRequestApproval.session),
+        )
         .all()
     )
     
@@ -728,9 +730,11 @@ def bulk_approve_requests(
             models.LeaveRequestApproval.approval_id.in_(action.approval_ids),
             models.LeaveRequestApproval.teacher_id == teacher_id
         )
+        .options(joinedload(models.LeaveRequestApproval.request))
         .all()
     )
     
+    records = []
     for approval in approvals:
         if approval.status != "Pending":
             continue
@@ -738,27 +742,12 @@ def bulk_approve_requests(
         # 1. Update Approval Status
         approval.status = "Approved"
         
-        # 2. Update Attendance Record
+        # 2. Queue the attendance record; all are written in one statement below
         req = approval.request
-        record = (
-            db.query(models.AttendanceRecord)
-            .filter(
-                models.AttendanceRecord.session_id == approval.session_id,
-                models.AttendanceRecord.reg_no == req.student_reg_no
-            )
-            .first()
-        )
-        
-        if record:
-            record.status = req.request_type
-        else:
-            db.add(models.AttendanceRecord(
-                session_id=approval.session_id,
-                reg_no=req.student_reg_no,
-                status=req.request_type
-            ))
+        records.append((approval.session_id, req.student_reg_no, req.request_type))
         success_count += 1
         
+    upsert_attendance_records(db, records)
     db.commit()
     return {"message": f"Approved {success_count} requests"}
 
@@ -0,0 +1,79 @@
+"""
+FaceSearchIndex rebuilds: requests never wait for the database load or the
+k-means, and enrollment changes made during a rebuild survive the swap.
+"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from backend.ai import ann
+from backend.ai.ann import FaceSearchIndex
+from backend.ai.embeddings import EMBEDDING_DIM
+
+
+def _vector(i):
+    v = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    v[i] = 1.0
+    return v
+
+
+class _Session:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    """Stand-in for the FaceProfile query that blocks until ``release`` is set."""
+    state = {"release": threading.Event(), "ids": ["S0", "S1"]}
+
+    def read(db):
+        state["release"].wait(5)
+        ids = list(state["ids"])
+        vectors = np.vstack([_vector(i) for i in range(len(ids))])
+        return ids, {r: "C1" for r in ids}, vectors
+
+    monkeypatch.setattr(ann, "_read_profiles", read)
+    return state
+
+
+def test_lookup_does_not_wait_for_the_first_build(profiles):
+    index = FaceSearchIndex(session_factory=_Session)
+    started = time.perf_counter()
+    assert index.refresh().lookup(_vector(0)[None], k=1) == [[]]
+    assert time.perf_counter() - started < 1.0
+    assert index.stats() == {"loaded": False, "rebuilding": True}
+
+    profiles["release"].set()
+    hits = index.wait().lookup(_vector(1)[None], k=1)
+    assert hits[0][0]["reg_no"] == "S1"
+    assert index.stats()["rebuilding"] is False
+
+
+def test_stale_index_keeps_serving_while_it_rebuilds(profiles):
+    profiles["release"].set()
+    index = FaceSearchIndex(refresh_seconds=0.0, session_factory=_Session)
+    index.refresh().wait()
+
+    profiles["release"].clear()
+    profiles["ids"] = ["S0", "S1", "S2"]
+    index.refresh()
+    assert index.lookup(_vector(0)[None], k=1)[0][0]["reg_no"] == "S0"
+    assert index.stats()["vectors"] == 2
+
+    profiles["release"].set()
+    assert index.wait().stats()["vectors"] == 3
+
+
+def test_changes_during_a_rebuild_are_replayed(profiles):
+    index = FaceSearchIndex(session_factory=_Session)
+    index.refresh()
+    index.upsert("S9", "C2", _vector(9))
+    index.remove("S0")
+
+    profiles["release"].set()
+    index.wait()
+    assert index.lookup(_vector(9)[None], k=1)[0][0] == {"reg_no": "S9", "class_id": "C2", "similarity": 1.0}
+    assert all(hit["reg_no"] != "S0" for hit in index.lookup(_vector(0)[None], k=5)[0])
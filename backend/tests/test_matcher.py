@@ -0,0 +1,30 @@
+"""One-to-one gallery matching."""
+import numpy as np
+
+from backend.ai.matcher import GalleryMatcher
+
+
+def _unit(*weights):
+    v = np.zeros(8, dtype=np.float32)
+    v[: len(weights)] = weights
+    return v / np.linalg.norm(v)
+
+
+def test_weak_second_choice_does_not_displace_best_match():
+    # S1 and S2 are orthogonal; face A is 0.88 to S1 and 0.45 to S2, face B is 0.5 to S1 only
+    gallery = GalleryMatcher(["S1", "S2"], np.stack([_unit(1, 0), _unit(0, 1)]), mode="centroid")
+    face_a = _unit(0.88, 0.45, np.sqrt(1 - 0.88**2 - 0.45**2))
+    face_b = _unit(0.5, 0, 0, np.sqrt(1 - 0.5**2))
+    sims = gallery.similarities(np.stack([face_a, face_b]))
+    assert sims[0, 0] > 0.85 and 0.4 < sims[0, 1] < 0.5 and 0.45 < sims[1, 0] < 0.55
+
+    (a_reg, a_sim), (b_reg, b_sim) = gallery.match(np.stack([face_a, face_b]))
+    assert a_reg == "S1" and a_sim > 0.85
+    assert b_reg == "Unknown"
+
+
+def test_each_student_matched_once_and_mask_respected():
+    gallery = GalleryMatcher(["S1", "S2"], np.stack([_unit(1, 0), _unit(0, 1)]), mode="centroid")
+    faces = np.stack([_unit(1, 0.1), _unit(1, 0.2), _unit(0.1, 1)])
+    assert [r for r, _ in gallery.match(faces)] == ["S1", "Unknown", "S2"]
+    assert [r for r, _ in gallery.match(faces, available=np.array([False, True]))] == ["Unknown", "Unknown", "S2"]
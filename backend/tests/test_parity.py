@@ -0,0 +1,151 @@
+"""
+Sequential vs batched pipeline parity with stubbed InsightFace models.
+
+Each synthetic face is a solid colour block; the stub detector reports the
+blocks that lie fully inside the tile it is given, and the stub recognizer
+maps the colour at the centre of an aligned crop to that face's identity
+vector, so both paths see the same faces and must assign the same students.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from insightface.app.common import Face
+
+from backend.ai import engine as engine_module
+from backend.ai.engine import FaceAttendanceEngine
+from backend.ai.matcher import GalleryMatcher
+from backend.ai.microbench import check_parity
+
+# ArcFace 112x112 landmark template (eyes, nose, mouth corners)
+TEMPLATE = np.array(
+    [[38.2946, 51.6963], [73.5318, 51.5014], [56.0252, 71.7366], [41.5493, 92.3655], [70.7299, 92.2041]],
+    dtype=np.float32,
+)
+W, H, SIZE = 1200, 800, 64
+
+
+def _scene(rng):
+    """Face boxes spread over a 4x6 grid and one colour per face."""
+    boxes = []
+    for r in range(4):
+        for c in range(6):
+            x0 = 40 + c * 190 + int(rng.integers(0, 40))
+            y0 = 30 + r * 190 + int(rng.integers(0, 40))
+            boxes.append((x0, y0, x0 + SIZE, y0 + SIZE))
+    colours = [(20 + 9 * i, 200 - 7 * i, 60 + 5 * i) for i in range(len(boxes))]
+    img = np.full((H, W, 3), 90, dtype=np.uint8)
+    for (x0, y0, x1, y1), colour in zip(boxes, colours):
+        img[y0:y1, x0:x1] = colour
+    return img, boxes, colours
+
+
+class StubDetector:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+    @staticmethod
+    def _offset(img):
+        """Where a tile view starts inside the image it was sliced from."""
+        if img.base is None:
+            return 0, 0
+        start = img.__array_interface__["data"][0] - img.base.__array_interface__["data"][0]
+        y0, rest = divmod(start, img.base.strides[0])
+        return rest // img.base.strides[1], y0
+
+    def detect(self, img, max_num=0, metric="default"):
+        off_x, off_y = self._offset(img)
+        h, w = img.shape[:2]
+        bboxes, kpss = [], []
+        for x0, y0, x1, y1 in self.boxes:
+            x0, x1, y0, y1 = x0 - off_x, x1 - off_x, y0 - off_y, y1 - off_y
+            if x0 >= 0 and y0 >= 0 and x1 <= w and y1 <= h:
+                bboxes.append([x0, y0, x1, y1, 0.9])
+                kpss.append(TEMPLATE * (SIZE / 112.0) + [x0, y0])
+        return np.asarray(bboxes, dtype=np.float32).reshape(-1, 5), np.asarray(kpss, dtype=np.float32).reshape(-1, 5, 2)
+
+
+class StubRecognizer:
+    input_size = (112, 112)
+
+    def __init__(self, identities, swap=False):
+        self.identities = identities  # colour -> unit vector
+        self.swap = swap
+
+    def embed(self, pixel):
+        vec = self.identities[tuple(int(v) for v in pixel)]
+        return vec[::-1].copy() if self.swap else vec
+
+    def get_feat(self, crops):
+        return np.stack([self.embed(crop[56, 56]) for crop in crops])
+
+
+def _engine(boxes, recognizer):
+    detector = StubDetector(boxes)
+
+    def get(tile):
+        bboxes, kpss = detector.detect(tile)
+        faces = []
+        for bbox, kps in zip(bboxes, kpss):
+            cx, cy = int((bbox[0] + bbox[2]) / 2), int((bbox[1] + bbox[3]) / 2)
+            face = Face(bbox=bbox[:4].copy(), kps=kps.copy(), det_score=bbox[4])
+            face.embedding = recognizer.embed(tile[cy, cx])
+            faces.append(face)
+        return faces
+
+    engine = FaceAttendanceEngine.__new__(FaceAttendanceEngine)
+    engine.app = SimpleNamespace(det_model=detector, models={"recognition": recognizer}, get=get)
+    engine.det_size = (320, 320)  # small enough that "grid" splits the 1200x800 scene
+    return engine
+
+
+@pytest.fixture
+def scene(monkeypatch):
+    monkeypatch.setattr(engine_module, "QUALITY_GATE", False)
+    rng = np.random.default_rng(0)
+    img, boxes, colours = _scene(rng)
+    vectors = rng.standard_normal((len(colours), 512)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    identities = dict(zip(colours, vectors))
+    # every face but the last is an enrolled student; the last is a visitor
+    reg_nos = [f"S{i:02d}" for i in range(len(colours) - 1)]
+    gallery = GalleryMatcher(reg_nos, vectors[:-1])
+    return img, boxes, identities, gallery, reg_nos
+
+
+@pytest.mark.parametrize("tiling", ["fixed", "grid"])
+def test_batched_matches_sequential(scene, tiling):
+    img, boxes, identities, gallery, reg_nos = scene
+    engine = _engine(boxes, StubRecognizer(identities))
+
+    result = check_parity(engine, img, gallery, tiling=tiling)
+
+    assert result["sequential_faces"] == result["batched_faces"] == len(boxes)
+    assert result["boxes_matched"] == len(boxes)
+    assert result["sequential_students"] == result["batched_students"] == reg_nos
+    assert result["parity"]
+
+
+def test_attendance_is_the_same_on_both_paths(scene):
+    img, boxes, identities, gallery, reg_nos = scene
+    engine = _engine(boxes, StubRecognizer(identities))
+
+    runs = {}
+    for batched in (False, True):
+        present, absent, _ = engine.mark_attendance(img.copy(), gallery, batched=batched, early_exit=False, draw=False)
+        runs[batched] = (sorted(present), sorted(absent))
+
+    assert runs[False] == runs[True] == (reg_nos, [])
+
+
+def test_wrong_identities_break_parity(scene):
+    img, boxes, identities, gallery, _ = scene
+    engine = _engine(boxes, StubRecognizer(identities))
+    # the batched path embeds through get_feat; make it return other vectors
+    engine.app.models["recognition"] = StubRecognizer(identities, swap=True)
+
+    result = check_parity(engine, img, gallery, tiling="fixed")
+
+    assert result["boxes_matched"] == len(boxes)
+    assert result["batched_students"] != result["sequential_students"]
+    assert not result["parity"]
@@ -0,0 +1,100 @@
+"""
+Fill the database with a synthetic institution for load and scale tests.
+
+At --scale 1: 40 departments, 400 classes (years 1-4, up to 3 sections),
+25,000 students, 1,120 teachers, a full timetable and two years (--days 730)
+of attendance on Mon-Sat, 7 periods a day (about 1.75M sessions and 110M
+records), plus tasks, submissions, marks, student profiles, e-book listings
+(no files) and leave requests with their per-session approvals. The same --seed, --scale, --days and --end (default
+2025-06-30) always give the same rows. Everything is streamed with COPY in
+one transaction; the rules live in backend/perf/institution.py, which the
+endpoint budget checks use for their smaller seed.
+
+    python generate_institution.py --scale 0.1 --days 120
+    python generate_institution.py --seed 7 --scale 1 --days 730
+
+Rows are namespaced by --prefix (class ids, subject codes, reg nos, emails),
+so a run can sit next to existing data; a prefix already in use is refused.
+Every generated user logs in with --password.
+"""
+import argparse
+import re
+import sys
+import time
+from datetime import date
+
+from backend.database import engine
+from backend.models import Base
+from backend.perf.institution import CopyWriter, Institution
+from backend.routers.auth import get_password_hash
+
+# --scale 1
+DEPARTMENTS = 40
+STUDENTS = 25_000
+CLASSES_PER_DEPT = 10
+# the default last day, so a run does not depend on when it is made
+DEFAULT_END = date(2025, 6, 30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=float, default=1.0, help="1.0 = 40 departments, 400 classes, 25k students")
+    parser.add_argument("--days", type=int, default=730, help="calendar days of attendance ending at --end")
+    parser.add_argument(
+        "--end", type=date.fromisoformat, default=DEFAULT_END, help=f"last day, YYYY-MM-DD (default {DEFAULT_END})"
+    )
+    parser.add_argument("--prefix", default="SYN", help="1-3 uppercase letters/digits")
+    parser.add_argument("--password", default="password123")
+    args = parser.parse_args()
+
+    if not re.fullmatch(r"[A-Z0-9]{1,3}", args.prefix):
+        parser.error("--prefix must be 1-3 uppercase letters or digits")
+    if args.scale <= 0 or round(DEPARTMENTS * args.scale) > 999:
+        parser.error("--scale must be positive and below 25")
+    if args.days < 7:
+        parser.error("--days must be at least 7")
+
+    Base.metadata.create_all(bind=engine)
+    departments = max(1, round(DEPARTMENTS * args.scale))
+    institution = Institution(
+        args.seed,
+        departments,
+        CLASSES_PER_DEPT,
+        round(STUDENTS * args.scale),
+        args.days,
+        args.end,
+        args.prefix,
+        get_password_hash(args.password),
+    )
+    if max(len(r) for r in institution.roster.values()) > 999:
+        parser.error("--scale gives more than 999 students per class")
+
+    connection = engine.raw_connection()
+    try:
+        cur = connection.cursor()
+        cur.execute("SELECT 1 FROM departments WHERE dept_name LIKE %s LIMIT 1", (f"{args.prefix} Department %",))
+        if cur.fetchone():
+            print(f"Prefix {args.prefix} is already used in this database; pick another --prefix.")
+            sys.exit(1)
+        started = time.perf_counter()
+        print(
+            f"Generating {institution.n_depts} departments, {len(institution.classes)} classes, "
+            f"{len(institution.absence):,} students, "
+            f"{len(institution.working_days)} working days",
+            flush=True,
+        )
+        institution.run(CopyWriter(cur))
+        cur.execute("ANALYZE")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    print(f"Done in {time.perf_counter() - started:.0f}s; every user's password is {args.password!r}.")
+
+
+if __name__ == "__main__":
+    main()